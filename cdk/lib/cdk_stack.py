@@ -11,41 +11,207 @@ from aws_cdk import (
 )
 from aws_cdk.aws_lambda import Architecture
 from constructs import Construct
+import json
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Number of times a message is received before it is moved to its dead-letter queue
+MAX_RECEIVE_COUNT = 5
+
+# Pipeline topology: 'staged' runs one Lambda per stage connected by SQS queues,
+# 'fused' runs scrape, embed, upsert and metadata storage in a single Lambda
+PIPELINE_MODE = os.environ.get('PIPELINE_MODE', 'staged')
+
+# Quantization of the embeddings sent from get_embeddings to push_to_pinecone: 'none', 'float16' or 'int8'
+EMBEDDING_QUANTIZATION = os.environ.get('EMBEDDING_QUANTIZATION', 'none')
+
+# Embedding models written by the pipeline, the first is the primary model and the others are dual-written
+# into their own Pinecone namespace (see lambda_functions/common/embedding_models.py)
+EMBEDDING_MODELS = os.environ.get('EMBEDDING_MODELS', 'text-embedding-3-small')
+
+# Scraped pages with a lower quality score are not embedded (see lambda_functions/common/text_quality.py),
+# 0 (the default until the threshold is calibrated) disables it
+SCRAPE_QUALITY_THRESHOLD = os.environ.get('SCRAPE_QUALITY_THRESHOLD', '0')
+
+# Uploads are split in a priority and a bulk lane (see lambda_functions/common/lanes.py). Each lane runs with its own
+# concurrency: reserved concurrency of the first stage Lambda of the lane, and maximum concurrency of the event
+# sources polling the lane's queue in the downstream stages, so every stage shares its capacity in this proportion
+LANE_CONCURRENCY = {
+    'priority': int(os.environ.get('PRIORITY_LANE_CONCURRENCY', 10)),
+    'bulk': int(os.environ.get('BULK_LANE_CONCURRENCY', 20)),
+}
+
+# Uploads with at most this many rows go to the priority lane (unless uploaded under priority/ or bulk/)
+PRIORITY_MAX_ROWS = os.environ.get('PRIORITY_MAX_ROWS', '1000')
+
+# Default memory (MB) and SQS batch size of the stage Lambdas, overridden per stage by the 'stage_tuning' context
+# written by src/tools/tune_lambdas.py, e.g. {"get_texts": {"memory_size": 256, "batch_size": 10, "concurrency": 30}}
+DEFAULT_MEMORY_SIZE = 1024
+DEFAULT_BATCH_SIZE = 1
+
+# Fraction of the invocations of every Lambda profiled, and the profiler used: 'sample' or 'cprofile'
+PROFILE_SAMPLE_RATE = os.environ.get('PROFILE_SAMPLE_RATE', '0')
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'sample')
+
+# Days the profiles are kept
+PROFILE_RETENTION_DAYS = 14
+
+# Every Lambda is deployed with the whole src/ tree so the stages can share the modules in lambda_functions/common
+LAMBDA_CODE_EXCLUDE = ["tools", "**/__pycache__"]
+
 class DataIngestionStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        # Per-stage settings recommended by the tuning tool (a JSON string when passed with `cdk deploy -c`)
+        stage_tuning = self.node.try_get_context('stage_tuning') or {}
+        if isinstance(stage_tuning, str):
+            stage_tuning = json.loads(stage_tuning)
+
+        def stage_setting(stage, setting, default):
+            return stage_tuning.get(stage, {}).get(setting, default)
+
+        def stage_batching(stage, default=DEFAULT_BATCH_SIZE):
+            # Event source batching of a stage; SQS batches above 10 messages require a batching window
+            batch_size = stage_setting(stage, 'batch_size', default)
+            if batch_size > 10:
+                return {'batch_size': batch_size, 'max_batching_window': Duration.seconds(5)}
+            return {'batch_size': batch_size}
+
+        def stage_lane_concurrency(stage):
+            # A tuned total concurrency is split between the lanes in the proportion of LANE_CONCURRENCY,
+            # with at least 2 per lane (the minimum maximum concurrency of an SQS event source)
+            total = stage_setting(stage, 'concurrency', None)
+            if total is None:
+                return LANE_CONCURRENCY
+            weights = sum(LANE_CONCURRENCY.values())
+            return {lane: max(2, round(total * concurrency / weights)) for lane, concurrency in LANE_CONCURRENCY.items()}
+
         # Define the S3 bucket where the CSV files will be uploaded
         csv_data_bucket = s3.Bucket(self, "CSVDataBucket")
 
+        # Define the DynamoDB table tracking the progress of every uploaded CSV file (ingestion job).
+        # Each job has a META item and a few sharded COUNTER# items updated atomically by every stage.
+        jobs_table = dynamodb.Table(
+            self, "IngestionJobsTable",
+            table_name="IngestionJobs",
+            partition_key=dynamodb.Attribute(
+                name="job_id",
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name="item",
+                type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        # Environment shared by every Lambda to report job progress
+        job_tracking_environment = {
+            'JOBS_TABLE_NAME': jobs_table.table_name,
+            'MAX_RECEIVE_COUNT': str(MAX_RECEIVE_COUNT)
+        }
+
+        # Define the S3 bucket receiving the profiles of sampled invocations (see lambda_functions/common/profiling.py)
+        profiles_bucket = s3.Bucket(
+            self, "ProfilesBucket",
+            lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(PROFILE_RETENTION_DAYS))]
+        )
+
+        # Environment shared by every Lambda to profile a fraction of its invocations, off unless PROFILE_SAMPLE_RATE is set.
+        # The rate can also be changed on a deployed function without redeploying.
+        profiling_environment = {
+            'PROFILE_BUCKET': profiles_bucket.bucket_name,
+            'PROFILE_SAMPLE_RATE': PROFILE_SAMPLE_RATE,
+            'PROFILE_MODE': PROFILE_MODE
+        }
+
+        # Define the S3 bucket caching the scraped text of every company, so the companies can be embedded again with
+        # another model without scraping them again (see src/tools/reembed.py). It outlives the stack.
+        text_cache_bucket = s3.Bucket(
+            self, "TextCacheBucket",
+            removal_policy=RemovalPolicy.RETAIN
+        )
+
+        def priority_lane_queue(name, dlq_name):
+            # Priority lane twin of a stage queue, with its own dead-letter queue so a redrive keeps the lane
+            dlq = sqs.Queue(
+                self, f"Priority{dlq_name}",
+                queue_name=f"Priority{dlq_name}",
+                retention_period=Duration.days(14)
+            )
+            return sqs.Queue(
+                self, f"Priority{name}",
+                queue_name=f"Priority{name}",
+                visibility_timeout=Duration.seconds(300),
+                dead_letter_queue=sqs.DeadLetterQueue(
+                    max_receive_count=MAX_RECEIVE_COUNT,
+                    queue=dlq
+                )
+            )
+
+        def add_lane_event_sources(function, queues, stage, **kwargs):
+            # Poll the queue of each lane with at most the lane's concurrency, a weighted share of the stage
+            lane_concurrency = stage_lane_concurrency(stage)
+            for lane, queue in queues.items():
+                queue.grant_consume_messages(function)
+                function.add_event_source(
+                    lambda_event_sources.SqsEventSource(
+                        queue,
+                        max_concurrency=lane_concurrency[lane],
+                        report_batch_item_failures=True,  # Only retry the failed messages of a batch
+                        **kwargs
+                    )
+                )
+
+        # Define the dead-letter queue for company data that repeatedly fails scraping
+        company_data_dlq = sqs.Queue(
+            self, "CompanyDataDLQ",
+            queue_name="CompanyDataDLQ",
+            retention_period=Duration.days(14)
+        )
+
         # Define the SQS queue for processing company data
         company_data_queue = sqs.Queue(
             self, 
             "CompanyDataQueue",
             queue_name="CompanyDataQueue",
-            visibility_timeout=Duration.seconds(300) 
+            visibility_timeout=Duration.seconds(300),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=MAX_RECEIVE_COUNT,
+                queue=company_data_dlq
+            )
         )
+        company_data_queues = {
+            'priority': priority_lane_queue("CompanyDataQueue", "CompanyDataDLQ"),
+            'bulk': company_data_queue
+        }
 
         # Define the Lambda function to parse the CSV and push messages to SQS
         parse_csv_to_sqs_lambda = _lambda.Function(
             self, "ParseCsvToSqsLambda",
             runtime=_lambda.Runtime.PYTHON_3_8,
-            handler="parse_csv_to_sqs.lambda_handler",
-            code=_lambda.Code.from_asset("../src/lambda_functions/parse_csv_to_sqs"),  
+            handler="lambda_functions.parse_csv_to_sqs.parse_csv_to_sqs.lambda_handler",
+            code=_lambda.Code.from_asset("../src", exclude=LAMBDA_CODE_EXCLUDE),
             environment={
-                'QUEUE_URL': company_data_queue.queue_url
+                'QUEUE_URL': company_data_queue.queue_url,
+                'PRIORITY_QUEUE_URL': company_data_queues['priority'].queue_url,
+                'PRIORITY_MAX_ROWS': PRIORITY_MAX_ROWS,
+                **job_tracking_environment,
+                **profiling_environment
             }
         )
 
         # Grant the Lambda function permissions to interact with SQS and S3
-        company_data_queue.grant_send_messages(parse_csv_to_sqs_lambda)
+        for queue in company_data_queues.values():
+            queue.grant_send_messages(parse_csv_to_sqs_lambda)
         csv_data_bucket.grant_read(parse_csv_to_sqs_lambda)
+        jobs_table.grant_read_write_data(parse_csv_to_sqs_lambda)
+        profiles_bucket.grant_put(parse_csv_to_sqs_lambda)
 
         # Add S3 event notification to trigger the Lambda function when a CSV file is uploaded
         csv_data_bucket.add_event_notification(
@@ -62,46 +228,93 @@ class DataIngestionStack(Stack):
             description="Lambda layer containing libraries for get_texts Lambda"
         )
 
+        # Define the dead-letter queue for scraped texts that repeatedly fail embedding
+        embedding_dlq = sqs.Queue(
+            self, "EmbeddingDLQ",
+            queue_name="EmbeddingDLQ",
+            retention_period=Duration.days(14)
+        )
+
         # Define SQS for embedding generation
         embedding_queue = sqs.Queue(
             self, "EmbeddingQueue",
             queue_name="EmbeddingQueue",
-            visibility_timeout=Duration.seconds(300) 
+            visibility_timeout=Duration.seconds(300),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=MAX_RECEIVE_COUNT,
+                queue=embedding_dlq
+            )
         )
+        embedding_queues = {
+            'priority': priority_lane_queue("EmbeddingQueue", "EmbeddingDLQ"),
+            'bulk': embedding_queue
+        }
 
-        # Define the Lambda function to scrape websites and push results to the embedding queue
-        get_texts_lambda = _lambda.Function(
-            self, "get_texts",
-            runtime=_lambda.Runtime.PYTHON_3_8,
-            handler="get_texts.lambda_handler",
-            code=_lambda.Code.from_asset("../src/lambda_functions/get_texts"),  
-            environment={
-                'SCRAPINGBEE_API_KEY': os.environ['SCRAPINGBEE_API_KEY'],
-                'EMBEDDING_QUEUE_URL': embedding_queue.queue_url
-            },
-            timeout=Duration.seconds(300),  # Adjust based on scraping needs
-            memory_size=1024,  # Adjust based on expected load
-            layers=[get_texts_layer]  # Attach the Lambda layer here
-        )
+        # Define one Lambda function per lane to scrape websites and push results to the embedding queue of the lane.
+        # Each has its own reserved concurrency so a bulk upload cannot take the scraping capacity of the priority lane.
+        for lane, function_id in [('bulk', "get_texts"), ('priority', "GetTextsPriorityLambda")]:
+            get_texts_lambda = _lambda.Function(
+                self, function_id,
+                runtime=_lambda.Runtime.PYTHON_3_8,
+                handler="lambda_functions.get_texts.get_texts.lambda_handler",
+                code=_lambda.Code.from_asset("../src", exclude=LAMBDA_CODE_EXCLUDE),
+                environment={
+                    'SCRAPINGBEE_API_KEY': os.environ['SCRAPINGBEE_API_KEY'],
+                    'EMBEDDING_QUEUE_URL': embedding_queue.queue_url,
+                    'PRIORITY_EMBEDDING_QUEUE_URL': embedding_queues['priority'].queue_url,
+                    'TEXT_CACHE_BUCKET': text_cache_bucket.bucket_name,
+                    'SCRAPE_QUALITY_THRESHOLD': SCRAPE_QUALITY_THRESHOLD,
+                    'EMBEDDING_MODELS': EMBEDDING_MODELS,  # Savings of the skipped pages are counted for every model
+                    **job_tracking_environment,
+                    **profiling_environment
+                },
+                timeout=Duration.seconds(300),  # Adjust based on scraping needs
+                memory_size=stage_setting('get_texts', 'memory_size', DEFAULT_MEMORY_SIZE),
+                # Reserved only when the Lambda consumes its lane, the fused pipeline Lambdas do in fused mode
+                reserved_concurrent_executions=stage_lane_concurrency('get_texts')[lane] if PIPELINE_MODE == 'staged' else None,
+                layers=[get_texts_layer]  # Attach the Lambda layer here
+            )
 
-        # Grant the scraping Lambda permissions to interact with SQS
-        company_data_queue.grant_consume_messages(get_texts_lambda)
-        embedding_queue.grant_send_messages(get_texts_lambda)
+            # Grant the scraping Lambda permissions to interact with SQS
+            company_data_queues[lane].grant_consume_messages(get_texts_lambda)
+            for queue in embedding_queues.values():
+                queue.grant_send_messages(get_texts_lambda)
+            jobs_table.grant_read_write_data(get_texts_lambda)
+            profiles_bucket.grant_put(get_texts_lambda)
+            text_cache_bucket.grant_put(get_texts_lambda)
 
-        # Trigger scraping Lambda when messages arrive in the company data SQS queue
-        get_texts_lambda.add_event_source(
-            lambda_event_sources.SqsEventSource(
-                company_data_queue,
-                batch_size=1  # Set batch size to scrape multiple websites at once
-            )
+            # Trigger scraping Lambda when messages arrive in the company data SQS queue of its lane
+            # (in fused mode the company data queues are consumed by the fused pipeline Lambdas instead)
+            if PIPELINE_MODE == 'staged':
+                get_texts_lambda.add_event_source(
+                    lambda_event_sources.SqsEventSource(
+                        company_data_queues[lane],
+                        **stage_batching('get_texts'),  # Websites of a batch are scraped one after the other
+                        report_batch_item_failures=True  # Only retry the failed messages of a batch
+                    )
+                )
+
+        # Define the dead-letter queue for embeddings that repeatedly fail upsertion
+        pinecone_dlq = sqs.Queue(
+            self, "PineconeDLQ",
+            queue_name="PineconeDLQ",
+            retention_period=Duration.days(14)
         )
 
         # Define the SQS queue for Pinecone processing ---
         pinecone_queue = sqs.Queue(
             self, "PineconeQueue",
             queue_name="PineconeQueue",
-            visibility_timeout=Duration.seconds(300)
+            visibility_timeout=Duration.seconds(300),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=MAX_RECEIVE_COUNT,
+                queue=pinecone_dlq
+            )
         )
+        pinecone_queues = {
+            'priority': priority_lane_queue("PineconeQueue", "PineconeDLQ"),
+            'bulk': pinecone_queue
+        }
 
         # --- Define the Lambda Layer for the embedding to Pinecone Lambda function ---
         get_embeddings_layer = _lambda.LayerVersion(
@@ -115,42 +328,57 @@ class DataIngestionStack(Stack):
         get_embeddings_lambda = _lambda.Function(
             self, "EmbeddingToPineconeLambda",
             runtime=_lambda.Runtime.PYTHON_3_8,
-            handler="get_embeddings.lambda_handler",
-            code=_lambda.Code.from_asset("../src/lambda_functions/get_embeddings"),  
+            handler="lambda_functions.get_embeddings.get_embeddings.lambda_handler",
+            code=_lambda.Code.from_asset("../src", exclude=LAMBDA_CODE_EXCLUDE),
             environment={
                 'OPENAI_API_KEY': os.environ['OPENAI_API_KEY'],  # OpenAI API Key
-                'PINECONE_QUEUE_URL': pinecone_queue.queue_url   # Send to Pinecone queue after processing
+                'PINECONE_QUEUE_URL': pinecone_queue.queue_url,  # Send to Pinecone queue after processing
+                'PRIORITY_PINECONE_QUEUE_URL': pinecone_queues['priority'].queue_url,
+                'EMBEDDING_QUANTIZATION': EMBEDDING_QUANTIZATION,  # Quantization of the embeddings in the queue messages
+                'EMBEDDING_MODELS': EMBEDDING_MODELS,  # Models embedded in one pass over every batch
+                **job_tracking_environment,
+                **profiling_environment
             },
             timeout=Duration.seconds(300),  # Adjust timeout for long-running tasks
-            memory_size=1024,  # Adjust memory based on the size of embeddings
+            memory_size=stage_setting('get_embeddings', 'memory_size', DEFAULT_MEMORY_SIZE),
             architecture=_lambda.Architecture.ARM_64,  # Use ARM architecture
-            layers=[
-                get_embeddings_layer, 
-                _lambda.LayerVersion.from_layer_version_arn(
-                    self, "AWSSDKPandasLayer",  # Updated the name of the layer reference
-                    "arn:aws:lambda:us-west-2:336392948345:layer:AWSSDKPandas-Python38-Arm64:25"  # New AWS SDK Pandas layer ARN
-                )
-            ]
+            # Only the openai and tiktoken layer, the embeddings are normalized without numpy
+            layers=[get_embeddings_layer]
         )
 
         # Grant the embedding Lambda permissions to interact with SQS
-        embedding_queue.grant_consume_messages(get_embeddings_lambda)
-        pinecone_queue.grant_send_messages(get_embeddings_lambda)
-
-        # Trigger the Lambda when messages arrive in the embedding SQS queue
-        get_embeddings_lambda.add_event_source(
-            lambda_event_sources.SqsEventSource(
-                embedding_queue,
-                batch_size=1  # Adjust batch size for embedding processing
-            )
+        for queue in pinecone_queues.values():
+            queue.grant_send_messages(get_embeddings_lambda)
+        jobs_table.grant_read_write_data(get_embeddings_lambda)
+        profiles_bucket.grant_put(get_embeddings_lambda)
+
+        # Trigger the Lambda when messages arrive in the embedding SQS queue of either lane
+        add_lane_event_sources(
+            get_embeddings_lambda, embedding_queues, 'get_embeddings',
+            **stage_batching('get_embeddings')
+        )
+
+        # --- Define the dead-letter queue for metadata that repeatedly fails to insert ---
+        dynamo_sqs_dlq = sqs.Queue(
+            self, "DynamoSQSDLQ",
+            queue_name="DynamoSQSDLQ",
+            retention_period=Duration.days(14)
         )
 
         # --- Define the DynamoDB SQS queue ---
         dynamo_sqs_queue = sqs.Queue(
             self, "DynamoSQSQueue",
             queue_name="DynamoSQSQueue",
-            visibility_timeout=Duration.seconds(300)  # Adjust based on processing needs
+            visibility_timeout=Duration.seconds(300),  # Adjust based on processing needs
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=MAX_RECEIVE_COUNT,
+                queue=dynamo_sqs_dlq
+            )
         )
+        dynamo_sqs_queues = {
+            'priority': priority_lane_queue("DynamoSQSQueue", "DynamoSQSDLQ"),
+            'bulk': dynamo_sqs_queue
+        }
 
         # --- Define the custom Lambda Layer for push_to_pinecone Lambda function ---
         push_to_pinecone_layer = _lambda.LayerVersion(
@@ -164,33 +392,31 @@ class DataIngestionStack(Stack):
         push_to_pinecone_lambda = _lambda.Function(
             self, "PushToPineconeLambda",
             runtime=_lambda.Runtime.PYTHON_3_8,
-            handler="push_to_pinecone.lambda_handler",
-            code=_lambda.Code.from_asset("../src/lambda_functions/push_to_pinecone"),
+            handler="lambda_functions.push_to_pinecone.push_to_pinecone.lambda_handler",
+            code=_lambda.Code.from_asset("../src", exclude=LAMBDA_CODE_EXCLUDE),
             environment={
                 'PINECONE_API_KEY': os.environ['PINECONE_API_KEY'],  # Pinecone API Key
                 'PINECONE_INDEX_NAME': os.environ['PINECONE_INDEX_NAME'],  # Pinecone index name
-                'DYNAMO_SQS_QUEUE_URL': dynamo_sqs_queue.queue_url  # Send metadata to Dynamo SQS queue
+                'DYNAMO_SQS_QUEUE_URL': dynamo_sqs_queue.queue_url,  # Send metadata to Dynamo SQS queue
+                'PRIORITY_DYNAMO_SQS_QUEUE_URL': dynamo_sqs_queues['priority'].queue_url,
+                **job_tracking_environment,
+                **profiling_environment
             },
             timeout=Duration.seconds(300),  # Adjust based on processing needs
-            memory_size=1024,  # Adjust based on expected load
-            layers=[
-                push_to_pinecone_layer,  # Add custom layer
-                _lambda.LayerVersion.from_layer_version_arn(
-                    self, "SciPyLayer",  # Add the AWS SciPy layer
-                    "arn:aws:lambda:us-west-2:420165488524:layer:AWSLambda-Python38-SciPy1x:107"
-                )
-            ]
+            memory_size=stage_setting('push_to_pinecone', 'memory_size', DEFAULT_MEMORY_SIZE),
+            layers=[push_to_pinecone_layer]  # Only the pinecone client is needed
         )
 
         # Grant permissions to push to the Dynamo SQS queue
-        dynamo_sqs_queue.grant_send_messages(push_to_pinecone_lambda)
+        for queue in dynamo_sqs_queues.values():
+            queue.grant_send_messages(push_to_pinecone_lambda)
+        jobs_table.grant_read_write_data(push_to_pinecone_lambda)
+        profiles_bucket.grant_put(push_to_pinecone_lambda)
 
-        # Trigger the new Lambda when messages arrive in the PineconeQueue
-        push_to_pinecone_lambda.add_event_source(
-            lambda_event_sources.SqsEventSource(
-                pinecone_queue,
-                batch_size=1  # Adjust batch size for processing needs
-            )
+        # Trigger the new Lambda when messages arrive in the PineconeQueue of either lane
+        add_lane_event_sources(
+            push_to_pinecone_lambda, pinecone_queues, 'push_to_pinecone',
+            **stage_batching('push_to_pinecone')
         )
 
         # Define DynamoDB table
@@ -204,29 +430,97 @@ class DataIngestionStack(Stack):
             removal_policy=RemovalPolicy.DESTROY  # Change this if you don't want the table to be deleted when the stack is destroyed
         )
 
+        # Secondary indexes for lookups by domain, size bucket and location (see lambda_functions/common/company_index.py).
+        # The size and location partition keys carry a shard suffix so large buckets like '1-10' or 'NA' are not hot partitions.
+        # CloudFormation creates one GSI per table update: when adding them to an existing table, deploy them one at a time.
+        for index_name, partition_key, sort_key in [
+            ("DomainIndex", "domain", None),
+            ("SizeLocationIndex", "size_shard", "location"),
+            ("LocationSizeIndex", "location_shard", "employee_size"),
+        ]:
+            dynamo_table.add_global_secondary_index(
+                index_name=index_name,
+                partition_key=dynamodb.Attribute(name=partition_key, type=dynamodb.AttributeType.STRING),
+                sort_key=dynamodb.Attribute(name=sort_key, type=dynamodb.AttributeType.STRING) if sort_key else None,
+                projection_type=dynamodb.ProjectionType.ALL
+            )
+
         # Define the Lambda function to send metadata to DynamoDB
         send_to_dynamo_lambda = _lambda.Function(
             self, "SendToDynamoLambda",
             runtime=_lambda.Runtime.PYTHON_3_8,
-            handler="push_to_dynamo.lambda_handler",
-            code=_lambda.Code.from_asset("../src/lambda_functions/push_to_dynamo"),
+            handler="lambda_functions.push_to_dynamo.push_to_dynamo.lambda_handler",
+            code=_lambda.Code.from_asset("../src", exclude=LAMBDA_CODE_EXCLUDE),
             environment={
-                'DYNAMODB_TABLE_NAME': dynamo_table.table_name  
+                'DYNAMODB_TABLE_NAME': dynamo_table.table_name,
+                **job_tracking_environment,
+                **profiling_environment
             },
             timeout=Duration.seconds(300),  # Adjust timeout if needed
-            memory_size=1024  # Adjust memory as per requirements
+            memory_size=stage_setting('push_to_dynamo', 'memory_size', DEFAULT_MEMORY_SIZE)
         )
 
         # Grant permissions to the Lambda function to put items into DynamoDB
         dynamo_table.grant_write_data(send_to_dynamo_lambda)
+        jobs_table.grant_read_write_data(send_to_dynamo_lambda)
+        profiles_bucket.grant_put(send_to_dynamo_lambda)
 
-        # Grant the Lambda function permissions to interact with the SQS queue
-        dynamo_sqs_queue.grant_consume_messages(send_to_dynamo_lambda)
+        # Trigger the Lambda when messages arrive in the Dynamo SQS queue of either lane
+        add_lane_event_sources(
+            send_to_dynamo_lambda, dynamo_sqs_queues, 'push_to_dynamo',
+            **stage_batching('push_to_dynamo')
+        )
 
-        # Trigger the Lambda when messages arrive in the Dynamo SQS queue
-        send_to_dynamo_lambda.add_event_source(
-            lambda_event_sources.SqsEventSource(
-                dynamo_sqs_queue,
-                batch_size=1  # Adjust batch size as needed
+        if PIPELINE_MODE == 'fused':
+            # --- Define the Lambda Layer with the libraries of every stage ---
+            fused_pipeline_layer = _lambda.LayerVersion(
+                self, "FusedPipelineLayer",
+                code=_lambda.Code.from_asset("../lambda_layers/fused_pipeline/layer.zip"),
+                compatible_runtimes=[_lambda.Runtime.PYTHON_3_8],
+                description="Lambda layer containing libraries for the fused pipeline Lambda"
             )
-        )
+
+            # Define the Lambda function that scrapes, embeds, upserts and stores metadata in one invocation.
+            # It is deployed with the whole src/ tree so it can reuse the code of every stage.
+            # One function per lane, each with its own reserved concurrency like the scraping Lambdas of the staged mode.
+            for lane, function_id in [('bulk', "FusedPipelineLambda"), ('priority', "FusedPipelinePriorityLambda")]:
+                fused_pipeline_lambda = _lambda.Function(
+                    self, function_id,
+                    runtime=_lambda.Runtime.PYTHON_3_8,
+                    handler="lambda_functions.fused_pipeline.fused_pipeline.lambda_handler",
+                    code=_lambda.Code.from_asset("../src", exclude=LAMBDA_CODE_EXCLUDE),
+                    environment={
+                        'SCRAPINGBEE_API_KEY': os.environ['SCRAPINGBEE_API_KEY'],
+                        'OPENAI_API_KEY': os.environ['OPENAI_API_KEY'],
+                        'PINECONE_API_KEY': os.environ['PINECONE_API_KEY'],
+                        'PINECONE_INDEX_NAME': os.environ['PINECONE_INDEX_NAME'],
+                        'DYNAMODB_TABLE_NAME': dynamo_table.table_name,
+                        'EMBEDDING_MODELS': EMBEDDING_MODELS,
+                        'TEXT_CACHE_BUCKET': text_cache_bucket.bucket_name,
+                        'SCRAPE_QUALITY_THRESHOLD': SCRAPE_QUALITY_THRESHOLD,
+                        **job_tracking_environment,
+                        **profiling_environment
+                    },
+                    timeout=Duration.seconds(300),  # Must cover a full batch through every stage
+                    memory_size=stage_setting('fused_pipeline', 'memory_size', DEFAULT_MEMORY_SIZE),
+                    reserved_concurrent_executions=stage_lane_concurrency('fused_pipeline')[lane],
+                    layers=[fused_pipeline_layer]
+                )
+
+                # Grant the fused Lambda permissions to consume company data and write metadata
+                company_data_queues[lane].grant_consume_messages(fused_pipeline_lambda)
+                dynamo_table.grant_write_data(fused_pipeline_lambda)
+                jobs_table.grant_read_write_data(fused_pipeline_lambda)
+                profiles_bucket.grant_put(fused_pipeline_lambda)
+                text_cache_bucket.grant_put(fused_pipeline_lambda)
+
+                # Trigger the fused Lambda when messages arrive in the company data SQS queue of its lane
+                fused_pipeline_lambda.add_event_source(
+                    lambda_event_sources.SqsEventSource(
+                        company_data_queues[lane],
+                        # Records of a batch are embedded and upserted together
+                        batch_size=stage_setting('fused_pipeline', 'batch_size', 10),
+                        max_batching_window=Duration.seconds(5),
+                        report_batch_item_failures=True  # Only retry the failed messages of a batch
+                    )
+                )
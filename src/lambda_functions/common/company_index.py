@@ -0,0 +1,124 @@
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from . import locations
+
+# Secondary indexes of the CompanyMetadata table:
+# - DomainIndex: domain -> company, one item per domain so it needs no sharding
+# - SizeLocationIndex: "<employee_size>#<shard>" partition, location sort key, serves lookups by size bucket
+# - LocationSizeIndex: "<country>/<region>/<city>#<shard>" partition on the canonical location (see locations.py),
+#   employee_size sort key, serves lookups by location and by location + size bucket
+# A handful of size buckets and locations ('1-10', 'NA', 'USA') hold most companies, so their partition keys are
+# suffixed with a shard derived from the company id. Writes spread over COMPANY_INDEX_SHARDS partitions
+# and reads query every shard in parallel.
+DOMAIN_INDEX = 'DomainIndex'
+SIZE_LOCATION_INDEX = 'SizeLocationIndex'
+LOCATION_SIZE_INDEX = 'LocationSizeIndex'
+
+# Index name -> (partition key, sort key), mirrors the table definition in cdk_stack.py
+INDEX_KEYS = {
+    DOMAIN_INDEX: ('domain', None),
+    SIZE_LOCATION_INDEX: ('size_shard', 'location'),
+    LOCATION_SIZE_INDEX: ('location_shard', 'employee_size'),
+}
+
+COMPANY_INDEX_SHARDS = 8
+
+# Default number of parallel scan segments when no index applies
+SCAN_SEGMENTS = 4
+
+def normalize_domain(company_website):
+    """Reduce a website to its lowercase domain, e.g. https://www.Example.com/about -> example.com."""
+    return re.sub(r"^(https?://)?(www\.)?", "", company_website.strip().lower()).split('/')[0]
+
+def shard_for(company_id):
+    # Derived from the id so an item keeps its shard when it is rewritten
+    return int(hashlib.sha256(company_id.encode('utf-8')).hexdigest()[:8], 16) % COMPANY_INDEX_SHARDS
+
+def sharded_key(value, shard):
+    return f"{value}#{shard:02d}"
+
+def location_key(location_fields):
+    """Join canonical location fields into the location partition value, e.g. 'United States/New York/New York'."""
+    return '/'.join(location_fields[field] for field in reversed(locations.LOCATION_FIELDS))
+
+def resolve_location_key(location):
+    """Get the location partition value of a free-text location."""
+    return location_key(dict(zip(locations.LOCATION_FIELDS, locations.resolve_location(location))))
+
+def index_attributes(item):
+    """Compute the secondary index key attributes of a CompanyMetadata item."""
+    shard = shard_for(item['id'])
+    # Items written before the locations were normalized only have the free-text location
+    if all(field in item for field in locations.LOCATION_FIELDS):
+        location = location_key(item)
+    else:
+        location = resolve_location_key(item['location'])
+    return {
+        'domain': normalize_domain(item['company_website']),
+        'size_shard': sharded_key(item['employee_size'], shard),
+        'location_shard': sharded_key(location, shard)
+    }
+
+def paginate(operation, **kwargs):
+    """Yield the items of every page of a query or scan."""
+    while True:
+        response = operation(**kwargs)
+        for item in response['Items']:
+            yield item
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def query_shards(table, index_name, partition_attribute, value, sort_attribute=None, sort_value=None):
+    """Query every shard of a sharded index partition in parallel and merge the items."""
+    # The table's client is thread-safe where the resource is not, and still converts Python values like the resource
+    client = table.meta.client
+    key_condition = "#pk = :pk"
+    names = {'#pk': partition_attribute}
+    if sort_attribute:
+        key_condition += " AND #sk = :sk"
+        names['#sk'] = sort_attribute
+
+    def query_shard(shard):
+        values = {':pk': sharded_key(value, shard)}
+        if sort_attribute:
+            values[':sk'] = sort_value
+        return list(paginate(
+            client.query, TableName=table.name, IndexName=index_name, KeyConditionExpression=key_condition,
+            ExpressionAttributeNames=names, ExpressionAttributeValues=values
+        ))
+
+    with ThreadPoolExecutor(max_workers=COMPANY_INDEX_SHARDS) as executor:
+        return [item for items in executor.map(query_shard, range(COMPANY_INDEX_SHARDS)) for item in items]
+
+def scan_companies(table, segments=SCAN_SEGMENTS, **scan_kwargs):
+    """Read the whole table with a parallel scan split into segments."""
+    client = table.meta.client
+
+    def scan_segment(segment):
+        return list(paginate(client.scan, TableName=table.name, Segment=segment, TotalSegments=segments, **scan_kwargs))
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        return [item for items in executor.map(scan_segment, range(segments)) for item in items]
+
+def find_by_domain(table, company_website):
+    """Find the company of a website or domain."""
+    return list(paginate(
+        table.meta.client.query, TableName=table.name, IndexName=DOMAIN_INDEX,
+        KeyConditionExpression="#domain = :domain",
+        ExpressionAttributeNames={'#domain': 'domain'},
+        ExpressionAttributeValues={':domain': normalize_domain(company_website)}
+    ))
+
+def find_companies(table, employee_size=None, location=None):
+    """Find the companies of a size bucket and/or location with the matching index, scanning only without criteria.
+
+    The location is resolved like the uploaded ones, so 'NYC' and 'New York, NY' find the same companies.
+    """
+    if location is not None:
+        return query_shards(table, LOCATION_SIZE_INDEX, 'location_shard', resolve_location_key(location),
+                            'employee_size' if employee_size is not None else None, employee_size)
+    if employee_size is not None:
+        return query_shards(table, SIZE_LOCATION_INDEX, 'size_shard', employee_size)
+    return scan_companies(table)
@@ -0,0 +1,44 @@
+import os
+
+# Embedding models the pipeline can write. Both are reduced to the 256 dimensions of the index (their embeddings
+# keep their meaning when truncated) and share the cl100k_base tokenizer, so a text is truncated once for all of them.
+EMBEDDING_MODELS = ('text-embedding-3-small', 'text-embedding-3-large')
+
+# Model of the vectors written before models were versioned, kept in the default namespace of the index
+LEGACY_MODEL = 'text-embedding-3-small'
+
+# Vectors of different models are not comparable, so each model has its own Pinecone namespace; a vector keeps
+# the same id (hash of the company website) in every namespace. Readers query the namespace of the model they
+# embed their queries with.
+#
+# EMBEDDING_MODELS (comma separated) lists the models written by the pipeline. The first one is the primary model;
+# the others are dual-written, embedded in the same pass over the batch. A migration deploys the old and new
+# models, re-embeds the existing companies with src/tools/reembed.py, moves the readers to the new namespace and
+# finally drops the old model.
+
+def validate_model(model):
+    if model not in EMBEDDING_MODELS:
+        raise ValueError(f"Unsupported embedding model {model}, expected one of {EMBEDDING_MODELS}")
+    return model
+
+def namespace(model):
+    """Pinecone namespace of the vectors of a model."""
+    return '' if validate_model(model) == LEGACY_MODEL else model
+
+def write_models():
+    """Models written by the pipeline from EMBEDDING_MODELS, the primary model first."""
+    models = []
+    for model in os.environ.get('EMBEDDING_MODELS', LEGACY_MODEL).split(','):
+        model = model.strip()
+        if model and model not in models:
+            models.append(validate_model(model))
+    return models or [LEGACY_MODEL]
+
+def message_embeddings(message_body):
+    """List the (model, encoded embedding) pairs of a message, the primary model first.
+
+    Messages sent before models were versioned carry a single embedding of the legacy model.
+    """
+    pairs = [(message_body.get('embedding_model', LEGACY_MODEL), message_body['embeddings'])]
+    pairs.extend(message_body.get('extra_embeddings', {}).items())
+    return pairs
@@ -0,0 +1,192 @@
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+import boto3
+
+# Created on first use, so the handlers do not pay for the DynamoDB resource in their cold start
+dynamodb = None
+
+# Progress counters kept for every ingestion job, in pipeline order
+JOB_COUNTERS = ('enqueued', 'scraped', 'skipped', 'embedded', 'upserted', 'stored', 'failed')
+
+# Counters that mean a company has left the pipeline
+TERMINAL_COUNTERS = ('stored', 'skipped', 'failed')
+
+# Companies skipped by the scrape quality gate, with the embedding tokens and Pinecone writes it saved
+SAVINGS_COUNTERS = ('low_quality', 'tokens_saved', 'writes_saved')
+
+# Counter increments are spread over this many items per job so a large job does not become a hot key
+COUNTER_SHARDS = 10
+
+META_ITEM = 'META'
+
+def get_jobs_table():
+    """Get the job tracking table, or None when job tracking is not configured."""
+    global dynamodb
+    table_name = os.environ.get('JOBS_TABLE_NAME')
+    if not table_name:
+        return None
+    if dynamodb is None:
+        dynamodb = boto3.resource('dynamodb')
+    return dynamodb.Table(table_name)
+
+def now_ms():
+    return int(time.time() * 1000)
+
+def is_final_attempt(record):
+    """Check if an SQS record is on its last delivery before being moved to the dead-letter queue."""
+    receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', 1))
+    return receive_count >= int(os.environ.get('MAX_RECEIVE_COUNT', 5))
+
+def carry_job_id(message, message_body):
+    """Copy the job id of an incoming message to the message sent to the next stage."""
+    if message_body.get('job_id'):
+        message['job_id'] = message_body['job_id']
+    return message
+
+def create_job(job_id, bucket, key, table=None):
+    """Record the metadata of a new ingestion job."""
+    table = table or get_jobs_table()
+    if table is None:
+        return
+    try:
+        table.put_item(Item={
+            'job_id': job_id,
+            'item': META_ITEM,
+            'bucket': bucket,
+            'key': key,
+            'created_at': now_ms()
+        })
+    except Exception as e:
+        # Job tracking must never fail the pipeline itself, the upload is parsed without a job record
+        print(f"Failed to create job {job_id}: {str(e)}")
+
+class JobCounters:
+    """Accumulate counter increments during an invocation and write them with one update per job.
+
+    Each flush adds to a randomly chosen counter shard of the job, so concurrent Lambdas
+    working on the same job spread their writes over COUNTER_SHARDS items.
+    """
+
+    def __init__(self):
+        self.counts = defaultdict(Counter)
+        # The fused pipeline adds from its scraping threads
+        self.lock = threading.Lock()
+
+    def add(self, job_id, counter, n=1):
+        # Messages without a job id (e.g. sent before job tracking existed) are not tracked
+        if job_id and n:
+            with self.lock:
+                self.counts[job_id][counter] += n
+
+    def flush(self, table=None):
+        table = table or get_jobs_table()
+        if table is None:
+            self.counts.clear()
+            return
+
+        for job_id, counts in self.counts.items():
+            names = {}
+            values = {':now': now_ms()}
+            additions = []
+            updates = []
+            for counter, n in counts.items():
+                names[f'#{counter}'] = counter
+                names[f'#{counter}_at'] = f'{counter}_at'
+                values[f':{counter}'] = n
+                additions.append(f'#{counter} :{counter}')
+                updates.append(f'#{counter}_at = :now')
+
+            try:
+                table.update_item(
+                    Key={'job_id': job_id, 'item': f'COUNTER#{random.randrange(COUNTER_SHARDS):02d}'},
+                    UpdateExpression=f"ADD {', '.join(additions)} SET {', '.join(updates)}",
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values
+                )
+            except Exception as e:
+                # Job tracking must never fail the pipeline itself
+                print(f"Failed to update job counters for {job_id}: {str(e)}")
+
+        self.counts.clear()
+
+def get_job_progress(job_id, table=None, now=None):
+    """Sum the counter shards of a job and compute its completion, stage throughput and ETA."""
+    # Only the job status tools read the jobs, the stages do not import the condition builders
+    from boto3.dynamodb.conditions import Key
+
+    table = table or get_jobs_table()
+    now = now or now_ms()
+
+    items = []
+    query = {'KeyConditionExpression': Key('job_id').eq(job_id)}
+    while True:
+        response = table.query(**query)
+        items.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            break
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    meta = next((item for item in items if item['item'] == META_ITEM), None)
+    if meta is None:
+        return None
+
+    created_at = int(meta['created_at'])
+    counters = {counter: 0 for counter in JOB_COUNTERS}
+    savings = {counter: 0 for counter in SAVINGS_COUNTERS}
+    last_updates = {}
+    for item in items:
+        if item['item'] == META_ITEM:
+            continue
+        for counter in JOB_COUNTERS:
+            counters[counter] += int(item.get(counter, 0))
+            if f'{counter}_at' in item:
+                last_updates[counter] = max(last_updates.get(counter, 0), int(item[f'{counter}_at']))
+        for counter in SAVINGS_COUNTERS:
+            savings[counter] += int(item.get(counter, 0))
+
+    # Throughput of a stage in companies per second since the job was created
+    throughput = {}
+    for counter in JOB_COUNTERS:
+        elapsed = (last_updates.get(counter, created_at) - created_at) / 1000
+        throughput[counter] = counters[counter] / elapsed if elapsed > 0 else 0.0
+
+    done = sum(counters[counter] for counter in TERMINAL_COUNTERS)
+    remaining = max(counters['enqueued'] - done, 0)
+    completion = min(done / counters['enqueued'], 1.0) if counters['enqueued'] else 0.0
+
+    # Estimate the remaining time from the rate at which companies leave the pipeline
+    elapsed = (now - created_at) / 1000
+    done_rate = done / elapsed if elapsed > 0 else 0.0
+    eta_seconds = remaining / done_rate if done_rate > 0 else None
+
+    return {
+        'job_id': job_id,
+        'bucket': meta.get('bucket'),
+        'key': meta.get('key'),
+        'created_at': created_at,
+        'counters': counters,
+        'savings': savings,
+        'completion': completion,
+        'throughput': throughput,
+        'eta_seconds': 0.0 if counters['enqueued'] and remaining == 0 else eta_seconds
+    }
+
+def list_jobs(table=None):
+    """List the metadata of every ingestion job, most recent first."""
+    from boto3.dynamodb.conditions import Attr
+
+    table = table or get_jobs_table()
+
+    jobs = []
+    scan = {'FilterExpression': Attr('item').eq(META_ITEM)}
+    while True:
+        response = table.scan(**scan)
+        jobs.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
@@ -0,0 +1,42 @@
+import os
+
+# Uploads are processed in two lanes so a large backfill cannot starve small interactive uploads:
+# every stage queue has a priority twin, and each lane is consumed with its own concurrency
+# (reserved concurrency of the first stage, event source max concurrency downstream, see cdk_stack.py)
+PRIORITY_LANE = 'priority'
+BULK_LANE = 'bulk'
+LANES = (PRIORITY_LANE, BULK_LANE)
+
+# S3 prefixes forcing the lane of an upload, e.g. s3://bucket/priority/customer.csv
+LANE_PREFIXES = {PRIORITY_LANE: 'priority/', BULK_LANE: 'bulk/'}
+
+# Uploads with at most this many rows go to the priority lane when no prefix forces the lane
+PRIORITY_MAX_ROWS = 1000
+
+def classify_upload(key, n_rows, max_priority_rows=None):
+    """Choose the lane of an uploaded CSV file from its S3 prefix, or else from its number of rows."""
+    for lane, prefix in LANE_PREFIXES.items():
+        if key.startswith(prefix):
+            return lane
+
+    if max_priority_rows is None:
+        max_priority_rows = int(os.environ.get('PRIORITY_MAX_ROWS', PRIORITY_MAX_ROWS))
+    return PRIORITY_LANE if n_rows <= max_priority_rows else BULK_LANE
+
+def lane_variable(variable, lane):
+    # The bulk lane uses the original queues, e.g. EMBEDDING_QUEUE_URL and PRIORITY_EMBEDDING_QUEUE_URL
+    return f"PRIORITY_{variable}" if lane == PRIORITY_LANE else variable
+
+def queue_url(variable, message_body):
+    """Get the URL of the next queue in the lane of a message, from the queue's environment variable.
+
+    Messages without a lane (sent before lanes existed) and deployments without priority queues use the bulk queue.
+    """
+    lane = message_body.get('lane', BULK_LANE)
+    return os.environ.get(lane_variable(variable, lane)) or os.environ.get(variable)
+
+def carry_lane(message, message_body):
+    """Copy the lane of an incoming message to the message sent to the next stage."""
+    if message_body.get('lane'):
+        message['lane'] = message_body['lane']
+    return message
@@ -0,0 +1,174 @@
+import csv
+import functools
+import itertools
+import os
+import re
+from collections import defaultdict
+
+# Canonical location fields added to every company message next to the free-text location
+LOCATION_FIELDS = ('city', 'region', 'country')
+
+# Offline gazetteer of countries, regions and cities with their alternative spellings,
+# can be replaced by a larger export (same columns) with the GAZETTEER_PATH environment variable
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), 'gazetteer.csv')
+
+# Number of distinct location strings memoized per process
+LOCATION_CACHE_SIZE = 65536
+
+# Values that mean the location is unknown
+UNKNOWN_LOCATIONS = {'', 'na', 'n a', 'none', 'null', 'unknown', 'remote', 'worldwide', 'global', 'anywhere'}
+
+# Words around a place name that do not change the place ("Greater Boston Area", "Bay Area")
+NOISE_WORDS = re.compile(r"\b(greater|metropolitan|metro|bay|area|region|city of)\b")
+
+# Specificity of each kind of gazetteer entry, used to rank interpretations of a location
+SPECIFICITY = {'city': 3, 'region': 2, 'country': 1}
+
+# Only the last comma-separated parts are resolved (street addresses and other details come first), so a long
+# location string in an uploaded CSV cannot make the resolution slow
+MAX_LOCATION_PARTS = 6
+
+# Unknown place names kept as the city in front of a resolved region ("London, Ontario"): letters only, a few words
+CITY_NAME = re.compile(r"[^\W\d_]+(?: [^\W\d_]+){0,2}")
+
+UNRESOLVED = ('NA', 'NA', 'NA')
+
+# Lookups and resolved lookups since the last reset, for the hit rate report
+_stats = {'lookups': 0, 'resolved': 0}
+
+def normalize_key(text):
+    """Lowercase a place name and drop its punctuation, e.g. 'St. Louis, MO' -> 'st louis, mo'."""
+    text = text.lower().replace('.', '')
+    return ' '.join(re.sub(r"[^\w\s,]", " ", text).split())
+
+@functools.lru_cache(maxsize=None)
+def load_gazetteer(path=None):
+    """Load the gazetteer into alias -> [(kind, city, region, country)] lookups."""
+    path = path or os.environ.get('GAZETTEER_PATH', GAZETTEER_PATH)
+    aliases = defaultdict(list)
+    with open(path, encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            kind = row['kind']
+            entry = (
+                kind,
+                row['name'] if kind == 'city' else None,
+                row['region'] or None,
+                row['country']
+            )
+            for alias in [row['name']] + [alias for alias in row['aliases'].split('|') if alias]:
+                key = normalize_key(alias)
+                if entry not in aliases[key]:
+                    aliases[key].append(entry)
+    return dict(aliases)
+
+def candidates(part, gazetteer, max_entries=len(SPECIFICITY)):
+    """Interpretations of one comma-separated part of a location, as lists of at most max_entries entries."""
+    if part in gazetteer:
+        return [[entry] for entry in gazetteer[part]]
+
+    # "Greater Boston Area" -> "boston"
+    stripped = ' '.join(NOISE_WORDS.sub(' ', part).split())
+    if stripped != part and stripped in gazetteer:
+        return [[entry] for entry in gazetteer[stripped]]
+
+    # Parts without separators like "Austin TX" or "Toronto ON Canada": split off the trailing words
+    # (a location names at most one place of each kind, which bounds the recursion)
+    words = part.split()
+    results = []
+    if max_entries < 2:
+        return results
+    for n_tail in range(1, min(3, len(words) - 1) + 1):
+        head, tail = ' '.join(words[:-n_tail]), ' '.join(words[-n_tail:])
+        if tail in gazetteer:
+            for head_entries in candidates(head, gazetteer, max_entries - 1):
+                results.extend(head_entries + [entry] for entry in gazetteer[tail])
+    return results
+
+def consistent(entries):
+    """Check that the entries name at most one place of each kind and that those places contain each other."""
+    kinds = [entry[0] for entry in entries]
+    if len(set(kinds)) != len(kinds):
+        return False
+    if len({entry[3] for entry in entries}) > 1:
+        return False
+    return len({entry[2] for entry in entries if entry[2]}) <= 1
+
+def rank(combination):
+    # Prefer the interpretations matching more parts, written from the most to the least specific
+    # place ("Seattle, Washington" is a city and its state), matching the last part which is the
+    # most reliable one ("Cambridge, UK" is not Cambridge, Massachusetts) and naming the most specific place
+    entries = [entry for part_entries in combination for entry in part_entries]
+    specificities = [SPECIFICITY[entry[0]] for entry in entries]
+    in_order = all(a > b for a, b in zip(specificities, specificities[1:]))
+    return len(entries), in_order, bool(combination[-1]), max(specificities)
+
+@functools.lru_cache(maxsize=LOCATION_CACHE_SIZE)
+def resolve_location(location):
+    """Resolve a free-text location to a canonical (city, region, country) tuple, 'NA' for unknown fields."""
+    key = normalize_key(location or '')
+    if key in UNKNOWN_LOCATIONS:
+        return UNRESOLVED
+
+    gazetteer = load_gazetteer()
+    parts = [part.strip() for part in re.split(r",|;|/|\||\s-\s", key) if part.strip()][-MAX_LOCATION_PARTS:]
+
+    # A consistent combination names at most one place of each kind, so at most that many parts match:
+    # the other parts are left empty instead of trying every combination of every part
+    best = None
+    options = [candidates(part, gazetteer) for part in parts]
+    for n_matched in range(1, len(SPECIFICITY) + 1):
+        for matched in itertools.combinations(range(len(parts)), n_matched):
+            for chosen in itertools.product(*(options[i] for i in matched)):
+                combination = [[] for _ in parts]
+                for i, part_entries in zip(matched, chosen):
+                    combination[i] = part_entries
+                entries = [entry for part_entries in chosen for entry in part_entries]
+                if consistent(entries) and (best is None or rank(combination) > rank(best)):
+                    best = combination
+
+    if best is None:
+        return UNRESOLVED
+
+    # The most specific entry carries the enclosing region and country
+    entries = [entry for part_entries in best for entry in part_entries]
+    kind, city, region, country = max(entries, key=lambda entry: SPECIFICITY[entry[0]])
+
+    # A place name left unmatched just before the region is a city missing from the gazetteer, or a city of
+    # the same name elsewhere ("London, Ontario" is not London, England): keep it rather than drop the city
+    if kind == 'region':
+        region_part = next(i for i, part_entries in enumerate(best) if part_entries)
+        if region_part > 0 and not best[region_part - 1]:
+            name = ' '.join(NOISE_WORDS.sub(' ', parts[region_part - 1]).split())
+            if CITY_NAME.fullmatch(name):
+                city = name.title()
+    return city or 'NA', region or 'NA', country
+
+def normalize_location(location):
+    """Get the canonical city, region and country fields of a free-text location."""
+    resolved = resolve_location(location)
+    _stats['lookups'] += 1
+    if resolved is not UNRESOLVED:
+        _stats['resolved'] += 1
+    return dict(zip(LOCATION_FIELDS, resolved))
+
+def location_stats():
+    """Report the cache hit rate of the memoized lookups and the share of locations found in the gazetteer."""
+    cache = resolve_location.cache_info()
+    lookups = _stats['lookups']
+    return {
+        'lookups': lookups,
+        'cache_hit_rate': round(cache.hits / max(cache.hits + cache.misses, 1), 4),
+        'resolved_rate': round(_stats['resolved'] / max(lookups, 1), 4),
+        'cached_locations': cache.currsize
+    }
+
+def reset_stats():
+    resolve_location.cache_clear()
+    _stats.update(lookups=0, resolved=0)
+
+def carry_location(message, message_body):
+    """Copy the canonical location fields of an incoming message to the message sent to the next stage."""
+    for field in LOCATION_FIELDS:
+        if field in message_body:
+            message[field] = message_body[field]
+    return message
@@ -0,0 +1,190 @@
+import functools
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import boto3
+
+# Opt-in profiling of a fraction of the handler invocations, configured by environment variables:
+# - PROFILE_SAMPLE_RATE: fraction of invocations profiled, 0 (default) disables profiling, 1 profiles every invocation
+# - PROFILE_MODE: 'sample' (default) records the stacks of every thread at a fixed interval, wall clock time
+#   spent waiting on the network included; 'cprofile' records every function call (slower, exact call counts)
+# - PROFILE_TRACEMALLOC_FRAMES: frames kept per allocation traceback by tracemalloc, 0 disables memory tracing
+# - PROFILE_BUCKET: S3 bucket receiving the profiles, or else they are written to PROFILE_DIR
+# Each profiled invocation writes <stage>/<date>/<request id>.* files, read by src/tools/view_profile.py
+PROFILE_MODES = ('sample', 'cprofile')
+
+# Interval between two stack samples of the sampling profiler
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+# Frames of each traceback kept by tracemalloc (every extra frame slows allocations down), and allocation sites
+# listed in the summary
+TRACEMALLOC_FRAMES = 1
+TOP_ALLOCATIONS = 20
+
+PROFILE_PREFIX = 'profiles/'
+
+# Created on the first profiled invocation, so cold starts without profiling do not pay for it
+s3 = None
+
+def sample_rate():
+    try:
+        return float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    except ValueError:
+        return 0.0
+
+def tracemalloc_frames():
+    try:
+        return int(os.environ.get('PROFILE_TRACEMALLOC_FRAMES') or TRACEMALLOC_FRAMES)
+    except ValueError:
+        return TRACEMALLOC_FRAMES
+
+def profiled(stage):
+    """Decorate a Lambda handler so a PROFILE_SAMPLE_RATE fraction of its invocations is profiled."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            rate = sample_rate()
+            if rate <= 0 or random.random() >= rate:
+                return handler(event, context)
+            return run_profiled(stage, handler, event, context)
+        return wrapper
+    return decorator
+
+def frame_name(frame):
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+def thread_name(thread_id, threads):
+    # Pool threads are numbered per worker ("ThreadPoolExecutor-0_3"), their stacks are merged per pool
+    name = threads.get(thread_id, 'thread')
+    return re.sub(r'_\d+$', '', name)
+
+class StackSampler:
+    """Sampling profiler counting the folded stacks of every thread, the input format of flame graph tools."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profiling-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            threads = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                stack.append(thread_name(thread_id, threads))
+                folded = ";".join(reversed(stack))
+                self.stacks[folded] = self.stacks.get(folded, 0) + 1
+            self.samples += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+def top_allocations(snapshot, limit=TOP_ALLOCATIONS):
+    return [
+        {'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", 'size_bytes': stat.size, 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+
+def run_profiled(stage, handler, event, context):
+    """Invoke the handler under the profiler and tracemalloc, then write the profile. Never fails the invocation."""
+    import cProfile
+    import tracemalloc
+
+    mode = os.environ.get('PROFILE_MODE', 'sample')
+    if mode not in PROFILE_MODES:
+        mode = 'sample'
+    profiler = cProfile.Profile() if mode == 'cprofile' else StackSampler()
+    frames = tracemalloc_frames()
+    tracing_memory = frames > 0 and not tracemalloc.is_tracing()
+    if tracing_memory:
+        tracemalloc.start(frames)
+
+    start = time.perf_counter()
+    if mode == 'cprofile':
+        profiler.enable()
+    else:
+        profiler.start()
+    try:
+        return handler(event, context)
+    finally:
+        duration = time.perf_counter() - start
+        if mode == 'cprofile':
+            profiler.disable()
+        else:
+            profiler.stop()
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        _, peak_traced = tracemalloc.get_traced_memory()
+        if tracing_memory:
+            tracemalloc.stop()
+
+        try:
+            request_id = getattr(context, 'aws_request_id', None) or str(uuid.uuid4())
+            summary = {
+                'stage': stage,
+                'request_id': request_id,
+                'mode': mode,
+                'duration_s': duration,
+                'records': len(event.get('Records', [])) if isinstance(event, dict) else None,
+                'samples': profiler.samples if mode == 'sample' else None,
+                'peak_traced_bytes': peak_traced,
+                'top_allocations': top_allocations(snapshot) if snapshot else [],
+            }
+            write_profile(stage, request_id, profiler, snapshot, summary)
+        except Exception as e:
+            print(f"Failed to write the profile of {stage}: {str(e)}")
+
+def write_profile(stage, request_id, profiler, snapshot, summary):
+    """Write the profile files of an invocation to PROFILE_BUCKET, or else to PROFILE_DIR."""
+    global s3
+    key_prefix = f"{PROFILE_PREFIX}{stage}/{time.strftime('%Y-%m-%d', time.gmtime())}/{request_id}"
+    bucket = os.environ.get('PROFILE_BUCKET')
+    directory = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'profiles'))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        files = {'.json': json.dumps(summary, indent=2).encode('utf-8')}
+        if isinstance(profiler, StackSampler):
+            files['.folded'] = profiler.folded().encode('utf-8')
+        else:
+            stats_path = os.path.join(work_dir, 'profile.pstats')
+            profiler.dump_stats(stats_path)
+            with open(stats_path, 'rb') as f:
+                files['.pstats'] = f.read()
+        if snapshot is not None:
+            snapshot_path = os.path.join(work_dir, 'snapshot.tracemalloc')
+            snapshot.dump(snapshot_path)
+            with open(snapshot_path, 'rb') as f:
+                files['.tracemalloc'] = f.read()
+
+    for extension, body in files.items():
+        if bucket:
+            if s3 is None:
+                s3 = boto3.client('s3')
+            s3.put_object(Bucket=bucket, Key=key_prefix + extension, Body=body)
+        else:
+            path = os.path.join(directory, key_prefix + extension)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(body)
+
+    print(f"Profiled {stage} invocation {request_id} in {summary['duration_s']:.3f}s: {key_prefix}")
@@ -0,0 +1,68 @@
+import base64
+import struct
+
+# Embedding quantization, applied after L2 normalization.
+# - float16: half precision, 2 bytes per value
+# - int8: symmetric per-vector scale (max |value| / 127), 1 byte per value plus the scale
+# Single vectors are encoded for queue transport with struct, so the Lambdas do not need numpy.
+# The batch functions are vectorized with numpy for the local store and offline evaluation.
+QUANTIZATION_MODES = ('none', 'float16', 'int8')
+
+INT8_MAX = 127
+
+def validate_mode(mode):
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unsupported quantization {mode}, expected one of {QUANTIZATION_MODES}")
+    return mode
+
+def encode_embedding(values, mode):
+    """Quantize an embedding into a JSON serializable message field; 'none' keeps the list of floats."""
+    validate_mode(mode)
+    if mode == 'none':
+        return list(values)
+
+    if mode == 'float16':
+        data = struct.pack(f'<{len(values)}e', *values)
+        return {'dtype': 'float16', 'data': base64.b64encode(data).decode('ascii')}
+
+    scale = max((abs(value) for value in values), default=0.0) / INT8_MAX or 1.0
+    codes = [max(-INT8_MAX, min(INT8_MAX, round(value / scale))) for value in values]
+    data = struct.pack(f'<{len(codes)}b', *codes)
+    return {'dtype': 'int8', 'scale': scale, 'data': base64.b64encode(data).decode('ascii')}
+
+def decode_embedding(encoded):
+    """Decode a message field written by encode_embedding back to a list of floats."""
+    # Messages sent without quantization, or before it existed, carry the plain list
+    if isinstance(encoded, list):
+        return encoded
+
+    data = base64.b64decode(encoded['data'])
+    if encoded['dtype'] == 'float16':
+        return list(struct.unpack(f'<{len(data) // 2}e', data))
+    if encoded['dtype'] == 'int8':
+        scale = encoded['scale']
+        return [code * scale for code in struct.unpack(f'<{len(data)}b', data)]
+    raise ValueError(f"Unsupported embedding dtype {encoded['dtype']}")
+
+def quantize(matrix, mode):
+    """Quantize a batch of embeddings (one per row) and return the codes and the int8 row scales (None otherwise)."""
+    import numpy as np
+
+    validate_mode(mode)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if mode == 'none':
+        return matrix, None
+    if mode == 'float16':
+        return matrix.astype(np.float16), None
+
+    scales = np.abs(matrix).max(axis=1) / INT8_MAX
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize(codes, scales=None):
+    """Convert a batch of quantized embeddings back to float32."""
+    import numpy as np
+
+    values = np.asarray(codes).astype(np.float32)
+    return values * scales[:, None] if scales is not None else values
@@ -0,0 +1,41 @@
+import gzip
+import hashlib
+import os
+import boto3
+
+# Cache of the scraped text of every company in S3 (TEXT_CACHE_BUCKET), so the companies can be embedded again with
+# another model without scraping their websites again (see src/tools/reembed.py). The key is derived from the
+# website like the vector id, and the text is gzip compressed. Without TEXT_CACHE_BUCKET nothing is cached.
+TEXT_CACHE_PREFIX = 'texts/'
+
+# Created on first use, so stages and tools without a cache do not pay for it
+s3 = None
+
+def get_s3():
+    global s3
+    if s3 is None:
+        s3 = boto3.client('s3')
+    return s3
+
+def text_key(company_website):
+    return f"{TEXT_CACHE_PREFIX}{hashlib.sha256(company_website.encode('utf-8')).hexdigest()}.txt.gz"
+
+def put_text(company_website, text, bucket=None):
+    """Cache the scraped text of a company website, returns False when no cache is configured."""
+    bucket = bucket or os.environ.get('TEXT_CACHE_BUCKET')
+    if not bucket:
+        return False
+    get_s3().put_object(
+        Bucket=bucket, Key=text_key(company_website), Body=gzip.compress(text.encode('utf-8')),
+        ContentType='text/plain', ContentEncoding='gzip'
+    )
+    return True
+
+def get_text(company_website, bucket=None):
+    """Get the cached scraped text of a company website, or None when it was never cached."""
+    bucket = bucket or os.environ.get('TEXT_CACHE_BUCKET')
+    try:
+        response = get_s3().get_object(Bucket=bucket, Key=text_key(company_website))
+    except get_s3().exceptions.NoSuchKey:
+        return None
+    return gzip.decompress(response['Body'].read()).decode('utf-8')
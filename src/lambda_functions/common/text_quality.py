@@ -0,0 +1,149 @@
+import math
+import os
+import re
+from collections import Counter
+
+# Quality score of a scraped page, between 0 (nothing worth embedding) and 1 (company content), so get_texts can
+# skip parked domains, cookie banners, error pages, login walls and bot challenges before paying for embeddings.
+# Signals, each between 0 and 1:
+# - language: share of the words that are function words ("the", "und", "de", ...) of the best matching language,
+#   near 0 for code, file listings and lists of links (single letters are left out, they are common in code).
+#   Pages written mostly in other scripts than the Latin one are not judged on it.
+# - boilerplate: 1 minus the share of the words from cookie banners, login forms and navigation. Company pages
+#   often carry a cookie banner or a login link, so these only count as words, never as known phrases
+# - uniqueness: distinct words over the first words of the page, low for repeated menus and placeholders
+# The score is the weighted geometric mean of the signals, so a page failing one of them scores low whatever the
+# others, discounted by the known phrases of parked domains, error pages and bot challenges found: each phrase
+# discounts the score of a short page much more than the score of a long page.
+# Pages are scored in plain Python, so get_texts does not need numpy. Accuracy and throughput are measured by
+# tests/benchmarks/bench_text_quality.py.
+
+# Pages scoring below the threshold are skipped, configurable with SCRAPE_QUALITY_THRESHOLD. The gate is off (0)
+# until the threshold is calibrated on labeled pages scraped in production
+QUALITY_THRESHOLD = 0.0
+
+# Weights (exponents) of the language, boilerplate and uniqueness signals
+SIGNAL_WEIGHTS = (0.4, 0.3, 0.3)
+
+# Function word share of ordinary prose in the supported languages, and boilerplate share of a page made only of it
+LANGUAGE_TARGET = 0.15
+BOILERPLATE_MAX = 0.3
+
+# Distinct words are counted over the first words of the page, so the ratio does not depend on the page length
+UNIQUE_WINDOW = 200
+UNIQUE_TARGET = 0.5
+
+# Every known phrase found discounts the score as if it stood for this many words of the page
+PHRASE_WORDS = 40
+
+# The embedding tokens of a skipped page are estimated without a tokenizer (about 4 characters per token with
+# cl100k_base), up to the truncation of get_embeddings
+CHARS_PER_TOKEN = 4
+MAX_EMBEDDING_TOKENS = 8000
+
+FUNCTION_WORDS = {
+    'en': {'the', 'and', 'of', 'to', 'in', 'is', 'for', 'that', 'on', 'with', 'as', 'are', 'by', 'our', 'we',
+           'you', 'your', 'it', 'be', 'from', 'at', 'or', 'an', 'this', 'have', 'has', 'will', 'can', 'their', 'more',
+           'all', 'us', 'who', 'which', 'every', 'its', 'into', 'than', 'so', 'was', 'they', 'since', 'over'},
+    'de': {'der', 'die', 'das', 'und', 'in', 'den', 'von', 'zu', 'mit', 'ist', 'für', 'auf', 'des', 'dem', 'nicht',
+           'ein', 'eine', 'als', 'auch', 'es', 'an', 'wir', 'sie', 'bei', 'unsere', 'unser', 'seit', 'aus', 'vor', 'bis'},
+    'es': {'de', 'la', 'que', 'el', 'en', 'los', 'se', 'del', 'las', 'un', 'por', 'con', 'una', 'su', 'para',
+           'es', 'al', 'lo', 'como', 'más', 'sus', 'nuestro', 'nuestra', 'somos', 'desde', 'sin', 'le', 'nos'},
+    'fr': {'de', 'la', 'le', 'et', 'les', 'des', 'en', 'un', 'une', 'du', 'est', 'pour', 'que', 'qui', 'dans', 'par',
+           'sur', 'au', 'avec', 'nous', 'vous', 'nos', 'notre', 'votre', 'aux', 'ce', 'son', 'sa', 'ses', 'depuis'},
+    'pt': {'de', 'que', 'do', 'da', 'em', 'um', 'para', 'com', 'uma', 'os', 'no', 'se', 'na', 'por',
+           'mais', 'as', 'dos', 'como', 'ao', 'das', 'nossa', 'nosso', 'seu', 'sua', 'desde', 'somos', 'nos'},
+    'it': {'di', 'il', 'la', 'che', 'in', 'per', 'un', 'del', 'della', 'una', 'con', 'non', 'le', 'si',
+           'da', 'dei', 'al', 'nel', 'sono', 'alla', 'gli', 'delle', 'nostra', 'nostro', 'dal', 'siamo', 'dalla', 'ed'},
+    'nl': {'de', 'het', 'een', 'van', 'en', 'in', 'is', 'op', 'te', 'dat', 'voor', 'met', 'zijn', 'aan', 'niet',
+           'ook', 'als', 'bij', 'door', 'wij', 'we', 'onze', 'ons', 'uw', 'naar', 'om', 'tot', 'sinds', 'uit', 'over'},
+}
+
+BOILERPLATE_WORDS = {
+    'cookie', 'cookies', 'consent', 'accept', 'reject', 'decline', 'preferences', 'settings', 'privacy', 'policy',
+    'terms', 'gdpr', 'imprint', 'necessary', 'login', 'log', 'logged', 'sign', 'signup', 'password', 'username',
+    'forgot', 'register', 'menu', 'home', 'skip', 'navigation', 'cart', 'checkout', 'search', 'loading',
+    'javascript', 'browser', 'enable', 'cloudflare', 'copyright', 'rights', 'reserved',
+}
+
+# Languages of every function word, so the words of a page are looked up once for all the languages
+WORD_LANGUAGES = {}
+for _language, _words in FUNCTION_WORDS.items():
+    for _word in _words:
+        WORD_LANGUAGES.setdefault(_word, []).append(_language)
+
+# Phrases of parked domains, hosting and error pages, bot challenges and placeholders,
+# matched on the lowercase text from word starts only (the alternatives are not tried at every character)
+LOW_VALUE_PHRASES = re.compile(r"\b(?:" + "|".join([
+    r"domain (?:name )?(?:\S+ )?(?:is|may be) for sale", r"(?:buy|get) this domain", r"make an offer",
+    r"related searches", r"parked (?:for free|domain)", r"page is parked", r"domain (?:owner|has been registered)",
+    r"sedo\b", r"hugedomains", r"premium domains", r"under construction",
+    r"404 (?:error|not found|page)", r"error 404", r"page not found", r"403 forbidden", r"access denied",
+    r"internal server error", r"service (?:temporarily )?unavailable", r"bad gateway", r"account (?:has been )?suspended",
+    r"welcome to nginx", r"index of /", r"server at \S+ port \d+", r"checking your browser", r"just a moment",
+    r"attention required", r"you have been blocked", r"ray id", r"ddos protection", r"lorem ipsum",
+]) + ")")
+
+WORD = re.compile(r"[^\W\d_]+")
+
+# Words starting with a character above Latin Extended-B are written in another script
+LATIN_SCRIPT_END = '\u0250'
+
+def quality_threshold():
+    try:
+        return float(os.environ.get('SCRAPE_QUALITY_THRESHOLD') or QUALITY_THRESHOLD)
+    except ValueError:
+        return QUALITY_THRESHOLD
+
+def text_features(text):
+    """Compute the quality signals of a scraped text, before they are weighted into a score."""
+    lowered = text.lower()
+    words = WORD.findall(lowered)
+    n_words = len(words)
+
+    # Occurrences of every distinct word, then of the function words of each language and of the boilerplate words
+    counts = Counter(words)
+    shares = dict.fromkeys(FUNCTION_WORDS, 0)
+    for word in counts.keys() & WORD_LANGUAGES.keys():
+        for language in WORD_LANGUAGES[word]:
+            shares[language] += counts[word]
+    language = max(shares, key=shares.get)
+    boilerplate = sum(counts[word] for word in counts.keys() & BOILERPLATE_WORDS)
+
+    latin_words = sum(count for word, count in counts.items() if word < LATIN_SCRIPT_END)
+    if latin_words * 2 < n_words:
+        language, function_word_ratio = 'other', 1.0
+    else:
+        language = language if shares[language] else None
+        function_word_ratio = shares[language] / n_words if language else 0.0
+
+    window = words[:UNIQUE_WINDOW]
+    return {
+        'words': n_words,
+        'language': language,
+        'function_word_ratio': function_word_ratio,
+        'boilerplate_ratio': boilerplate / n_words if n_words else 1.0,
+        'unique_ratio': len(set(window)) / len(window) if window else 0.0,
+        'phrase_hits': len(LOW_VALUE_PHRASES.findall(lowered)),
+    }
+
+def score_features(features):
+    """Weight the signals of text_features into a score between 0 and 1."""
+    if not features['words']:
+        return 0.0
+    language = min(features['function_word_ratio'] / LANGUAGE_TARGET, 1.0)
+    boilerplate = 1.0 - min(features['boilerplate_ratio'] / BOILERPLATE_MAX, 1.0)
+    uniqueness = min(features['unique_ratio'] / UNIQUE_TARGET, 1.0)
+    phrases = max(1.0 - features['phrase_hits'] * PHRASE_WORDS / features['words'], 0.0)
+    language_weight, boilerplate_weight, uniqueness_weight = SIGNAL_WEIGHTS
+    return phrases * language ** language_weight * boilerplate ** boilerplate_weight * uniqueness ** uniqueness_weight
+
+def score_text(text):
+    return score_features(text_features(text))
+
+def estimated_tokens(text):
+    return min(math.ceil(len(text) / CHARS_PER_TOKEN), MAX_EMBEDDING_TOKENS)
+
+def savings(text, n_models=1):
+    """Embedding tokens and Pinecone writes saved by skipping a page embedded with n_models models."""
+    return {'tokens_saved': estimated_tokens(text) * n_models, 'writes_saved': n_models}
@@ -0,0 +1,194 @@
+import json
+import os
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+
+# The fused worker is deployed with the whole src/ tree so it can reuse the stage logic in process
+from ..get_texts import get_texts
+from ..get_embeddings import get_embeddings
+from ..push_to_pinecone import push_to_pinecone
+from ..push_to_dynamo import push_to_dynamo
+from ..common import job_tracking
+from ..common import quantization
+from ..common import locations
+from ..common import embedding_models
+from ..common import profiling
+
+# Initialize DynamoDB client
+dynamodb = boto3.resource('dynamodb')
+
+# Number of websites scraped concurrently (scraping is I/O bound)
+SCRAPE_CONCURRENCY = 8
+
+# Maximum number of vectors per Pinecone upsert request
+PINECONE_UPSERT_BATCH_SIZE = 100
+
+@profiling.profiled('fused_pipeline')
+def lambda_handler(event, context):
+    # Extract environment variables
+    PINECONE_INDEX_NAME = os.environ.get('PINECONE_INDEX_NAME')
+    DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')
+    scrape_concurrency = int(os.environ.get('SCRAPE_CONCURRENCY', SCRAPE_CONCURRENCY))
+
+    # Initialize the clients once for the whole batch
+    index = push_to_pinecone.get_pinecone_client().Index(PINECONE_INDEX_NAME)
+    table = dynamodb.Table(DYNAMODB_TABLE_NAME)
+    client = get_embeddings.get_openai_client()
+    encoding = get_embeddings.get_encoding()
+
+    # Message ids that failed and should be retried (partial batch response)
+    batch_item_failures = []
+
+    # Job progress counters, written once for the whole batch
+    counters = job_tracking.JobCounters()
+
+    batch = []
+    for record in event['Records']:
+        try:
+            batch.append((record['messageId'], json.loads(record['body'])))
+        except Exception as e:
+            print(f"Failed to parse message {record.get('messageId')}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': record.get('messageId')})
+
+    failed_ids = run_pipeline(batch, index, table, client, encoding, scrape_concurrency, counters)
+    batch_item_failures.extend({'itemIdentifier': message_id} for message_id in failed_ids)
+
+    # Count the messages that failed on their last delivery before the dead-letter queue
+    records = {record['messageId']: record for record in event['Records']}
+    job_ids = {message_id: company.get('job_id') for message_id, company in batch}
+    for message_id in failed_ids:
+        if job_tracking.is_final_attempt(records[message_id]):
+            counters.add(job_ids[message_id], 'failed')
+    counters.flush()
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps('Fused pipeline completed'),
+        'batchItemFailures': batch_item_failures
+    }
+
+def run_pipeline(batch, index, table, client, encoding, scrape_concurrency=SCRAPE_CONCURRENCY, counters=None):
+    """Run scrape, embed, upsert and metadata storage on a batch of (message_id, company) pairs.
+
+    Records are passed between stages as in-memory batches. Returns the ids of the
+    messages that failed in any stage.
+    """
+    counters = counters or job_tracking.JobCounters()
+    job_ids = {message_id: company.get('job_id') for message_id, company in batch}
+    failed_ids = []
+
+    def count(stage_output, counter):
+        for message_id, _ in stage_output:
+            counters.add(job_ids[message_id], counter)
+
+    # Stage 1: scrape the websites concurrently
+    scraped = scrape_batch(batch, scrape_concurrency, failed_ids, counters)
+    count(scraped, 'scraped')
+    scraped_ids = {message_id for message_id, _ in scraped}
+    count([item for item in batch if item[0] not in scraped_ids and item[0] not in failed_ids], 'skipped')
+    if not scraped:
+        return failed_ids
+
+    # Stage 2: embed all scraped texts with a single OpenAI API call
+    embedded = embed_batch(scraped, client, encoding, failed_ids)
+    count(embedded, 'embedded')
+    if not embedded:
+        return failed_ids
+
+    # Stage 3: upsert the vectors to Pinecone in chunks
+    upserted = upsert_batch(embedded, index, failed_ids)
+    count(upserted, 'upserted')
+    if not upserted:
+        return failed_ids
+
+    # Stage 4: store the metadata in DynamoDB
+    n_failed = len(failed_ids)
+    store_batch(upserted, table, failed_ids)
+    if len(failed_ids) == n_failed:
+        count(upserted, 'stored')
+
+    return failed_ids
+
+def scrape_batch(batch, scrape_concurrency, failed_ids, counters=None):
+    """Scrape every company of the batch and return the (message_id, message) pairs to embed."""
+    def scrape(item):
+        message_id, company = item
+        try:
+            return message_id, get_texts.scrape_company(company, counters), None
+        except Exception as e:
+            return message_id, None, e
+
+    scraped = []
+    with ThreadPoolExecutor(max_workers=scrape_concurrency) as executor:
+        for message_id, message, error in executor.map(scrape, batch):
+            if error is not None:
+                print(f"Failed to scrape message {message_id}: {str(error)}")
+                failed_ids.append(message_id)
+            elif message:
+                scraped.append((message_id, message))
+
+    return scraped
+
+def embed_batch(scraped, client, encoding, failed_ids):
+    """Embed the scraped texts with every written model and return the (message_id, message) pairs to upsert."""
+    models = embedding_models.write_models()
+    texts = [get_embeddings.truncate_text(message['scraped_text'], encoding) for _, message in scraped]
+
+    # One OpenAI API call per model for the whole batch, text by text if the batch call fails
+    embeddings = {model: get_embeddings.embed_texts(texts, client, model) for model in models}
+
+    embedded = []
+    for i, (message_id, message) in enumerate(scraped):
+        if any(embeddings[model][i] is None for model in models):
+            print(f"Failed to generate embeddings for {message['company_name']} - {message['company_website']}")
+            failed_ids.append(message_id)
+            continue
+        embedded.append((message_id, get_embeddings.build_pinecone_message(
+            message, embeddings[models[0]][i], models[0], {model: embeddings[model][i] for model in models[1:]}
+        )))
+    return embedded
+
+def upsert_batch(embedded, index, failed_ids):
+    """Upsert the embeddings to Pinecone and return the (message_id, metadata) pairs to store."""
+    upserted = []
+    for start in range(0, len(embedded), PINECONE_UPSERT_BATCH_SIZE):
+        chunk = embedded[start:start + PINECONE_UPSERT_BATCH_SIZE]
+
+        # Vectors of every model, grouped by the model's namespace
+        vectors = {}
+        metadata = []
+        for message_id, message in chunk:
+            unique_id = push_to_pinecone.generate_unique_id(message['company_website'])
+            location_fields = locations.carry_location({}, message)
+            for model, encoded in embedding_models.message_embeddings(message):
+                vectors.setdefault(embedding_models.namespace(model), []).append(push_to_pinecone.build_vector(
+                    unique_id, quantization.decode_embedding(encoded), message['company_name'], message['company_website'],
+                    message['employee_size'], message['location'], location_fields
+                ))
+            metadata.append((message_id, push_to_pinecone.build_metadata_message(
+                unique_id, message['company_name'], message['company_website'],
+                message['employee_size'], message['location'], message.get('job_id'), location_fields
+            )))
+
+        try:
+            for namespace, namespace_vectors in vectors.items():
+                response = index.upsert(vectors=namespace_vectors, namespace=namespace)
+                print(f"Successfully upserted {len(namespace_vectors)} vectors to Pinecone namespace '{namespace}': {response}")
+            upserted.extend(metadata)
+        except Exception as e:
+            print(f"Error upserting to Pinecone: {str(e)}")
+            failed_ids.extend(message_id for message_id, _ in chunk)
+
+    return upserted
+
+def store_batch(upserted, table, failed_ids):
+    """Write the metadata of the upserted companies to DynamoDB."""
+    try:
+        # Deduplicate on the partition key, a batch write cannot contain the same key twice
+        with table.batch_writer(overwrite_by_pkeys=['id']) as writer:
+            for _, message in upserted:
+                writer.put_item(Item=push_to_dynamo.build_item(message))
+        print(f"Successfully inserted {len(upserted)} items into DynamoDB")
+    except Exception as e:
+        print(f"Failed to insert items into DynamoDB: {str(e)}")
+        failed_ids.extend(message_id for message_id, _ in upserted)
@@ -1,102 +1,193 @@
 import json
+import math
 import os
 import boto3
-from openai import OpenAI  
-import numpy as np
-import tiktoken
+from ..common import job_tracking
+from ..common import locations
+from ..common import lanes
+from ..common import quantization
+from ..common import embedding_models
+from ..common import profiling
 
 # Initialize SQS client
 sqs = boto3.client('sqs')
 
+# Embedding model settings, the models written are configured by EMBEDDING_MODELS (see common/embedding_models.py)
+EMBEDDING_MODEL = embedding_models.LEGACY_MODEL
+EMBEDDING_ENCODING = "cl100k_base"
+EMBEDDING_DIMENSIONS = 256
+MAX_TOKENS = 8000
+
+# openai and tiktoken are imported on first use and their client and tokenizer are reused by warm invocations,
+# so modules that import this one without embedding anything (fused pipeline, tools) do not pay for them
+_openai_client = None
+_encoding = None
+
 # Function to normalize the embedding vector using L2 normalization
+# (plain Python on 256 values, so the function does not need numpy and its layer)
 def normalize_l2(x):
-    x = np.array(x)
-    norm = np.linalg.norm(x)
+    norm = math.sqrt(sum(value * value for value in x))
     if norm == 0:
-        return x
-    return x / norm
+        return list(x)
+    return [value / norm for value in x]
 
 def get_openai_client():
-    # Initialize OpenAI client with max_retries set to 3
-    return OpenAI(
-        api_key=os.environ.get("OPENAI_API_KEY"),  
-        max_retries=3
-    )
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+
+        # Initialize OpenAI client with max_retries set to 3
+        _openai_client = OpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            max_retries=3
+        )
+    return _openai_client
+
+def get_encoding():
+    """Get the tokenizer used by the embedding model."""
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.get_encoding(EMBEDDING_ENCODING)
+    return _encoding
+
+def truncate_text(text, encoding, max_tokens=MAX_TOKENS):
+    """Ensure the text is within the max token limit of the embedding model."""
+    tokens = encoding.encode(text)
+    if len(tokens) > max_tokens:
+        print(f"Text exceeds {max_tokens} tokens, truncating.")
+        return encoding.decode(tokens[:max_tokens])
+    return text
+
+def build_pinecone_message(message_body, embeddings, embedding_model=EMBEDDING_MODEL, extra_embeddings=None):
+    """Reduce and normalize the embeddings and build the message for the Pinecone stage.
+
+    extra_embeddings maps the dual-written models to their embedding of the same text.
+    """
+    # Optionally quantize the embeddings to shrink the queue message (none, float16 or int8)
+    mode = os.environ.get('EMBEDDING_QUANTIZATION', 'none')
+
+    def encode(values):
+        # Reduce embeddings to 256 dimensions and normalize using L2 normalization
+        return quantization.encode_embedding(normalize_l2(values[:EMBEDDING_DIMENSIONS]), mode)
+
+    message = {
+        'company_name': message_body['company_name'],
+        'company_website': message_body['company_website'],
+        'employee_size': message_body['employee_size'],
+        'location': message_body['location'],
+        'embeddings': encode(embeddings),
+        'embedding_model': embedding_model
+    }
+    if extra_embeddings:
+        message['extra_embeddings'] = {model: encode(values) for model, values in extra_embeddings.items()}
+    locations.carry_location(message, message_body)
+    lanes.carry_lane(message, message_body)
+    return job_tracking.carry_job_id(message, message_body)
 
+@profiling.profiled('get_embeddings')
 def lambda_handler(event, context):
-    # Extract environment variables
-    PINECONE_QUEUE_URL = os.environ.get('PINECONE_QUEUE_URL')  # For the next SQS queue
-
-    # Set the maximum token length and encoding for the model
-    max_tokens = 8000
-    embedding_encoding = "cl100k_base"
-    encoding = tiktoken.get_encoding(embedding_encoding)
+    # Set the encoding for the model
+    encoding = get_encoding()
 
     # Initialize OpenAI client once before processing
     client = get_openai_client()
 
-    # Extract and process SQS messages (which come in batches)
-    for record in event['Records']:
-        message_body = json.loads(record['body'])
-        company_name = message_body['company_name']
-        company_website = message_body['company_website']
-        employee_size = message_body['employee_size']
-        location = message_body['location']
-        scraped_text = message_body['scraped_text']
-
-        print(f"Processing embedding for {company_name} - {company_website}")
-
-        # Ensure the text is within the max token limit
-        n_tokens = len(encoding.encode(scraped_text))
-        if n_tokens > max_tokens:
-            print(f"Text exceeds {max_tokens} tokens, truncating.")
-            truncated_text = encoding.decode(encoding.encode(scraped_text)[:max_tokens])
-        else:
-            truncated_text = scraped_text
+    # Message ids that failed and should be retried (partial batch response)
+    batch_item_failures = []
 
-        # Get embeddings from OpenAI API
-        embeddings = get_openai_embedding(truncated_text, client)
+    # Job progress counters, written once for the whole batch
+    counters = job_tracking.JobCounters()
 
-        if embeddings:
-            print(f"Successfully generated embeddings for {company_name}")
+    # Models written, the first one is the primary model and the others are dual-written
+    models = embedding_models.write_models()
 
-            # Reduce embeddings to 256 dimensions and normalize using L2 normalization
-            reduced_embedding = normalize_l2(embeddings[:256])
+    def fail(record, job_id, error):
+        print(f"Failed to process message {record.get('messageId')}: {str(error)}")
+        batch_item_failures.append({'itemIdentifier': record.get('messageId')})
+        if job_tracking.is_final_attempt(record):
+            counters.add(job_id, 'failed')
 
-            # Prepare message for the next queue (to push to Pinecone)
-            message = {
-                'company_name': company_name,
-                'company_website': company_website,
-                'employee_size': employee_size,
-                'location': location,
-                'embeddings': reduced_embedding.tolist()  # Convert to list for JSON serialization
-            }
+    # Parse the SQS messages (which come in batches) and truncate their texts
+    batch = []
+    for record in event['Records']:
+        job_id = None
+        try:
+            message_body = json.loads(record['body'])
+            job_id = message_body.get('job_id')
+            print(f"Processing embedding for {message_body['company_name']} - {message_body['company_website']}")
+
+            # Ensure the text is within the max token limit (every model uses the same tokenizer)
+            batch.append((record, message_body, truncate_text(message_body['scraped_text'], encoding)))
+        except Exception as e:
+            fail(record, job_id, e)
+
+    # Embed the whole batch with one OpenAI API call per model
+    texts = [text for _, _, text in batch]
+    embeddings = {model: embed_texts(texts, client, model) for model in models} if batch else {}
+
+    for i, (record, message_body, _) in enumerate(batch):
+        job_id = message_body.get('job_id')
+        try:
+            # Only the records a model failed to embed are retried, not the whole batch
+            if any(embeddings[model][i] is None for model in models):
+                raise RuntimeError(f"Failed to generate embeddings for {message_body['company_name']} - {message_body['company_website']}")
+
+            print(f"Successfully generated embeddings for {message_body['company_name']}")
+
+            # Send embeddings to the Pinecone queue of the message's lane
+            message = build_pinecone_message(
+                message_body, embeddings[models[0]][i], models[0],
+                {model: embeddings[model][i] for model in models[1:]}
+            )
+            send_to_pinecone_queue(message, lanes.queue_url('PINECONE_QUEUE_URL', message_body))
+            counters.add(job_id, 'embedded')
+        except Exception as e:
+            fail(record, job_id, e)
+
+    counters.flush()
 
-            # Send embeddings to the Pinecone queue
-            send_to_pinecone_queue(message, PINECONE_QUEUE_URL)
-        else:
-            print(f"Failed to generate embeddings for {company_name} - {company_website}")
-    
     return {
         'statusCode': 200,
-        'body': json.dumps('Embedding processing completed')
+        'body': json.dumps('Embedding processing completed'),
+        'batchItemFailures': batch_item_failures
     }
 
-def get_openai_embedding(text, client):
+def get_openai_embedding(text, client, model=EMBEDDING_MODEL):
     """Generate embeddings using the OpenAI API."""
+    embeddings = get_openai_embeddings([text], client, model)
+    return embeddings[0] if embeddings else None
+
+def embed_texts(texts, client, model=EMBEDDING_MODEL):
+    """Embed a batch of texts with one OpenAI API call, returning an embedding or None for every text.
+
+    When the batch call fails, the texts are embedded one by one, so a text rejected by the API
+    only fails its own record.
+    """
+    embeddings = get_openai_embeddings(texts, client, model)
+    if embeddings and len(embeddings) == len(texts):
+        return embeddings
+    if len(texts) < 2:
+        return [None] * len(texts)
+
+    print(f"Failed to embed a batch of {len(texts)} texts with {model}, embedding them one by one")
+    return [get_openai_embedding(text, client, model) for text in texts]
+
+def get_openai_embeddings(texts, client, model=EMBEDDING_MODEL):
+    """Generate embeddings for a batch of texts with a single OpenAI API call."""
     try:
         # Call OpenAI API to generate embeddings
         response = client.embeddings.create(
-            input=[text],
-            model="text-embedding-3-small"
+            input=texts,
+            model=model
         )
 
         # Debugging: Print out the response structure
         print(f"OpenAI response: {response}")
 
         if hasattr(response, 'data'):
-            embedding = response.data[0].embedding
-            return embedding
+            # Results are returned in input order, but sort by index to be safe
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
         else:
             print("No 'data' field in the OpenAI response.")
             return None
@@ -116,3 +207,4 @@ def send_to_pinecone_queue(message, queue_url):
         print(f"Sent message to Pinecone queue: {response['MessageId']}")
     except Exception as e:
         print(f"Failed to send message to Pinecone queue: {str(e)}")
+        raise
@@ -4,45 +4,117 @@ import os
 import boto3
 import time
 from bs4 import BeautifulSoup
+from ..common import embedding_models
+from ..common import job_tracking
+from ..common import locations
+from ..common import lanes
+from ..common import text_cache
+from ..common import profiling
+from ..common import text_quality
 
 # Initialize SQS client
 sqs = boto3.client('sqs')
 
+@profiling.profiled('get_texts')
 def lambda_handler(event, context):
 
-    # Environment variable for the next SQS queue (for embedding Lambda)
-    EMBEDDING_QUEUE_URL = os.environ.get('EMBEDDING_QUEUE_URL')
+    # Message ids that failed and should be retried (partial batch response)
+    batch_item_failures = []
+
+    # Job progress counters, written once for the whole batch
+    counters = job_tracking.JobCounters()
 
     # Extract SQS messages (which come in batches)
     for record in event['Records']:
-        message_body = json.loads(record['body'])
-        company_website = message_body['company_website']
-        company_name = message_body['company_name']
-        employee_size = message_body['employee_size']
-        location = message_body['location']
-
-        # Scrape the website with retry logic
-        scraped_text = scrape_website_with_retry(company_website)
-        
-        # Check if the scraped text has fewer than 100 characters
-        if scraped_text and len(scraped_text) >= 100:
-            print(f"Successfully scraped text for {company_name} - {company_website}")
-            
-            # Send scraped text to the next Lambda (via SQS)
-            send_to_embedding_lambda({
-                'company_name': company_name,
-                'company_website': company_website,
-                'employee_size': employee_size,
-                'location': location,
-                'scraped_text': scraped_text,
-            })
-        else:
-            print(f"Scraped text for {company_name} is too short (< 100 characters) - Skipping")
-    
+        job_id = None
+        try:
+            message_body = json.loads(record['body'])
+            job_id = message_body.get('job_id')
+
+            # Scrape the website and send scraped text to the next Lambda (via SQS)
+            message = scrape_company(message_body, counters)
+            if message:
+                send_to_embedding_lambda(message)
+                counters.add(job_id, 'scraped')
+            else:
+                counters.add(job_id, 'skipped')
+        except Exception as e:
+            print(f"Failed to process message {record.get('messageId')}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': record.get('messageId')})
+            if job_tracking.is_final_attempt(record):
+                counters.add(job_id, 'failed')
+
+    counters.flush()
+
     return {
         'statusCode': 200,
-        'body': json.dumps('Scraping completed')
+        'body': json.dumps('Scraping completed'),
+        'batchItemFailures': batch_item_failures
+    }
+
+def scrape_company(message_body, counters=None):
+    """Scrape a company website and return the message for the embedding stage, or None if skipped.
+
+    Pages skipped by the quality gate are added to the savings counters of the job when counters are given.
+    """
+    company_website = message_body['company_website']
+    company_name = message_body['company_name']
+    employee_size = message_body['employee_size']
+    location = message_body['location']
+
+    # Scrape the website with retry logic
+    scraped_text = scrape_website_with_retry(company_website)
+
+    # A failed scrape is retried through SQS (and ends up in the DLQ)
+    if scraped_text is None:
+        raise RuntimeError(f"Failed to scrape {company_website}")
+
+    # Check if the scraped text has fewer than 100 characters
+    if len(scraped_text) < 100:
+        print(f"Scraped text for {company_name} is too short (< 100 characters) - Skipping")
+        return None
+
+    # Parked domains, error pages, login walls and cookie banners are not worth their embedding and Pinecone write
+    features = text_quality.text_features(scraped_text)
+    score = text_quality.score_features(features)
+    if score < text_quality.quality_threshold():
+        saved = text_quality.savings(scraped_text, len(embedding_models.write_models()))
+        print(
+            f"Scraped text for {company_name} is low quality (score {score:.2f}, language {features['language']}, "
+            f"{features['phrase_hits']} low-value phrases) - Skipping, saves {saved['tokens_saved']} embedding tokens"
+        )
+        if counters is not None:
+            job_id = message_body.get('job_id')
+            counters.add(job_id, 'low_quality')
+            counters.add(job_id, 'tokens_saved', saved['tokens_saved'])
+            counters.add(job_id, 'writes_saved', saved['writes_saved'])
+        return None
+
+    print(f"Successfully scraped text for {company_name} - {company_website}")
+
+    # Keep the text so the company can be embedded again with another model without scraping it again
+    try:
+        text_cache.put_text(company_website, scraped_text)
+    except Exception as e:
+        print(f"Failed to cache the scraped text of {company_website}: {str(e)}")
+
+    message = {
+        'company_name': company_name,
+        'company_website': company_website,
+        'employee_size': employee_size,
+        'location': location,
+        'scraped_text': scraped_text,
     }
+    locations.carry_location(message, message_body)
+    lanes.carry_lane(message, message_body)
+    return job_tracking.carry_job_id(message, message_body)
+
+def extract_text(html):
+    """Extract the visible text of an HTML page."""
+    # Parse the HTML content with BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    text = soup.get_text(separator=" ")
+    return " ".join(text.split())  # Clean up the whitespace
 
 def scrape_website_with_retry(url, max_retries=3, backoff_factor=2):
     for attempt in range(max_retries):
@@ -57,10 +129,7 @@ def scrape_website_with_retry(url, max_retries=3, backoff_factor=2):
                 timeout=30
             )
             if response.status_code == 200:
-                # Parse the HTML content with BeautifulSoup
-                soup = BeautifulSoup(response.text, "html.parser")
-                text = soup.get_text(separator=" ")
-                return " ".join(text.split())  # Clean up the whitespace
+                return extract_text(response.text)
             else:
                 print(f"Failed to scrape {url}, status code: {response.status_code}")
         except requests.Timeout:
@@ -77,7 +146,8 @@ def scrape_website_with_retry(url, max_retries=3, backoff_factor=2):
 
 def send_to_embedding_lambda(message):
     """Send the scraped text to the next Lambda for embedding conversion via SQS."""
-    EMBEDDING_QUEUE_URL = os.environ.get('EMBEDDING_QUEUE_URL')  
+    # Embedding queue of the message's lane (priority or bulk)
+    EMBEDDING_QUEUE_URL = lanes.queue_url('EMBEDDING_QUEUE_URL', message)
     try:
         response = sqs.send_message(
             QueueUrl=EMBEDDING_QUEUE_URL,
@@ -86,3 +156,4 @@ def send_to_embedding_lambda(message):
         print(f"Sent message to embedding Lambda SQS: {response['MessageId']}")
     except Exception as e:
         print(f"Failed to send message to embedding Lambda: {str(e)}")
+        raise
@@ -4,6 +4,14 @@ import csv
 import os
 from urllib.parse import unquote_plus
 import re
+import uuid
+from ..common import job_tracking
+from ..common import locations
+from ..common import lanes
+from ..common import profiling
+
+# Number of rows enqueued between two updates of the job's enqueued counter
+ENQUEUE_FLUSH_ROWS = 1000
 
 # Improved website formatting function
 def format_websites(url):
@@ -43,13 +51,33 @@ def format_employee_size(employee_size):
         # If the value is not numeric or valid, return 'NA'
         return 'NA'
 
+def format_company(row):
+    """Format a CSV row into the company message sent to the scraping stage."""
+    # Format the website field
+    formatted_website = format_websites(row['company_website'])
+
+    # Format the employee size field
+    formatted_employee_size = format_employee_size(row['employee_size'])
+
+    # Check if the location is empty, set to 'NA' if it is
+    location = row['location'] if row['location'] else 'NA'
+
+    company = {
+        'company_name': row['company_name'],
+        'company_website': formatted_website,
+        'employee_size': formatted_employee_size,
+        'location': location
+    }
+
+    # Add the canonical city, region and country of the free-text location
+    company.update(locations.normalize_location(row['location']))
+    return company
+
+@profiling.profiled('parse_csv_to_sqs')
 def lambda_handler(event, context):
     # Initialize the SQS client
     sqs = boto3.client('sqs')
 
-    # Environment variable for the SQS queue URL
-    QUEUE_URL = os.environ.get('QUEUE_URL')
-
     # Log the entire event object
     print(f"Received event: {json.dumps(event, indent=2)}")
     
@@ -71,29 +99,35 @@ def lambda_handler(event, context):
     
     content = response['Body'].read().decode('utf-8').splitlines()
 
-    # Parse the CSV file
-    csv_reader = csv.DictReader(content)
-    for row in csv_reader:
-        # Format the website field
-        formatted_website = format_websites(row['company_website'])
+    # Route small uploads (or uploads under priority/) to the priority lane so large backfills do not delay them
+    lane = lanes.classify_upload(key, n_rows=max(len(content) - 1, 0))
+    QUEUE_URL = lanes.queue_url('QUEUE_URL', {'lane': lane})
 
-        # Format the employee size field
-        formatted_employee_size = format_employee_size(row['employee_size'])
-
-        # Check if the location is empty, set to 'NA' if it is
-        location = row['location'] if row['location'] else 'NA'
+    # Assign a job id to the file, carried by every message so each stage can report its progress
+    job_id = str(uuid.uuid4())
+    job_tracking.create_job(job_id, bucket, key)
+    counters = job_tracking.JobCounters()
+    print(f"Job ID: {job_id}, lane: {lane}")
 
+    # Parse the CSV file
+    csv_reader = csv.DictReader(content)
+    for n_rows, row in enumerate(csv_reader, start=1):
         # Send each company’s data to SQS with the formatted website, employee size, and location
-        message = {
-            'company_name': row['company_name'],
-            'company_website': formatted_website,
-            'employee_size': formatted_employee_size,
-            'location': location
-        }
+        message = format_company(row)
+        message['job_id'] = job_id
+        message['lane'] = lane
         sqs.send_message(
             QueueUrl=QUEUE_URL,
             MessageBody=json.dumps(message)
         )
+        counters.add(job_id, 'enqueued')
+
+        # Update the enqueued counter periodically so progress is visible while a large file is parsed
+        if n_rows % ENQUEUE_FLUSH_ROWS == 0:
+            counters.flush()
+
+    counters.flush()
+    print(f"Location normalization: {json.dumps(locations.location_stats())}")
 
     return {
         'statusCode': 200,
@@ -2,6 +2,10 @@ import json
 import os
 import boto3
 from boto3.dynamodb.conditions import Key
+from ..common import job_tracking
+from ..common import company_index
+from ..common import locations
+from ..common import profiling
 
 # Initialize DynamoDB client
 dynamodb = boto3.resource('dynamodb')
@@ -9,6 +13,24 @@ dynamodb = boto3.resource('dynamodb')
 # Initialize SQS client
 sqs = boto3.client('sqs')
 
+def build_item(message_body):
+    """Create the DynamoDB item from the metadata message."""
+    item = {
+        'id': message_body['id'],  # Partition key
+        'company_name': message_body['company_name'],
+        'company_website': message_body['company_website'],
+        'employee_size': message_body['employee_size'],
+        'location': message_body['location']
+    }
+
+    # Canonical city, region and country, when the message has them
+    locations.carry_location(item, message_body)
+
+    # Key attributes of the domain, size and location secondary indexes
+    item.update(company_index.index_attributes(item))
+    return item
+
+@profiling.profiled('push_to_dynamo')
 def lambda_handler(event, context):
     # Extract environment variables
     DYNAMODB_TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')  # DynamoDB table name
@@ -16,34 +38,37 @@ def lambda_handler(event, context):
     # Initialize DynamoDB Table
     table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
+    # Message ids that failed and should be retried (partial batch response)
+    batch_item_failures = []
+
+    # Job progress counters, written once for the whole batch
+    counters = job_tracking.JobCounters()
+
     # Process each SQS message
     for record in event['Records']:
-        message_body = json.loads(record['body'])
-
-        # Extract metadata and unique ID from the message
-        unique_id = message_body['id']
-        company_name = message_body['company_name']
-        company_website = message_body['company_website']
-        employee_size = message_body['employee_size']
-        location = message_body['location']
-
-        # Create the item to insert into DynamoDB
-        item = {
-            'id': unique_id,  # Partition key
-            'company_name': company_name,
-            'company_website': company_website,
-            'employee_size': employee_size,
-            'location': location
-        }
-
-        # Insert the item into DynamoDB
+        job_id = None
         try:
+            message_body = json.loads(record['body'])
+            job_id = message_body.get('job_id')
+
+            # Create the item to insert into DynamoDB
+            item = build_item(message_body)
+            unique_id = item['id']
+
+            # Insert the item into DynamoDB
             table.put_item(Item=item)
             print(f"Successfully inserted item into DynamoDB: {unique_id}")
+            counters.add(job_id, 'stored')
         except Exception as e:
             print(f"Failed to insert item into DynamoDB: {str(e)}")
-    
+            batch_item_failures.append({'itemIdentifier': record.get('messageId')})
+            if job_tracking.is_final_attempt(record):
+                counters.add(job_id, 'failed')
+
+    counters.flush()
+
     return {
         'statusCode': 200,
-        'body': json.dumps('Metadata inserted into DynamoDB')
+        'body': json.dumps('Metadata inserted into DynamoDB'),
+        'batchItemFailures': batch_item_failures
     }
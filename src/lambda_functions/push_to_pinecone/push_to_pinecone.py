@@ -2,85 +2,132 @@ import json
 import os
 import boto3
 import hashlib 
-import numpy as np
-from pinecone import Pinecone
+from ..common import job_tracking
+from ..common import locations
+from ..common import lanes
+from ..common import quantization
+from ..common import embedding_models
+from ..common import profiling
 
 # Initialize SQS client
 sqs = boto3.client('sqs')
 
+# pinecone is imported on first use and its client is reused by warm invocations
+_pinecone_client = None
+
 def get_pinecone_client():
-    # Initialize Pinecone client
-    return Pinecone(
-        api_key=os.environ.get("PINECONE_API_KEY")  # Pinecone API Key
-    )
+    global _pinecone_client
+    if _pinecone_client is None:
+        from pinecone import Pinecone
+
+        # Initialize Pinecone client
+        _pinecone_client = Pinecone(
+            api_key=os.environ.get("PINECONE_API_KEY")  # Pinecone API Key
+        )
+    return _pinecone_client
 
 def generate_unique_id(company_website):
     """Generate a unique ID using SHA-256 hash of the company website."""
     return hashlib.sha256(company_website.encode('utf-8')).hexdigest()
 
+@profiling.profiled('push_to_pinecone')
 def lambda_handler(event, context):
     # Extract environment variables
     PINECONE_INDEX_NAME = os.environ.get('PINECONE_INDEX_NAME')  
-    DYNAMO_SQS_QUEUE_URL = os.environ.get('DYNAMO_SQS_QUEUE_URL')  # Second SQS queue URL for metadata storage
 
     # Initialize Pinecone client and connect to the index
     pinecone_client = get_pinecone_client()
     index = pinecone_client.Index(PINECONE_INDEX_NAME)
 
+    # Message ids that failed and should be retried (partial batch response)
+    batch_item_failures = []
+
+    # Job progress counters, written once for the whole batch
+    counters = job_tracking.JobCounters()
+
     # Extract and process SQS messages (which come in batches)
     for record in event['Records']:
-        message_body = json.loads(record['body'])
+        job_id = None
+        try:
+            message_body = json.loads(record['body'])
+            job_id = message_body.get('job_id')
+
+            company_name = message_body['company_name']
+            company_website = message_body['company_website']
+            employee_size = message_body['employee_size']
+            location = message_body['location']
+            # Canonical city, region and country, absent from messages sent before location normalization
+            location_fields = locations.carry_location({}, message_body)
 
-        company_name = message_body['company_name']
-        company_website = message_body['company_website']
-        employee_size = message_body['employee_size']
-        location = message_body['location']
-        embeddings = message_body['embeddings']
+            # Generate a unique ID based on the company website
+            unique_id = generate_unique_id(company_website)
 
-        # Generate a unique ID based on the company website
-        unique_id = generate_unique_id(company_website)
+            # Upsert the embedding of every model into the model's namespace, with metadata.
+            # Embeddings may have been quantized for transport by get_embeddings.
+            for model, encoded in embedding_models.message_embeddings(message_body):
+                print(f"Upserting {model} embedding for {company_name} - {company_website} with ID: {unique_id}")
+                upsert_to_pinecone(
+                    index, unique_id, quantization.decode_embedding(encoded), company_name, company_website,
+                    employee_size, location, location_fields, embedding_models.namespace(model)
+                )
 
-        print(f"Upserting embedding for {company_name} - {company_website} with ID: {unique_id}")
+            # Send the unique ID and metadata to the DynamoDB queue of the message's lane
+            DYNAMO_SQS_QUEUE_URL = lanes.queue_url('DYNAMO_SQS_QUEUE_URL', message_body)
+            send_to_dynamo_sqs(unique_id, company_name, company_website, employee_size, location, DYNAMO_SQS_QUEUE_URL, job_id, location_fields)
+            counters.add(job_id, 'upserted')
+        except Exception as e:
+            print(f"Failed to process message {record.get('messageId')}: {str(e)}")
+            batch_item_failures.append({'itemIdentifier': record.get('messageId')})
+            if job_tracking.is_final_attempt(record):
+                counters.add(job_id, 'failed')
 
-        # Upsert embeddings to Pinecone with metadata
-        upsert_to_pinecone(index, unique_id, embeddings, company_name, company_website, employee_size, location)
+    counters.flush()
 
-        # Send the unique ID and metadata to the second SQS queue for DynamoDB
-        send_to_dynamo_sqs(unique_id, company_name, company_website, employee_size, location, DYNAMO_SQS_QUEUE_URL)
-    
     return {
         'statusCode': 200,
-        'body': json.dumps('Embeddings upserted into Pinecone and metadata sent to DynamoDB SQS')
+        'body': json.dumps('Embeddings upserted into Pinecone and metadata sent to DynamoDB SQS'),
+        'batchItemFailures': batch_item_failures
     }
 
-def upsert_to_pinecone(index, unique_id, embedding, company_name, company_website, employee_size, location):
+def build_vector(unique_id, embedding, company_name, company_website, employee_size, location, location_fields=None):
+    """Build the Pinecone vector record with its metadata."""
+    return {
+        "id": unique_id,  # Unique identifier generated from company website
+        "values": embedding,  # Embedding vector
+        "metadata": locations.carry_location({
+            "company_name": company_name,
+            "company_website": company_website,
+            "employee_size": employee_size,
+            "location": location
+        }, location_fields or {})
+    }
+
+def build_metadata_message(unique_id, company_name, company_website, employee_size, location, job_id=None, location_fields=None):
+    """Build the metadata message for the DynamoDB stage."""
+    return job_tracking.carry_job_id(locations.carry_location({
+        'id': unique_id,
+        'company_name': company_name,
+        'company_website': company_website,
+        'employee_size': employee_size,
+        'location': location
+    }, location_fields or {}), {'job_id': job_id})
+
+def upsert_to_pinecone(index, unique_id, embedding, company_name, company_website, employee_size, location, location_fields=None, namespace=''):
     """Upsert the embedding and metadata to Pinecone."""
     try:
-        response = index.upsert(vectors=[{
-            "id": unique_id,  # Unique identifier generated from company website
-            "values": embedding,  # Embedding vector
-            "metadata": {
-                "company_name": company_name,
-                "company_website": company_website,
-                "employee_size": employee_size,
-                "location": location
-            }
-        }])
+        response = index.upsert(vectors=[
+            build_vector(unique_id, embedding, company_name, company_website, employee_size, location, location_fields)
+        ], namespace=namespace)
         print(f"Successfully upserted data to Pinecone: {response}")
     except Exception as e:
         print(f"Error upserting to Pinecone: {str(e)}")
+        raise
 
-def send_to_dynamo_sqs(unique_id, company_name, company_website, employee_size, location, queue_url):
+def send_to_dynamo_sqs(unique_id, company_name, company_website, employee_size, location, queue_url, job_id=None, location_fields=None):
     """Send the unique ID and metadata to another SQS queue for DynamoDB."""
     try:
-        message = {
-            'id': unique_id,
-            'company_name': company_name,
-            'company_website': company_website,
-            'employee_size': employee_size,
-            'location': location
-        }
-        
+        message = build_metadata_message(unique_id, company_name, company_website, employee_size, location, job_id, location_fields)
+
         response = sqs.send_message(
             QueueUrl=queue_url,
             MessageBody=json.dumps(message)
@@ -88,3 +135,4 @@ def send_to_dynamo_sqs(unique_id, company_name, company_website, employee_size,
         print(f"Sent metadata to DynamoDB SQS queue: {response['MessageId']}")
     except Exception as e:
         print(f"Failed to send metadata to DynamoDB SQS queue: {str(e)}")
+        raise
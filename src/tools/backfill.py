@@ -0,0 +1,284 @@
+"""Bulk backfill of a local CSV file through the ingestion pipeline, without S3, Lambda or SQS.
+
+Rows are formatted exactly like parse_csv_to_sqs does, scraped by a process pool (HTML parsing is
+CPU bound) with async I/O inside each worker, then embedded, upserted and stored with concurrent
+batched calls. Progress is checkpointed to a SQLite file so an interrupted run resumes where it stopped.
+
+Usage:
+    python -m src.tools.backfill companies.csv --processes 4 --scrape-concurrency 16
+    python -m src.tools.backfill companies.csv --offline   # fake providers, no network
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import itertools
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import boto3
+from dotenv import load_dotenv
+
+# The stage modules create boto3 clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.parse_csv_to_sqs import parse_csv_to_sqs
+from src.lambda_functions.common import locations
+from src.lambda_functions.get_texts import get_texts
+from src.lambda_functions.get_embeddings import get_embeddings
+from src.lambda_functions.push_to_pinecone import push_to_pinecone
+from src.lambda_functions.fused_pipeline import fused_pipeline
+from src.tools import fake_providers
+
+# Maximum number of texts per OpenAI embeddings request (8000 tokens each stays under the request token limit)
+EMBED_BATCH_SIZE = 32
+
+# Row statuses recorded in the checkpoint file; rows in DONE_STATUSES are not processed again on resume
+DONE_STATUSES = ('stored', 'skipped')
+
+class Checkpoint:
+    """SQLite record of the status of every CSV row."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS progress ("
+            "row_id INTEGER PRIMARY KEY, company_website TEXT NOT NULL, status TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+    def done_rows(self):
+        cursor = self.connection.execute(
+            f"SELECT row_id FROM progress WHERE status IN ({','.join('?' * len(DONE_STATUSES))})",
+            DONE_STATUSES
+        )
+        return {row_id for (row_id,) in cursor}
+
+    def record(self, statuses):
+        """Record the (row_id, company_website, status) results of a chunk in a single transaction."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO progress (row_id, company_website, status) VALUES (?, ?, ?)",
+                statuses
+            )
+
+    def counts(self):
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM progress GROUP BY status"))
+
+    def close(self):
+        self.connection.close()
+
+class StageMeter:
+    """Rows processed and busy time of a pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+
+    @contextlib.contextmanager
+    def measure(self, n_rows):
+        start = time.perf_counter()
+        yield
+        self.seconds += time.perf_counter() - start
+        self.rows += n_rows
+
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+def read_chunks(csv_path, chunk_size, done_rows):
+    """Yield chunks of (row_id, company) pairs, skipping rows already done."""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = (
+            (row_id, parse_csv_to_sqs.format_company(row))
+            for row_id, row in enumerate(csv.DictReader(f))
+            if row_id not in done_rows
+        )
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def init_scrape_worker(offline, scrape_latency, verbose):
+    """Configure a scrape worker process."""
+    if offline:
+        os.environ.setdefault('SCRAPINGBEE_API_KEY', 'offline')
+        get_texts.requests.get = fake_providers.FakeScraper(latency=scrape_latency)
+    if not verbose:
+        sys.stdout = open(os.devnull, 'w')
+
+def scrape_rows(rows, concurrency):
+    """Scrape a chunk of rows with async I/O; runs inside a worker process."""
+    async def scrape_all():
+        # Blocking scrapes run in the default thread pool (asyncio.to_thread needs Python 3.9, Lambda runs 3.8)
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def scrape(row_id, company):
+            async with semaphore:
+                try:
+                    return row_id, await loop.run_in_executor(None, get_texts.scrape_company, company), None
+                except Exception as e:
+                    return row_id, None, str(e)
+
+        return await asyncio.gather(*(scrape(row_id, company) for row_id, company in rows))
+
+    return asyncio.run(scrape_all())
+
+async def scrape_chunk(loop, executor, chunk, processes, concurrency, meter):
+    """Split a chunk across the worker processes and gather the scrape results."""
+    scrape_start = time.perf_counter()
+    shard_size = max(1, -(-len(chunk) // processes))
+    shards = [chunk[start:start + shard_size] for start in range(0, len(chunk), shard_size)]
+    results = await asyncio.gather(*(
+        loop.run_in_executor(executor, scrape_rows, shard, concurrency) for shard in shards
+    ))
+    meter.seconds += time.perf_counter() - scrape_start
+    meter.rows += len(chunk)
+    return [result for shard_results in results for result in shard_results]
+
+async def run_batches(items, batch_size, concurrency, stage_function, *args):
+    """Run a stage function on batches of items concurrently in threads and collect the failed row ids."""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    batches = [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+
+    async def run(batch):
+        async with semaphore:
+            failed_ids = []
+            output = await loop.run_in_executor(None, stage_function, batch, *args, failed_ids)
+            return output, failed_ids
+
+    results = await asyncio.gather(*(run(batch) for batch in batches))
+    outputs = [item for output, _ in results for item in (output or [])]
+    failed_ids = [row_id for _, failed in results for row_id in failed]
+    return outputs, failed_ids
+
+async def process_chunk(chunk, scraped_results, providers, args, meters):
+    """Embed, upsert and store a scraped chunk and return the status of every row."""
+    statuses = {row_id: 'failed' for row_id, _ in chunk}
+
+    scraped = []
+    for row_id, message, error in scraped_results:
+        if error is None and message is None:
+            statuses[row_id] = 'skipped'
+        elif error is None:
+            scraped.append((row_id, message))
+
+    with meters['embed'].measure(len(scraped)):
+        embedded, _ = await run_batches(
+            scraped, EMBED_BATCH_SIZE, args.io_concurrency,
+            fused_pipeline.embed_batch, providers['openai'], providers['encoding']
+        )
+
+    with meters['upsert'].measure(len(embedded)):
+        upserted, _ = await run_batches(
+            embedded, fused_pipeline.PINECONE_UPSERT_BATCH_SIZE, args.io_concurrency,
+            fused_pipeline.upsert_batch, providers['index']
+        )
+
+    with meters['store'].measure(len(upserted)):
+        # store_batch returns nothing, so track the stored rows by their failures
+        _, failed_ids = await run_batches(upserted, 25, args.io_concurrency, fused_pipeline.store_batch, providers['table'])
+    failed_ids = set(failed_ids)
+    for row_id, _ in upserted:
+        if row_id not in failed_ids:
+            statuses[row_id] = 'stored'
+
+    websites = dict(chunk)
+    return [(row_id, websites[row_id]['company_website'], status) for row_id, status in statuses.items()]
+
+def get_providers(args):
+    """Build the embedding, vector index and metadata table clients."""
+    if args.offline:
+        return {
+            'openai': fake_providers.FakeOpenAIClient(latency=args.fake_latency),
+            'encoding': fake_providers.FakeEncoding(),
+            'index': fake_providers.FakePineconeIndex(latency=args.fake_latency),
+            'table': fake_providers.FakeDynamoTable(latency=args.fake_latency),
+        }
+
+    load_dotenv()
+    return {
+        'openai': get_embeddings.get_openai_client(),
+        'encoding': get_embeddings.get_encoding(),
+        'index': push_to_pinecone.get_pinecone_client().Index(os.environ['PINECONE_INDEX_NAME']),
+        'table': boto3.resource('dynamodb').Table(os.environ['DYNAMODB_TABLE_NAME']),
+    }
+
+def print_progress(meters, total_rows, start):
+    elapsed = time.time() - start
+    stages = " | ".join(f"{meter.name} {meter.rate():8.1f} rows/s" for meter in meters.values())
+    print(f"[{elapsed:7.1f}s] {total_rows} rows ({total_rows / elapsed:.1f} rows/s) | {stages}", file=sys.stderr)
+
+async def backfill(args):
+    checkpoint = Checkpoint(args.checkpoint or f"{args.csv_path}.checkpoint.sqlite")
+    done_rows = checkpoint.done_rows()
+    if done_rows:
+        print(f"Resuming: {len(done_rows)} rows already done", file=sys.stderr)
+
+    providers = get_providers(args)
+    meters = {name: StageMeter(name) for name in ('scrape', 'embed', 'upsert', 'store')}
+    loop = asyncio.get_running_loop()
+    start = time.time()
+    total_rows = 0
+
+    with ProcessPoolExecutor(
+        max_workers=args.processes,
+        initializer=init_scrape_worker,
+        initargs=(args.offline, args.fake_latency, args.verbose)
+    ) as executor:
+        def start_scrape(chunk):
+            return asyncio.ensure_future(
+                scrape_chunk(loop, executor, chunk, args.processes, args.scrape_concurrency, meters['scrape'])
+            )
+
+        chunks = read_chunks(args.csv_path, args.chunk_size, done_rows)
+        chunk = next(chunks, None)
+        if chunk:
+            scrape_task = start_scrape(chunk)
+
+        while chunk:
+            scraped_results = await scrape_task
+
+            # Scrape the next chunk while the current one is embedded and upserted
+            next_chunk = next(chunks, None)
+            if next_chunk:
+                scrape_task = start_scrape(next_chunk)
+
+            statuses = await process_chunk(chunk, scraped_results, providers, args, meters)
+            checkpoint.record(statuses)
+
+            total_rows += len(chunk)
+            print_progress(meters, total_rows, start)
+            chunk = next_chunk
+
+    counts = checkpoint.counts()
+    checkpoint.close()
+    print(f"Backfill finished: {counts}", file=sys.stderr)
+    print(f"Location normalization: {locations.location_stats()}", file=sys.stderr)
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill a local CSV file through the ingestion pipeline.")
+    parser.add_argument('csv_path', help="CSV file with company_name, company_website, employee_size and location columns")
+    parser.add_argument('--checkpoint', help="SQLite checkpoint file (default: <csv_path>.checkpoint.sqlite)")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="Number of scrape worker processes")
+    parser.add_argument('--scrape-concurrency', type=int, default=16, help="Concurrent scrapes per worker process")
+    parser.add_argument('--io-concurrency', type=int, default=4, help="Concurrent embed, upsert and store batches")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Rows processed and checkpointed together")
+    parser.add_argument('--offline', action='store_true', help="Use fake providers instead of ScrapingBee, OpenAI, Pinecone and DynamoDB")
+    parser.add_argument('--fake-latency', type=float, default=0.0, help="Latency in seconds of each fake provider call")
+    parser.add_argument('--verbose', action='store_true', help="Keep the per-company logs of the stage functions")
+    args = parser.parse_args(argv)
+
+    if args.verbose:
+        return asyncio.run(backfill(args))
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        return asyncio.run(backfill(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import hashlib
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+import numpy as np
+from src.lambda_functions.get_embeddings.get_embeddings import EMBEDDING_DIMENSIONS
+from src.tools.local_index import LocalVectorIndex
+
+# Offline stand-ins for ScrapingBee, OpenAI, Pinecone, DynamoDB and SQS.
+# Each fake sleeps for a configurable latency so pipelines can be run and benchmarked without network access.
+
+def seed_from_text(text):
+    """Derive a stable random seed from a string."""
+    return int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:8], 16)
+
+class FakeResponse:
+    """Minimal requests.Response stand-in."""
+
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+class FakeScraper:
+    """Replacement for requests.get that returns a deterministic HTML page per website."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, paragraphs=20):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.paragraphs = paragraphs
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, url, params=None, timeout=None):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+        website = params['url'] if params else url
+        rng = np.random.default_rng(seed_from_text(website))
+        if rng.random() < self.failure_rate:
+            return FakeResponse(500)
+        return FakeResponse(200, fake_html(website, rng, self.paragraphs))
+
+def fake_html(website, rng, paragraphs=20):
+    """Build an HTML page with some navigation boilerplate and random paragraphs."""
+    words = ['data', 'platform', 'customers', 'software', 'growth', 'team', 'analytics', 'cloud',
+             'security', 'sales', 'marketing', 'service', 'industry', 'solutions', 'product', 'global']
+    # Sentences with function words, so the pages read like prose to the scrape quality gate (common/text_quality.py)
+    sentences = [
+        "Our {} {} helps the {} team with {} and {}.",
+        "We build {} for {} {} in every {} {}.",
+        "The {} of our {} is trusted by {} {} {}.",
+        "With {} and {}, your {} can grow {} {}.",
+    ]
+    body = "".join(
+        "<p>" + " ".join(sentences[i % len(sentences)].format(*rng.choice(words, size=5)) for i in range(5)) + "</p>"
+        for _ in range(paragraphs)
+    )
+    return (
+        f"<html><head><title>{website}</title><script>var x = 1;</script></head>"
+        f"<body><nav>Home About Contact</nav>{body}<footer>Copyright {website}</footer></body></html>"
+    )
+
+class FakeEncoding:
+    """Whitespace tokenizer with the tiktoken encode/decode interface."""
+
+    def encode(self, text):
+        return text.split(" ")
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+class FakeEmbeddings:
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, input, model):
+        with self.client.lock:
+            self.client.calls += 1
+        time.sleep(self.client.latency + self.client.per_input_latency * len(input))
+        data = [
+            SimpleNamespace(
+                index=i,
+                embedding=np.random.default_rng(seed_from_text(text)).standard_normal(self.client.dimensions).tolist()
+            )
+            for i, text in enumerate(input)
+        ]
+        return SimpleNamespace(data=data, model=model)
+
+class FakeOpenAIClient:
+    """OpenAI client stand-in returning deterministic random embeddings."""
+
+    def __init__(self, latency=0.0, per_input_latency=0.0, dimensions=1536):
+        self.latency = latency
+        self.per_input_latency = per_input_latency
+        self.dimensions = dimensions
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.embeddings = FakeEmbeddings(self)
+
+class FakePineconeIndex(LocalVectorIndex):
+    """Local vector index with the latency of a Pinecone call, safe to share between threads."""
+
+    def __init__(self, latency=0.0, dimension=EMBEDDING_DIMENSIONS, **kwargs):
+        super().__init__(dimension, **kwargs)
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def upsert(self, vectors, **kwargs):
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            return super().upsert(vectors, **kwargs)
+
+    def query(self, *args, **kwargs):
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            return super().query(*args, **kwargs)
+
+    def fetch(self, ids, **kwargs):
+        with self.lock:
+            return super().fetch(ids, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with self.lock:
+            return super().delete(*args, **kwargs)
+
+class FakeBatchWriter:
+    def __init__(self, table):
+        self.table = table
+        self.items = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.table.write_batch(list(self.items.values()))
+
+    def put_item(self, Item):
+        self.items[Item['id']] = Item
+
+class FakeDynamoTable:
+    """In-memory DynamoDB table stand-in keyed on 'id'."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.items = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def put_item(self, Item):
+        self.write_batch([Item])
+
+    def write_batch(self, items):
+        # BatchWriteItem accepts 25 items per call
+        for start in range(0, len(items), 25):
+            time.sleep(self.latency)
+            with self.lock:
+                self.calls += 1
+                for item in items[start:start + 25]:
+                    self.items[item['id']] = item
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return FakeBatchWriter(self)
+
+class FakeSQS:
+    """In-memory SQS client stand-in that records the messages sent to each queue."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.queues = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.message_ids = itertools.count()
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            message_id = f"message-{next(self.message_ids)}"
+            self.queues.setdefault(QueueUrl, []).append({'messageId': message_id, 'body': MessageBody})
+        return {'MessageId': message_id}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            for entry in Entries:
+                message_id = f"message-{next(self.message_ids)}"
+                self.queues.setdefault(QueueUrl, []).append({'messageId': message_id, 'body': entry['MessageBody']})
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+    def drain(self, queue_url):
+        """Remove and return the messages of a queue as SQS event records."""
+        with self.lock:
+            return self.queues.pop(queue_url, [])
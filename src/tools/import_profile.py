@@ -0,0 +1,88 @@
+"""Import-time breakdown of each Lambda handler module, the main part of a Python cold start.
+
+Each handler is imported in a fresh interpreter with `python -X importtime`, run from src/ exactly
+like the Lambda runtime loads `lambda_functions.<name>.<name>`, and the time is grouped by top-level package.
+
+Usage:
+    python -m src.tools.import_profile
+    python -m src.tools.import_profile get_embeddings --top 15 --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Handler modules deployed as Lambda functions
+HANDLERS = ('parse_csv_to_sqs', 'get_texts', 'get_embeddings', 'push_to_pinecone', 'push_to_dynamo', 'fused_pipeline')
+
+def handler_module(handler):
+    return f"lambda_functions.{handler}.{handler}"
+
+def handler_environment():
+    """Environment of a fresh handler process; the stage modules create boto3 clients at import time."""
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+def parse_importtime(output):
+    """Parse `-X importtime` output into (package, self_us, cumulative_us, depth) tuples."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+def profile_handler(handler, src_dir=SRC_DIR):
+    """Import a handler in a fresh interpreter and return its import-time breakdown by top-level package."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {handler_module(handler)}"],
+        cwd=src_dir, env=handler_environment(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to import {handler}: {result.stderr.strip().splitlines()[-1]}")
+
+    imports = parse_importtime(result.stderr)
+    packages = defaultdict(int)
+    for name, self_us, _, _ in imports:
+        # The handler's own modules are split by stage, their self time includes the boto3 clients created at import
+        parts = name.split('.')
+        packages['.'.join(parts[:2]) if parts[0] == 'lambda_functions' else parts[0]] += self_us
+
+    return {
+        'handler': handler,
+        'total_ms': sum(self_us for _, self_us, _, _ in imports) / 1000,
+        'modules': len(imports),
+        'packages_ms': {
+            package: self_us / 1000
+            for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        }
+    }
+
+def format_profile(profile, top):
+    lines = [f"{profile['handler']}: {profile['total_ms']:.1f} ms, {profile['modules']} modules"]
+    for package, ms in list(profile['packages_ms'].items())[:top]:
+        lines.append(f"  {package:<30}{ms:>10.1f} ms{ms / profile['total_ms'] * 100:>8.1f}%")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the import-time breakdown of the Lambda handlers.")
+    parser.add_argument('handlers', nargs='*', default=HANDLERS, help="Handlers to profile (default: all)")
+    parser.add_argument('--top', type=int, default=10, help="Number of packages shown per handler")
+    parser.add_argument('--json', action='store_true', help="Print the profiles as JSON")
+    args = parser.parse_args()
+
+    for handler in args.handlers:
+        profile = profile_handler(handler)
+        print(json.dumps(profile) if args.json else format_profile(profile, args.top))
+
+if __name__ == '__main__':
+    main()
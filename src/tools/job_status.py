@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import boto3
+from dotenv import load_dotenv
+
+# The stage modules create boto3 clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.common import job_tracking
+
+def format_progress(progress):
+    """Format the progress of a job for the terminal."""
+    counters = progress['counters']
+    eta = progress['eta_seconds']
+    lines = [
+        f"Job {progress['job_id']} (s3://{progress['bucket']}/{progress['key']})",
+        f"  completion: {progress['completion'] * 100:.1f}% of {counters['enqueued']} companies",
+        f"  eta: {'unknown' if eta is None else f'{eta:.0f}s'}",
+    ]
+    for counter in job_tracking.JOB_COUNTERS:
+        lines.append(f"  {counter:<10}{counters[counter]:>10}{progress['throughput'][counter]:>10.1f} /s")
+    savings = progress.get('savings', {})
+    if savings.get('low_quality'):
+        lines.append(
+            f"  low quality pages skipped: {savings['low_quality']} "
+            f"({savings['tokens_saved']} embedding tokens, {savings['writes_saved']} Pinecone writes saved)"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the progress of ingestion jobs.")
+    parser.add_argument('job_id', nargs='?', help="Job id printed by parse_csv_to_sqs (default: the most recent jobs)")
+    parser.add_argument('--limit', type=int, default=5, help="Number of recent jobs to show when no job id is given")
+    parser.add_argument('--table', help="Job tracking table name (default: $JOBS_TABLE_NAME)")
+    parser.add_argument('--json', action='store_true', help="Print the progress as JSON")
+    args = parser.parse_args()
+
+    load_dotenv()
+    table = boto3.resource('dynamodb').Table(args.table or os.environ.get('JOBS_TABLE_NAME', 'IngestionJobs'))
+
+    job_ids = [args.job_id] if args.job_id else [job['job_id'] for job in job_tracking.list_jobs(table)[:args.limit]]
+    for job_id in job_ids:
+        progress = job_tracking.get_job_progress(job_id, table)
+        if progress is None:
+            print(f"Job {job_id} not found")
+        elif args.json:
+            print(json.dumps(progress))
+        else:
+            print(format_progress(progress))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+"""Local stand-in for a Pinecone index with the interface used by push_to_pinecone.
+
+Vectors are stored in a float32 matrix, memory-mapped from disk when a path is given, and searched by brute
+force with NumPy. Every metadata field gets an inverted index (value -> rows) so filtered queries only score
+the rows matching the filter instead of scanning the whole index.
+
+Supported filter operators: $eq, $ne, $in, $nin, $and, $or, and a bare value for equality, e.g.
+    {'employee_size': {'$in': ['11-50', '51-200']}, 'location': 'USA'}
+
+The matrix can be stored quantized (float16, or int8 with a scale per vector) to cut memory and disk I/O;
+quantized blocks are converted back to float32 as they are scored.
+"""
+import json
+import os
+from collections import defaultdict
+import numpy as np
+
+from src.lambda_functions.common import quantization
+
+METRICS = ('cosine', 'dotproduct', 'euclidean')
+
+# When a filter matches more than this fraction of the rows, scoring every row is cheaper than gathering the matches
+FULL_SCAN_FRACTION = 0.25
+
+# Candidate rows gathered and scored together, small enough for the gathered block to stay in cache
+SCORE_CHUNK_ROWS = 8192
+
+# Rows scored per matrix-vector product when every row is scanned, bounds the float32 copy of quantized blocks
+SCAN_CHUNK_ROWS = 65536
+
+DEFAULT_NAMESPACE = ''
+
+# Storage dtype -> quantization mode
+DTYPES = {'float32': 'none', 'float16': 'float16', 'int8': 'int8'}
+
+class LocalVectorIndex:
+    """Brute-force vector index with Pinecone's upsert, query, fetch and delete methods."""
+
+    def __init__(self, dimension, metric='cosine', path=None, capacity=1024, dtype='float32'):
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric {metric}, expected one of {METRICS}")
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}, expected one of {tuple(DTYPES)}")
+        self.dimension = dimension
+        self.metric = metric
+        self.dtype = dtype
+        self.path = path
+        self.capacity = 0
+        self.size = 0              # Rows used so far, including deleted rows waiting to be reused
+        self.keys = []             # Row -> (namespace, id), None for deleted rows
+        self.metadata = []         # Row -> metadata dict
+        self.rows = {}             # (namespace, id) -> row
+        self.free_rows = []
+        self.postings = defaultdict(lambda: defaultdict(set))   # field -> value -> rows
+        self.posting_arrays = {}   # (field, value) -> sorted row array, cached until the posting changes
+        self.matrix = np.zeros((0, dimension), dtype=dtype)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.scales = np.ones(0, dtype=np.float32)  # int8 scale of each row
+        self.live = np.zeros(0, dtype=bool)
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self._grow(capacity)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # --- Storage ---
+
+    def _grow(self, capacity):
+        """Grow the matrix to hold at least capacity rows, doubling to amortize the copies."""
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+
+        if self.path:
+            # Rows are stored contiguously, so extending the file keeps the existing rows in place
+            matrix_path = os.path.join(self.path, f'vectors.{self.dtype}')
+            if isinstance(self.matrix, np.memmap):
+                self.matrix.flush()
+            with open(matrix_path, 'ab') as f:
+                f.truncate(capacity * self.dimension * np.dtype(self.dtype).itemsize)
+            self.matrix = np.memmap(matrix_path, dtype=self.dtype, mode='r+', shape=(capacity, self.dimension))
+        else:
+            matrix = np.zeros((capacity, self.dimension), dtype=self.dtype)
+            matrix[:self.capacity] = self.matrix
+            self.matrix = matrix
+
+        self.norms = np.concatenate([self.norms, np.zeros(capacity - self.capacity, dtype=np.float32)])
+        self.scales = np.concatenate([self.scales, np.ones(capacity - self.capacity, dtype=np.float32)])
+        self.live = np.concatenate([self.live, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.capacity = capacity
+
+    def _allocate_row(self):
+        if self.free_rows:
+            return self.free_rows.pop()
+        self._grow(self.size + 1)
+        self.size += 1
+        self.keys.append(None)
+        self.metadata.append(None)
+        return self.size - 1
+
+    def _index_metadata(self, row, metadata, add):
+        for field, value in metadata.items():
+            # List values (e.g. tags) are indexed under each of their elements, like Pinecone
+            for item in (value if isinstance(value, list) else [value]):
+                posting = self.postings[field][item]
+                if add:
+                    posting.add(row)
+                else:
+                    posting.discard(row)
+                self.posting_arrays.pop((field, item), None)
+
+    def _remove_row(self, row):
+        namespace, _ = self.keys[row]
+        self._index_metadata(row, self.metadata[row], add=False)
+        self._index_metadata(row, {'__namespace__': namespace}, add=False)
+        del self.rows[self.keys[row]]
+        self.keys[row] = None
+        self.metadata[row] = None
+        self.live[row] = False
+        self.free_rows.append(row)
+
+    # --- Pinecone interface ---
+
+    def upsert(self, vectors, namespace=DEFAULT_NAMESPACE):
+        """Insert or overwrite vectors given as dicts (id, values, metadata) or tuples."""
+        records = [
+            (vector['id'], vector['values'], vector.get('metadata') or {}) if isinstance(vector, dict)
+            else (vector[0], vector[1], vector[2] if len(vector) > 2 else {})
+            for vector in vectors
+        ]
+        if not records:
+            return {'upserted_count': 0}
+
+        values = np.asarray([record[1] for record in records], dtype=np.float32)
+        if values.shape != (len(records), self.dimension):
+            raise ValueError(f"Vector dimension {values.shape[-1]} does not match the index dimension {self.dimension}")
+
+        rows = []
+        for vector_id, _, metadata in records:
+            key = (namespace, vector_id)
+            if key in self.rows:
+                row = self.rows[key]
+                self._index_metadata(row, self.metadata[row], add=False)
+            else:
+                row = self._allocate_row()
+                self.rows[key] = row
+                self.keys[row] = key
+                self._index_metadata(row, {'__namespace__': namespace}, add=True)
+            self.metadata[row] = dict(metadata)
+            self._index_metadata(row, metadata, add=True)
+            rows.append(row)
+
+        # Write the whole batch at once; a vector upserted twice in the batch keeps its last values
+        rows = np.asarray(rows)
+        codes, scales = quantization.quantize(values, DTYPES[self.dtype])
+        self.matrix[rows] = codes
+        if scales is not None:
+            self.scales[rows] = scales
+        # Norms of the stored vectors, so cosine scores are consistent with what is scored
+        self.norms[rows] = np.linalg.norm(quantization.dequantize(codes, scales), axis=1)
+        self.live[rows] = True
+        return {'upserted_count': len(records)}
+
+    def fetch(self, ids, namespace=DEFAULT_NAMESPACE):
+        vectors = {}
+        for vector_id in ids:
+            row = self.rows.get((namespace, vector_id))
+            if row is not None:
+                vectors[vector_id] = {
+                    'id': vector_id,
+                    'values': self._values(row),
+                    'metadata': dict(self.metadata[row])
+                }
+        return {'vectors': vectors, 'namespace': namespace}
+
+    def delete(self, ids=None, delete_all=False, filter=None, namespace=DEFAULT_NAMESPACE):
+        if delete_all:
+            rows = self._namespace_rows(namespace)
+        elif filter is not None:
+            # An empty filter matches every vector, deleting a whole namespace must be asked for explicitly
+            if not filter:
+                raise ValueError("Cannot delete with an empty filter, use delete_all=True to delete a namespace")
+            rows = self._intersect(self._filter_rows(filter), self._namespace_rows(namespace))
+        else:
+            rows = [self.rows[(namespace, i)] for i in ids or [] if (namespace, i) in self.rows]
+        for row in list(rows):
+            self._remove_row(int(row))
+        return {}
+
+    def query(self, vector=None, id=None, top_k=10, filter=None, namespace=DEFAULT_NAMESPACE,
+              include_values=False, include_metadata=False):
+        """Return the top_k closest vectors of a namespace matching the metadata filter."""
+        if vector is None:
+            vector = self.fetch([id], namespace)['vectors'][id]['values']
+        query = np.asarray(vector, dtype=np.float32)
+
+        candidates = self._namespace_rows(namespace)
+        if filter:
+            filtered = self._filter_rows(filter)
+            # Skip the intersection when every vector of the index is in the queried namespace
+            candidates = filtered if len(candidates) == len(self) else self._intersect(filtered, candidates)
+
+        scores = self._score(query, candidates)
+        if len(candidates) > top_k:
+            top = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        matches = []
+        for i in top:
+            row = int(candidates[i])
+            match = {
+                'id': self.keys[row][1],
+                # Euclidean scores are squared distances, lower is closer
+                'score': float(-scores[i] if self.metric == 'euclidean' else scores[i])
+            }
+            if include_values:
+                match['values'] = self._values(row)
+            if include_metadata:
+                match['metadata'] = dict(self.metadata[row])
+            matches.append(match)
+
+        return {'matches': matches, 'namespace': namespace}
+
+    def describe_index_stats(self):
+        namespaces = {
+            namespace: {'vector_count': len(rows)}
+            for namespace, rows in self.postings['__namespace__'].items() if rows
+        }
+        return {'dimension': self.dimension, 'total_vector_count': len(self), 'namespaces': namespaces}
+
+    # --- Search ---
+
+    def _values(self, row):
+        return (self.matrix[row].astype(np.float32) * (self.scales[row] if self.dtype == 'int8' else 1)).tolist()
+
+    def _block_dots(self, rows, query):
+        """Dot products of a block of rows (slice or row array) with the query, dequantizing on the fly."""
+        block = self.matrix[rows]
+        if self.dtype == 'float32':
+            return block @ query
+        dots = block.astype(np.float32) @ query
+        return dots * self.scales[rows] if self.dtype == 'int8' else dots
+
+    def _score(self, query, candidates):
+        """Score the candidate rows against the query, higher is closer for every metric."""
+        if len(candidates) > FULL_SCAN_FRACTION * self.size:
+            # Many rows match: matrix-vector products over contiguous blocks of the matrix, then pick the candidates
+            chunks = range(0, self.size, SCAN_CHUNK_ROWS)
+            dots = np.concatenate([self._block_dots(slice(start, start + SCAN_CHUNK_ROWS), query) for start in chunks])
+            dots = dots[candidates]
+        else:
+            dots = np.concatenate([
+                self._block_dots(candidates[start:start + SCORE_CHUNK_ROWS], query)
+                for start in range(0, len(candidates), SCORE_CHUNK_ROWS)
+            ] or [np.zeros(0, dtype=np.float32)])
+        norms = self.norms[candidates]
+
+        if self.metric == 'dotproduct':
+            return dots
+        if self.metric == 'cosine':
+            denominator = norms * np.linalg.norm(query)
+            return np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator > 0)
+        return -(norms ** 2 - 2 * dots + np.dot(query, query))
+
+    def _posting(self, field, value):
+        key = (field, value)
+        if key not in self.posting_arrays:
+            rows = self.postings[field].get(value, ())
+            self.posting_arrays[key] = np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+        return self.posting_arrays[key]
+
+    def _namespace_rows(self, namespace):
+        return self._posting('__namespace__', namespace)
+
+    def _all_rows(self):
+        return np.flatnonzero(self.live[:self.size])
+
+    # Set operations on sorted row arrays go through a boolean mask over the rows, which is linear
+    # where np.intersect1d and np.union1d sort their inputs
+
+    def _intersect(self, rows, other):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return other[mask[other]]
+
+    def _union(self, row_arrays):
+        mask = np.zeros(self.size, dtype=bool)
+        for rows in row_arrays:
+            mask[rows] = True
+        return np.flatnonzero(mask)
+
+    def _difference(self, rows, other):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[other] = True
+        return rows[~mask[rows]]
+
+    def _filter_rows(self, filter):
+        """Resolve a metadata filter to the sorted array of matching rows using the inverted indexes."""
+        # An empty filter (or an empty $and) matches every vector
+        if not filter:
+            return self._all_rows()
+
+        results = []
+        for field, condition in filter.items():
+            if field == '$and':
+                rows = self._all_rows()
+                for sub_filter in condition:
+                    rows = self._intersect(rows, self._filter_rows(sub_filter))
+            elif field == '$or':
+                rows = self._union([self._filter_rows(sub_filter) for sub_filter in condition])
+            else:
+                rows = self._field_rows(field, condition)
+            results.append(rows)
+
+        # Several fields in the same filter must all match
+        rows = results[0]
+        for other in results[1:]:
+            rows = self._intersect(rows, other)
+        return rows
+
+    def _field_rows(self, field, condition):
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        if not condition:
+            raise ValueError(f"Empty filter condition on {field}")
+
+        results = []
+        for operator, value in condition.items():
+            if operator == '$eq':
+                rows = self._posting(field, value)
+            elif operator == '$in':
+                rows = self._union([self._posting(field, item) for item in value])
+            elif operator == '$ne':
+                rows = self._difference(self._all_rows(), self._posting(field, value))
+            elif operator == '$nin':
+                rows = self._difference(self._all_rows(), self._field_rows(field, {'$in': value}))
+            else:
+                raise ValueError(f"Unsupported filter operator {operator} on {field}")
+            results.append(rows)
+
+        rows = results[0]
+        for other in results[1:]:
+            rows = self._intersect(rows, other)
+        return rows
+
+    # --- Persistence ---
+
+    def save(self):
+        """Flush the matrix and write the ids and metadata next to it."""
+        if not self.path:
+            raise ValueError("Cannot save an in-memory index, create it with a path")
+        self.matrix.flush()
+        np.save(os.path.join(self.path, 'norms.npy'), self.norms[:self.size])
+        np.save(os.path.join(self.path, 'scales.npy'), self.scales[:self.size])
+        state = {
+            'dimension': self.dimension,
+            'metric': self.metric,
+            'dtype': self.dtype,
+            'capacity': self.capacity,
+            'keys': self.keys,
+            'metadata': self.metadata
+        }
+        with open(os.path.join(self.path, 'index.json'), 'w') as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved index; the matrix stays memory-mapped and the inverted indexes are rebuilt."""
+        with open(os.path.join(path, 'index.json')) as f:
+            state = json.load(f)
+
+        index = cls(state['dimension'], state['metric'], path, state['capacity'], state['dtype'])
+        index.size = len(state['keys'])
+        for row, (key, metadata) in enumerate(zip(state['keys'], state['metadata'])):
+            index.keys.append(tuple(key) if key else None)
+            index.metadata.append(metadata)
+            if key is None:
+                index.free_rows.append(row)
+                continue
+            index.rows[tuple(key)] = row
+            index._index_metadata(row, metadata, add=True)
+            index._index_metadata(row, {'__namespace__': key[0]}, add=True)
+
+        live_rows = np.asarray([row for row, key in enumerate(index.keys) if key], dtype=np.int64)
+        index.live[live_rows] = True
+        index.norms[:index.size] = np.load(os.path.join(path, 'norms.npy'))
+        index.scales[:index.size] = np.load(os.path.join(path, 'scales.npy'))
+        return index
@@ -0,0 +1,149 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+
+# SQS returns and accepts at most 10 messages per batch call
+SQS_MAX_BATCH_SIZE = 10
+
+class RateLimiter:
+    """Thread-safe limiter that spaces out batches to at most max_rate messages per second."""
+
+    def __init__(self, max_rate):
+        self.max_rate = max_rate
+        self.lock = threading.Lock()
+        self.next_allowed = time.monotonic()
+
+    def acquire(self, n_messages):
+        # A max_rate of 0 (or None) disables rate limiting
+        if not self.max_rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_allowed - now
+            self.next_allowed = max(now, self.next_allowed) + n_messages / self.max_rate
+        if wait > 0:
+            time.sleep(wait)
+
+class MessageBudget:
+    """Thread-safe counter limiting the total number of messages redriven in one run."""
+
+    def __init__(self, max_messages):
+        self.remaining = max_messages
+        self.lock = threading.Lock()
+
+    def take(self, n_messages):
+        with self.lock:
+            if self.remaining is None:
+                return n_messages
+            taken = min(n_messages, self.remaining)
+            self.remaining -= taken
+            return taken
+
+    def give_back(self, n_messages):
+        with self.lock:
+            if self.remaining is not None:
+                self.remaining += n_messages
+
+def redrive_batch(sqs, dlq_url, target_queue_url, messages):
+    """Send a batch of DLQ messages to the target queue and delete the ones that were accepted."""
+    entries = [
+        {
+            'Id': str(i),
+            'MessageBody': message['Body'],
+        }
+        for i, message in enumerate(messages)
+    ]
+    response = sqs.send_message_batch(QueueUrl=target_queue_url, Entries=entries)
+
+    # Only delete messages from the DLQ once the target queue has accepted them
+    sent_ids = {entry['Id'] for entry in response.get('Successful', [])}
+    for failure in response.get('Failed', []):
+        print(f"Failed to redrive message {failure['Id']}: {failure.get('Message')}")
+
+    to_delete = [
+        {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']}
+        for i, message in enumerate(messages)
+        if str(i) in sent_ids
+    ]
+    if to_delete:
+        sqs.delete_message_batch(QueueUrl=dlq_url, Entries=to_delete)
+
+    return len(to_delete), len(messages) - len(to_delete)
+
+def redrive_worker(sqs, dlq_url, target_queue_url, rate_limiter, budget, visibility_timeout):
+    """Drain the DLQ until it is empty or the shared message budget is used up."""
+    moved = 0
+    failed = 0
+    while True:
+        n_messages = budget.take(SQS_MAX_BATCH_SIZE)
+        if n_messages == 0:
+            break
+
+        response = sqs.receive_message(
+            QueueUrl=dlq_url,
+            MaxNumberOfMessages=n_messages,
+            VisibilityTimeout=visibility_timeout,
+            WaitTimeSeconds=1
+        )
+        messages = response.get('Messages', [])
+
+        # Give back the part of the budget that was not received
+        budget.give_back(n_messages - len(messages))
+        if not messages:
+            break
+
+        rate_limiter.acquire(len(messages))
+        batch_moved, batch_failed = redrive_batch(sqs, dlq_url, target_queue_url, messages)
+        moved += batch_moved
+        failed += batch_failed
+
+    return moved, failed
+
+def redrive(dlq_url, target_queue_url, workers=4, max_rate=50, max_messages=None,
+            visibility_timeout=60, sqs=None):
+    """Replay messages from a dead-letter queue back to its source queue.
+
+    Messages are moved in batches of 10 by a pool of workers. The total throughput
+    is capped at max_rate messages per second so that a large replay does not starve
+    the regular traffic of the target queue.
+    """
+    sqs = sqs or boto3.client('sqs')
+    rate_limiter = RateLimiter(max_rate)
+    budget = MessageBudget(max_messages)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(redrive_worker, sqs, dlq_url, target_queue_url, rate_limiter, budget, visibility_timeout)
+            for _ in range(workers)
+        ]
+        results = [future.result() for future in futures]
+
+    moved = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    elapsed = time.time() - start
+    print(f"Redrove {moved} messages ({failed} failed) from {dlq_url} to {target_queue_url} in {elapsed:.1f}s")
+
+    return {'moved': moved, 'failed': failed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay messages from a dead-letter queue back to its source queue.")
+    parser.add_argument('--dlq-url', required=True, help="URL of the dead-letter queue to drain")
+    parser.add_argument('--target-queue-url', required=True, help="URL of the queue to send the messages back to")
+    parser.add_argument('--workers', type=int, default=4, help="Number of concurrent redrive workers")
+    parser.add_argument('--max-rate', type=float, default=50, help="Maximum messages per second (0 for unlimited)")
+    parser.add_argument('--max-messages', type=int, default=None, help="Stop after redriving this many messages")
+    args = parser.parse_args()
+
+    redrive(
+        args.dlq_url,
+        args.target_queue_url,
+        workers=args.workers,
+        max_rate=args.max_rate,
+        max_messages=args.max_messages
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Embed the companies already ingested with another embedding model, from their cached scraped text.
+
+Streams the CompanyMetadata table page by page, reads the text get_texts cached for every company
+(lambda_functions/common/text_cache.py) instead of scraping the website again, embeds it in batches and
+upserts the vectors into the namespace of the model (lambda_functions/common/embedding_models.py), so a
+migration only costs embedding calls. The vectors keep their id and metadata.
+
+Runs alongside the pipeline: deploy with EMBEDDING_MODELS=<old>,<new> so new companies are dual-written,
+re-embed the existing ones with --skip-existing, then move the readers to the new namespace.
+Companies without cached text (ingested before the cache existed) are counted and can be written to a
+CSV file in the upload format, to go through the pipeline again.
+
+Progress is checkpointed after every page to a JSON file, so an interrupted run resumes where it stopped.
+Large tables can be split between parallel workers with --segment and --total-segments.
+
+Usage:
+    python -m src.tools.reembed --model text-embedding-3-large --skip-existing
+    python -m src.tools.reembed --model text-embedding-3-large --segment 0 --total-segments 4 --missing-output missing-0.csv
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from dotenv import load_dotenv
+
+# The stage modules create boto3 clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.common import embedding_models
+from src.lambda_functions.common import locations
+from src.lambda_functions.common import text_cache
+from src.lambda_functions.get_embeddings import get_embeddings
+from src.lambda_functions.push_to_pinecone import push_to_pinecone
+
+# Maximum number of texts per OpenAI embeddings request (8000 tokens each stays under the request token limit)
+EMBED_BATCH_SIZE = 32
+
+# Items read per scan request, and cached texts downloaded concurrently
+SCAN_PAGE_SIZE = 500
+FETCH_CONCURRENCY = 16
+
+# Columns of the CSV file of companies without cached text, the format of the uploaded files
+MISSING_COLUMNS = ['company_name', 'company_website', 'employee_size', 'location']
+
+def scan_pages(table, segment=0, total_segments=1, start_key=None, page_size=SCAN_PAGE_SIZE):
+    """Yield the (items, last_evaluated_key) pages of a scan segment, last_evaluated_key is None on the last page."""
+    kwargs = {'TableName': table.name, 'Segment': segment, 'TotalSegments': total_segments, 'Limit': page_size}
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+    while True:
+        response = table.meta.client.scan(**kwargs)
+        yield response['Items'], response.get('LastEvaluatedKey')
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def existing_ids(index, ids, namespace):
+    """Ids among ids that already have a vector in the namespace."""
+    response = index.fetch(ids=ids, namespace=namespace)
+    vectors = response['vectors'] if isinstance(response, dict) else response.vectors
+    return set(vectors)
+
+def fetch_texts(items, bucket, concurrency=FETCH_CONCURRENCY):
+    """Download the cached texts of the items in parallel, None for the items without one."""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda item: text_cache.get_text(item['company_website'], bucket), items))
+
+def embed_items(items, texts, model, client, encoding):
+    """Embed the texts of a batch of items and build their vectors, None for the items that failed to embed."""
+    truncated = [get_embeddings.truncate_text(text, encoding) for text in texts]
+    embeddings = get_embeddings.embed_texts(truncated, client, model)
+    return [
+        push_to_pinecone.build_vector(
+            item['id'], get_embeddings.normalize_l2(embedding[:get_embeddings.EMBEDDING_DIMENSIONS]),
+            item['company_name'], item['company_website'], item['employee_size'], item['location'],
+            locations.carry_location({}, item)
+        ) if embedding is not None else None
+        for item, embedding in zip(items, embeddings)
+    ]
+
+def reembed_page(items, providers, model, bucket, batch_size=EMBED_BATCH_SIZE, skip_existing=False, missing_writer=None):
+    """Embed the items of a scan page with the model and upsert them into its namespace, return the counts."""
+    namespace = embedding_models.namespace(model)
+    counts = Counter(scanned=len(items))
+
+    if skip_existing and items:
+        existing = existing_ids(providers['index'], [item['id'] for item in items], namespace)
+        counts['skipped'] += len(existing)
+        items = [item for item in items if item['id'] not in existing]
+
+    texts = fetch_texts(items, bucket)
+    cached = [(item, text) for item, text in zip(items, texts) if text is not None]
+    for item, text in zip(items, texts):
+        if text is None:
+            counts['missing_text'] += 1
+            if missing_writer is not None:
+                missing_writer.writerow({column: item.get(column, '') for column in MISSING_COLUMNS})
+
+    for start in range(0, len(cached), batch_size):
+        batch = cached[start:start + batch_size]
+        vectors = embed_items(
+            [item for item, _ in batch], [text for _, text in batch], model, providers['openai'], providers['encoding']
+        )
+        embedded = [vector for vector in vectors if vector is not None]
+        if len(embedded) < len(vectors):
+            counts['failed'] += len(vectors) - len(embedded)
+        if not embedded:
+            continue
+        try:
+            providers['index'].upsert(vectors=embedded, namespace=namespace)
+            counts['embedded'] += len(embedded)
+        except Exception as e:
+            print(f"Failed to re-embed a batch of {len(embedded)} companies: {str(e)}", file=sys.stderr)
+            counts['failed'] += len(embedded)
+
+    return counts
+
+def load_checkpoint(path, model, segment, total_segments):
+    """Resume state of a previous run of the same model and segment, or a new state."""
+    state = {'model': model, 'segment': segment, 'total_segments': total_segments,
+             'last_evaluated_key': None, 'finished': False, 'counts': {}}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        if all(saved.get(key) == state[key] for key in ('model', 'segment', 'total_segments')):
+            return saved
+        print(f"Ignoring checkpoint {path} of another model or segment", file=sys.stderr)
+    return state
+
+def save_checkpoint(path, state):
+    # Written to a temporary file first so an interrupted write cannot corrupt the checkpoint
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def reembed(table, providers, model, bucket, segment=0, total_segments=1, checkpoint=None, page_size=SCAN_PAGE_SIZE, **page_kwargs):
+    """Re-embed a scan segment of the table, resuming from the checkpoint file, and return the counts."""
+    embedding_models.validate_model(model)
+    state = load_checkpoint(checkpoint, model, segment, total_segments)
+    counts = Counter(state['counts'])
+    if state['finished']:
+        print(f"Segment {segment} was already re-embedded with {model}", file=sys.stderr)
+        return counts
+
+    start = time.time()
+    for items, last_evaluated_key in scan_pages(table, segment, total_segments, state['last_evaluated_key'], page_size):
+        counts.update(reembed_page(items, providers, model, bucket, **page_kwargs))
+        state.update(last_evaluated_key=last_evaluated_key, finished=last_evaluated_key is None, counts=dict(counts))
+        if checkpoint:
+            save_checkpoint(checkpoint, state)
+        elapsed = time.time() - start
+        print(f"[{elapsed:7.1f}s] {dict(counts)}", file=sys.stderr)
+
+    return counts
+
+def get_providers():
+    """Build the embedding and vector index clients."""
+    return {
+        'openai': get_embeddings.get_openai_client(),
+        'encoding': get_embeddings.get_encoding(),
+        'index': push_to_pinecone.get_pinecone_client().Index(os.environ['PINECONE_INDEX_NAME']),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-embed the ingested companies with another model from their cached text.")
+    parser.add_argument('--model', required=True, choices=embedding_models.EMBEDDING_MODELS, help="Embedding model written")
+    parser.add_argument('--table', help="CompanyMetadata table name (default: $DYNAMODB_TABLE_NAME)")
+    parser.add_argument('--bucket', help="Scraped text cache bucket (default: $TEXT_CACHE_BUCKET)")
+    parser.add_argument('--segment', type=int, default=0, help="Scan segment processed by this worker")
+    parser.add_argument('--total-segments', type=int, default=1, help="Number of parallel workers")
+    parser.add_argument('--batch-size', type=int, default=EMBED_BATCH_SIZE, help="Texts per embedding request")
+    parser.add_argument('--skip-existing', action='store_true', help="Skip the companies that already have a vector of the model")
+    parser.add_argument('--checkpoint', help="JSON checkpoint file (default: reembed-<model>-<segment>.json)")
+    parser.add_argument('--missing-output', help="Write the companies without cached text to this CSV file")
+    parser.add_argument('--verbose', action='store_true', help="Keep the logs of the stage functions")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    table = boto3.resource('dynamodb').Table(args.table or os.environ['DYNAMODB_TABLE_NAME'])
+    bucket = args.bucket or os.environ['TEXT_CACHE_BUCKET']
+    checkpoint = args.checkpoint or f"reembed-{args.model}-{args.segment}.json"
+
+    with contextlib.ExitStack() as stack:
+        missing_writer = None
+        if args.missing_output:
+            # Appended to, so a resumed run keeps the companies found before the interruption
+            missing_file = stack.enter_context(open(args.missing_output, 'a', newline=''))
+            missing_writer = csv.DictWriter(missing_file, fieldnames=MISSING_COLUMNS)
+            if missing_file.tell() == 0:
+                missing_writer.writeheader()
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+
+        counts = reembed(
+            table, get_providers(), args.model, bucket, args.segment, args.total_segments, checkpoint,
+            batch_size=args.batch_size, skip_existing=args.skip_existing, missing_writer=missing_writer
+        )
+
+    print(f"Re-embedding with {args.model} finished: {dict(counts)}", file=sys.stderr)
+    return counts
+
+if __name__ == '__main__':
+    main()
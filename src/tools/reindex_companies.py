@@ -0,0 +1,40 @@
+"""Add the secondary index key attributes to CompanyMetadata items written before the indexes existed, and rewrite
+the items indexed by their free-text location before the location index was keyed on the canonical location.
+
+Usage:
+    python -m src.tools.reindex_companies --table CompanyMetadata --segments 8
+"""
+import argparse
+import os
+import boto3
+from dotenv import load_dotenv
+
+# The stage modules create boto3 clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.common import company_index
+from src.lambda_functions.push_to_dynamo import push_to_dynamo
+
+def is_stale(item):
+    return any(item.get(name) != value for name, value in company_index.index_attributes(item).items())
+
+def reindex(table, segments=company_index.SCAN_SEGMENTS):
+    """Rewrite the items with missing or outdated index attributes and return the number of items rewritten."""
+    items = [item for item in company_index.scan_companies(table, segments) if is_stale(item)]
+    with table.batch_writer() as writer:
+        for item in items:
+            writer.put_item(Item=push_to_dynamo.build_item(item))
+    return len(items)
+
+def main():
+    parser = argparse.ArgumentParser(description="Add or update the secondary index attributes of existing CompanyMetadata items.")
+    parser.add_argument('--table', help="Table name (default: $DYNAMODB_TABLE_NAME)")
+    parser.add_argument('--segments', type=int, default=company_index.SCAN_SEGMENTS, help="Parallel scan segments")
+    args = parser.parse_args()
+
+    load_dotenv()
+    table = boto3.resource('dynamodb').Table(args.table or os.environ['DYNAMODB_TABLE_NAME'])
+    print(f"Reindexed {reindex(table, args.segments)} items")
+
+if __name__ == '__main__':
+    main()
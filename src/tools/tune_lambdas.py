@@ -0,0 +1,330 @@
+"""Recommend the memory, SQS batch size and concurrency of each stage Lambda from a replayed workload.
+
+A CSV of companies is first run through the staged pipeline with the offline fake providers to record
+the input messages of every stage. Each stage handler then replays its messages at every batch size
+in a fresh interpreter, which reports the wall and CPU time of every invocation and its peak RSS.
+
+Lambda allocates CPU in proportion to memory (one full vCPU at 1769 MB), so the duration at a memory
+size is modeled as the measured I/O wait plus the CPU time scaled by the CPU share of that size.
+For each stage the cheapest configuration per 1k records is recommended among those that:
+- leave MEMORY_HEADROOM above the peak RSS
+- finish the p95 invocation within TIMEOUT_FRACTION of the function timeout
+- reach the target throughput within the maximum concurrency
+
+The fake providers sleep for the given latencies: pass latencies measured in production
+(CloudWatch duration of the provider calls) for recommendations that match the deployed pipeline.
+The recommendations can be written to the stage_tuning context of cdk.json, read by cdk_stack.py.
+
+Usage:
+    python -m src.tools.tune_lambdas --workload companies.csv --rows 50 --target-throughput 20
+    python -m src.tools.tune_lambdas --workload companies.csv --write-context cdk/cdk.json
+    python -m src.tools.tune_lambdas --mode fused --batch-sizes 5 10 20
+"""
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+import numpy as np
+
+# The stage modules create boto3 clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.parse_csv_to_sqs import parse_csv_to_sqs
+from src.lambda_functions.get_texts import get_texts
+from src.lambda_functions.get_embeddings import get_embeddings
+from src.lambda_functions.push_to_pinecone import push_to_pinecone
+from src.lambda_functions.push_to_dynamo import push_to_dynamo
+from src.lambda_functions.fused_pipeline import fused_pipeline
+from src.tools.fake_providers import FakeScraper, FakeOpenAIClient, FakeEncoding, FakePineconeIndex, FakeDynamoTable, FakeSQS
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# SQS-triggered stages of each pipeline mode, with the queue each stage sends its output to
+STAGES = {
+    'staged': [
+        ('get_texts', 'EMBEDDING_QUEUE_URL'),
+        ('get_embeddings', 'PINECONE_QUEUE_URL'),
+        ('push_to_pinecone', 'DYNAMO_SQS_QUEUE_URL'),
+        ('push_to_dynamo', None),
+    ],
+    'fused': [('fused_pipeline', None)],
+}
+STAGE_INPUTS = {'fused_pipeline': 'get_texts'}
+
+HANDLERS = {
+    'get_texts': get_texts.lambda_handler,
+    'get_embeddings': get_embeddings.lambda_handler,
+    'push_to_pinecone': push_to_pinecone.lambda_handler,
+    'push_to_dynamo': push_to_dynamo.lambda_handler,
+    'fused_pipeline': fused_pipeline.lambda_handler,
+}
+
+# Architecture of each deployed function (cdk_stack.py), for its GB-second price
+ARCHITECTURES = {'get_embeddings': 'arm64'}
+
+# AWS list prices (us-west-2)
+LAMBDA_GB_SECOND_PRICES = {'x86_64': 0.0000166667, 'arm64': 0.0000133334}
+LAMBDA_REQUEST_PRICE = 0.20 / 1_000_000
+SQS_REQUEST_PRICE = 0.40 / 1_000_000
+
+# Memory at which a function gets one full vCPU, below it gets a proportional share
+FULL_VCPU_MEMORY_MB = 1769
+
+# Memory sizes must leave this much room above the measured peak RSS
+MEMORY_HEADROOM = 1.25
+
+# Function timeout of every stage (cdk_stack.py), the p95 invocation must finish well within it
+TIMEOUT_SECONDS = 300
+TIMEOUT_FRACTION = 0.5
+
+FAKE_QUEUE_URLS = {
+    'EMBEDDING_QUEUE_URL': 'embedding-queue',
+    'PINECONE_QUEUE_URL': 'pinecone-queue',
+    'DYNAMO_SQS_QUEUE_URL': 'dynamo-queue',
+}
+
+LATENCY_ARGUMENTS = ('scrape_latency', 'embed_latency', 'embed_per_input_latency', 'upsert_latency', 'dynamo_latency', 'sqs_latency')
+
+@contextlib.contextmanager
+def offline_stages(latencies):
+    """Patch every stage module to use the offline fake providers with the given latencies (seconds)."""
+    sqs = FakeSQS(latency=latencies.get('sqs_latency', 0.0))
+    index = FakePineconeIndex(latency=latencies.get('upsert_latency', 0.0))
+    table = FakeDynamoTable(latency=latencies.get('dynamo_latency', 0.0))
+    openai = FakeOpenAIClient(
+        latency=latencies.get('embed_latency', 0.0), per_input_latency=latencies.get('embed_per_input_latency', 0.0)
+    )
+    pinecone_client = type('FakePinecone', (), {'Index': lambda self, name: index})()
+    dynamodb = type('FakeDynamoDB', (), {'Table': lambda self, name: table})()
+
+    environment = dict(FAKE_QUEUE_URLS, SCRAPINGBEE_API_KEY='fake', PINECONE_INDEX_NAME='fake', DYNAMODB_TABLE_NAME='fake')
+    with patch.dict(os.environ, environment), \
+        patch.object(get_texts.requests, 'get', FakeScraper(latency=latencies.get('scrape_latency', 0.0))), \
+        patch.object(get_texts, 'sqs', sqs), \
+        patch.object(get_embeddings, 'sqs', sqs), \
+        patch.object(push_to_pinecone, 'sqs', sqs), \
+        patch.object(get_embeddings, 'get_openai_client', lambda: openai), \
+        patch.object(get_embeddings, 'get_encoding', FakeEncoding), \
+        patch.object(push_to_pinecone, 'get_pinecone_client', lambda: pinecone_client), \
+        patch.object(push_to_dynamo, 'dynamodb', dynamodb), \
+        patch.object(fused_pipeline, 'dynamodb', dynamodb), \
+        open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield sqs
+
+def make_event(stage, bodies, offset=0):
+    return {'Records': [{'messageId': f'{stage}-{offset + i}', 'body': body} for i, body in enumerate(bodies)]}
+
+def read_companies(csv_path, n_rows):
+    """Format the first n_rows of a CSV file like parse_csv_to_sqs does."""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return [parse_csv_to_sqs.format_company(row) for row in itertools.islice(csv.DictReader(f), n_rows)]
+
+def record_workload(companies):
+    """Run the companies through the staged pipeline and return the input message bodies of every stage."""
+    workload = {'get_texts': [json.dumps(company) for company in companies]}
+    with offline_stages({}) as sqs:
+        for (stage, output_queue), (next_stage, _) in zip(STAGES['staged'], STAGES['staged'][1:]):
+            HANDLERS[stage](make_event(stage, workload[stage]), None)
+            workload[next_stage] = [record['body'] for record in sqs.drain(FAKE_QUEUE_URLS[output_queue])]
+    return workload
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def replay(stage, bodies, batch_size, latencies):
+    """Invoke a stage handler on its messages in batches and measure every invocation."""
+    handler = HANDLERS[stage]
+    invocations = []
+    with offline_stages(latencies):
+        # Warm-up invocation: clients and tokenizer are created once per Lambda container
+        handler(make_event(stage, bodies[:batch_size]), None)
+        for start in range(0, len(bodies), batch_size):
+            event = make_event(stage, bodies[start:start + batch_size], start)
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            handler(event, None)
+            invocations.append({
+                'records': len(event['Records']),
+                'wall_s': time.perf_counter() - wall_start,
+                'cpu_s': time.process_time() - cpu_start,
+            })
+    return {'stage': stage, 'batch_size': batch_size, 'invocations': invocations, 'peak_rss_mb': peak_rss_mb()}
+
+def replay_in_subprocess(stage, workload_path, batch_size, latencies):
+    """Replay a stage in a fresh interpreter, so its peak RSS is measured alone like in a Lambda container."""
+    command = [
+        sys.executable, '-m', 'src.tools.tune_lambdas', '--replay', stage,
+        '--replay-workload', workload_path, '--replay-batch-size', str(batch_size),
+        *itertools.chain.from_iterable((f"--{name.replace('_', '-')}", str(value)) for name, value in latencies.items())
+    ]
+    result = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Replay of {stage} failed: {result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def cpu_share(memory_mb):
+    # Single-threaded Python gains nothing from the extra vCPUs above FULL_VCPU_MEMORY_MB
+    return min(1.0, memory_mb / FULL_VCPU_MEMORY_MB)
+
+def estimate(measurement, memory_mb, target_throughput, architecture='x86_64'):
+    """Model the durations, concurrency and cost of a replayed stage at a memory size."""
+    invocations = measurement['invocations']
+    durations = np.array([
+        max(invocation['wall_s'] - invocation['cpu_s'], 0.0) + invocation['cpu_s'] / cpu_share(memory_mb)
+        for invocation in invocations
+    ])
+    records = sum(invocation['records'] for invocation in invocations)
+    records_per_invocation = records / len(invocations)
+    mean_duration = float(durations.mean())
+
+    # Lambda bills every invocation per started millisecond, SQS bills a receive and a delete per batch
+    billed_seconds = sum(math.ceil(duration * 1000) for duration in durations) / 1000
+    cost = (
+        billed_seconds * memory_mb / 1024 * LAMBDA_GB_SECOND_PRICES[architecture]
+        + len(invocations) * (LAMBDA_REQUEST_PRICE + 2 * SQS_REQUEST_PRICE)
+    )
+    return {
+        'memory_size': memory_mb,
+        'batch_size': measurement['batch_size'],
+        'peak_rss_mb': measurement['peak_rss_mb'],
+        'duration_mean_s': mean_duration,
+        'duration_p95_s': float(np.percentile(durations, 95)),
+        'records_per_second_per_instance': records_per_invocation / mean_duration,
+        'concurrency': max(1, math.ceil(target_throughput * mean_duration / records_per_invocation)),
+        'cost_per_1k': cost * 1000 / records,
+    }
+
+def rejection(candidate, max_concurrency):
+    """Reason a candidate configuration cannot be deployed, or None."""
+    if candidate['memory_size'] < candidate['peak_rss_mb'] * MEMORY_HEADROOM:
+        return 'memory'
+    if candidate['duration_p95_s'] > TIMEOUT_SECONDS * TIMEOUT_FRACTION:
+        return 'timeout'
+    if candidate['concurrency'] > max_concurrency:
+        return 'throughput'
+    return None
+
+def recommend(measurements, memory_sizes, target_throughput, max_concurrency, architecture='x86_64'):
+    """Return every candidate configuration of a stage and the cheapest one that can be deployed (or None)."""
+    candidates = []
+    for measurement in measurements:
+        for memory_mb in memory_sizes:
+            candidate = estimate(measurement, memory_mb, target_throughput, architecture)
+            candidate['rejected'] = rejection(candidate, max_concurrency)
+            candidates.append(candidate)
+
+    feasible = [candidate for candidate in candidates if candidate['rejected'] is None]
+    best = min(feasible, key=lambda candidate: (candidate['cost_per_1k'], candidate['concurrency']), default=None)
+    return candidates, best
+
+def stage_context(best):
+    """Settings of a recommendation in the stage_tuning context read by cdk_stack.py."""
+    return {setting: best[setting] for setting in ('memory_size', 'batch_size', 'concurrency')}
+
+def write_context(path, tuning):
+    """Merge the stage settings into the stage_tuning context of a cdk.json file."""
+    with open(path) as f:
+        config = json.load(f)
+    context = config.setdefault('context', {})
+    context['stage_tuning'] = {**context.get('stage_tuning', {}), **tuning}
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+        f.write('\n')
+
+def print_stage(stage, candidates, best):
+    print(f"\n{stage}")
+    print(f"{'memory':>8}{'batch':>7}{'rss MB':>8}{'mean s':>9}{'p95 s':>9}{'rec/s/inst':>12}{'conc':>6}{'$/1k':>11}  ")
+    for candidate in candidates:
+        status = candidate['rejected'] or ('recommended' if candidate is best else '')
+        print(
+            f"{candidate['memory_size']:>8}{candidate['batch_size']:>7}{candidate['peak_rss_mb']:>8.0f}"
+            f"{candidate['duration_mean_s']:>9.3f}{candidate['duration_p95_s']:>9.3f}"
+            f"{candidate['records_per_second_per_instance']:>12.2f}{candidate['concurrency']:>6}"
+            f"{candidate['cost_per_1k']:>11.5f}  {status}"
+        )
+    if best is None:
+        print("No configuration reaches the target throughput within the limits")
+
+def replay_main(args, latencies):
+    """Entry point of the replay subprocess: print the measurement of one stage as JSON."""
+    with open(args.replay_workload) as f:
+        bodies = json.load(f)[STAGE_INPUTS.get(args.replay, args.replay)]
+    print(json.dumps(replay(args.replay, bodies, args.replay_batch_size, latencies)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend the memory, batch size and concurrency of each stage Lambda.")
+    parser.add_argument('--workload', help="CSV of companies to replay (default: generated companies)")
+    parser.add_argument('--rows', type=int, default=50, help="Rows of the workload to replay")
+    parser.add_argument('--mode', choices=sorted(STAGES), default=os.environ.get('PIPELINE_MODE', 'staged'))
+    parser.add_argument('--memory-sizes', type=int, nargs='+', default=[128, 256, 512, 1024, 1769, 3008])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--target-throughput', type=float, default=10.0, help="Records per second each stage must sustain")
+    parser.add_argument('--max-concurrency', type=int, default=100, help="Maximum concurrent executions of a stage")
+    parser.add_argument('--scrape-latency', type=float, default=0.5)
+    parser.add_argument('--embed-latency', type=float, default=0.1)
+    parser.add_argument('--embed-per-input-latency', type=float, default=0.001)
+    parser.add_argument('--upsert-latency', type=float, default=0.05)
+    parser.add_argument('--dynamo-latency', type=float, default=0.02)
+    parser.add_argument('--sqs-latency', type=float, default=0.01)
+    parser.add_argument('--output', help="Write every candidate and the recommendations to this JSON file")
+    parser.add_argument('--write-context', metavar='CDK_JSON', help="Merge the recommendations into the stage_tuning context of this cdk.json")
+    # Internal: replay one stage in this process (used by the subprocesses of replay_in_subprocess)
+    parser.add_argument('--replay', help=argparse.SUPPRESS)
+    parser.add_argument('--replay-workload', help=argparse.SUPPRESS)
+    parser.add_argument('--replay-batch-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    latencies = {name: getattr(args, name) for name in LATENCY_ARGUMENTS}
+    if args.replay:
+        replay_main(args, latencies)
+        return
+
+    if args.workload:
+        companies = read_companies(args.workload, args.rows)
+    else:
+        companies = [
+            parse_csv_to_sqs.format_company({
+                'company_name': f'Company {i}', 'company_website': f'company{i}.com', 'employee_size': '42', 'location': 'USA'
+            })
+            for i in range(args.rows)
+        ]
+
+    results = {}
+    tuning = {}
+    with tempfile.TemporaryDirectory() as directory:
+        workload_path = os.path.join(directory, 'workload.json')
+        with open(workload_path, 'w') as f:
+            json.dump(record_workload(companies), f)
+
+        for stage, _ in STAGES[args.mode]:
+            print(f"Replaying {stage}...", file=sys.stderr)
+            measurements = [replay_in_subprocess(stage, workload_path, batch_size, latencies) for batch_size in args.batch_sizes]
+            candidates, best = recommend(
+                measurements, args.memory_sizes, args.target_throughput, args.max_concurrency,
+                ARCHITECTURES.get(stage, 'x86_64')
+            )
+            print_stage(stage, candidates, best)
+            results[stage] = {'candidates': candidates, 'recommended': best}
+            if best is not None:
+                tuning[stage] = stage_context(best)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'mode': args.mode, 'target_throughput': args.target_throughput, 'latencies': latencies, 'stages': results}, f, indent=2)
+
+    if args.write_context and tuning:
+        write_context(args.write_context, tuning)
+        print(f"\nWrote the stage_tuning context of {', '.join(tuning)} to {args.write_context}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Summarize the profiles written by the handlers' profiling hooks (lambda_functions/common/profiling.py).
+
+Reads every profile under an S3 prefix or a local directory and reports, over all the invocations:
+- where the time goes by category (network waits, BeautifulSoup, tiktoken, JSON, AWS SDK, ...)
+- the functions with the most samples, on their own (self) and with their callees (total)
+- the peak traced memory and the top allocation sites of the invocation with the highest peak
+
+Sampling profiles (.folded) can be merged into one file for a flame graph tool
+(flamegraph.pl, speedscope, inferno); cProfile profiles (.pstats) are summarized with pstats.
+
+Usage:
+    python -m src.tools.view_profile s3://my-profile-bucket/profiles/get_texts/2026-10-19/
+    python -m src.tools.view_profile /tmp/profiles --stage get_embeddings --top 30
+    python -m src.tools.view_profile s3://my-profile-bucket/profiles/ --folded merged.folded
+"""
+import argparse
+import json
+import os
+import pstats
+import re
+import tempfile
+import tracemalloc
+from collections import Counter, defaultdict
+import boto3
+import numpy as np
+
+# Categories of a stack, from the first frame matching one of their modules when walking up from the leaf.
+# Threads waiting on a pool or a lock are 'waiting': in the fused pipeline the main thread waits on the scrapers.
+CATEGORIES = [
+    ('network', ('socket', 'ssl', '_ssl', 'select', 'selectors', 'http.client', 'urllib3', 'requests', 'httpx', 'httpcore')),
+    ('beautifulsoup', ('bs4', 'html.parser', 'soupsieve')),
+    ('tiktoken', ('tiktoken', 'tiktoken_ext')),
+    ('json', ('json', '_json')),
+    ('aws sdk', ('boto3', 'botocore', 's3transfer')),
+    ('openai', ('openai',)),
+    ('pinecone', ('pinecone',)),
+    ('waiting', ('threading', 'concurrent.futures', 'queue')),
+]
+
+PROFILE_EXTENSIONS = ('.json', '.folded', '.pstats', '.tracemalloc')
+
+def category(modules):
+    """Category of a stack given its modules from the leaf up, 'other' when none matches."""
+    for module in modules:
+        for name, prefixes in CATEGORIES:
+            if any(module == prefix or module.startswith(prefix + '.') for prefix in prefixes):
+                return name
+    return 'other'
+
+def parse_folded(text):
+    """Parse folded stacks ("root;caller;leaf count" lines) into a Counter of frame tuples."""
+    stacks = Counter()
+    for line in text.splitlines():
+        if line.strip():
+            stack, count = line.rsplit(' ', 1)
+            stacks[tuple(stack.split(';'))] += int(count)
+    return stacks
+
+def frame_module(frame):
+    return frame.rsplit(':', 1)[0]
+
+def summarize_folded(stacks, top):
+    """Samples by category and the top functions by self and total samples."""
+    categories = Counter()
+    self_samples = Counter()
+    total_samples = Counter()
+    for stack, count in stacks.items():
+        # The first frame is the thread name
+        frames = stack[1:]
+        if not frames:
+            continue
+        categories[category([frame_module(frame) for frame in reversed(frames)])] += count
+        self_samples[frames[-1]] += count
+        for frame in set(frames):
+            total_samples[frame] += count
+    return {
+        'samples': sum(categories.values()),
+        'categories': dict(categories.most_common()),
+        'top_self': self_samples.most_common(top),
+        'top_total': total_samples.most_common(top),
+    }
+
+def pstats_module(filename, function):
+    """Module name of a pstats entry, from its source path or, for built-ins, from the function description."""
+    if filename == '~':
+        # e.g. "<method 'recv_into' of '_ssl._SSLSocket' objects>" or "<built-in method _json.scanstring>"
+        match = re.search(r"of '([\w.]+)\.\w+' objects", function) or re.search(r"method ([\w.]+)\.\w+>", function)
+        return match.group(1) if match else 'builtins'
+    path = filename.replace(os.sep, '/')
+    # Libraries, Lambda layers (/opt/python), deployed code (/var/task) and the local src/ tree
+    match = re.search(r'.*/(?:site-packages|python3\.\d+|opt/python|var/task|src)/(.+)\.py$', path)
+    module = match.group(1) if match else os.path.splitext(os.path.basename(path))[0]
+    return module.replace('/__init__', '').replace('/', '.')
+
+def summarize_pstats(stats, top):
+    """Self time by category and the top functions by self and cumulative time."""
+    categories = defaultdict(float)
+    self_time = Counter()
+    total_time = Counter()
+    for (filename, lineno, function), (_, _, tottime, cumtime, _) in stats.stats.items():
+        module = pstats_module(filename, function)
+        categories[category([module])] += tottime
+        name = f"{module}:{function}"
+        self_time[name] += tottime
+        total_time[name] += cumtime
+    return {
+        'seconds': sum(categories.values()),
+        'categories': dict(sorted(categories.items(), key=lambda item: item[1], reverse=True)),
+        'top_self': self_time.most_common(top),
+        'top_total': total_time.most_common(top),
+    }
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def list_profiles(source, stage=None):
+    """Yield (name, reader) for every profile file under an s3:// prefix or a local path."""
+    if source.startswith('s3://'):
+        bucket, _, prefix = source[len('s3://'):].partition('/')
+        s3 = boto3.client('s3')
+        for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            for item in page.get('Contents', []):
+                key = item['Key']
+                if key.endswith(PROFILE_EXTENSIONS) and (stage is None or f"/{stage}/" in f"/{key}"):
+                    yield key, lambda key=key: s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        return
+
+    paths = [source] if os.path.isfile(source) else [
+        os.path.join(directory, name) for directory, _, names in os.walk(source) for name in sorted(names)
+    ]
+    for path in paths:
+        if path.endswith(PROFILE_EXTENSIONS) and (stage is None or f"{os.sep}{stage}{os.sep}" in path):
+            yield path, lambda path=path: read_file(path)
+
+def load_profiles(source, stage=None):
+    """Load the profile files of every invocation, grouped by invocation and extension."""
+    invocations = defaultdict(dict)
+    for name, read in list_profiles(source, stage):
+        base, extension = os.path.splitext(name)
+        invocations[base][extension] = read()
+    return invocations
+
+def print_table(title, rows, total, unit):
+    print(f"\n{title}")
+    for name, value in rows:
+        share = value / total if total else 0
+        print(f"  {share:>6.1%} {value:>10.{3 if unit == 's' else 0}f} {unit:<8} {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the profiles written by the handlers' profiling hooks.")
+    parser.add_argument('source', help="s3://bucket/prefix or local directory (default PROFILE_DIR of the hooks) or file")
+    parser.add_argument('--stage', help="Only the profiles of this stage")
+    parser.add_argument('--top', type=int, default=20, help="Functions listed")
+    parser.add_argument('--folded', help="Write the merged sampled stacks to this file, for a flame graph tool")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    invocations = load_profiles(args.source, args.stage)
+    if not invocations:
+        print(f"No profiles found under {args.source}")
+        return
+
+    summaries = [json.loads(files['.json']) for files in invocations.values() if '.json' in files]
+    stacks = Counter()
+    pstats_paths = []
+    with tempfile.TemporaryDirectory() as directory:
+        for i, files in enumerate(invocations.values()):
+            if '.folded' in files:
+                stacks.update(parse_folded(files['.folded'].decode('utf-8')))
+            if '.pstats' in files:
+                path = os.path.join(directory, f'{i}.pstats')
+                with open(path, 'wb') as f:
+                    f.write(files['.pstats'])
+                pstats_paths.append(path)
+        cprofile = summarize_pstats(pstats.Stats(*pstats_paths), args.top) if pstats_paths else None
+
+        # Allocation sites of the invocation with the highest traced memory peak
+        peak_base = max(
+            (base for base, files in invocations.items() if '.json' in files and '.tracemalloc' in files),
+            key=lambda base: json.loads(invocations[base]['.json'])['peak_traced_bytes'], default=None
+        )
+        allocations = None
+        if peak_base is not None:
+            path = os.path.join(directory, 'peak.tracemalloc')
+            with open(path, 'wb') as f:
+                f.write(invocations[peak_base]['.tracemalloc'])
+            allocations = [
+                (f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size / 1024)
+                for stat in tracemalloc.Snapshot.load(path).statistics('lineno')[:args.top]
+            ]
+
+    sampled = summarize_folded(stacks, args.top) if stacks else None
+    durations = [summary['duration_s'] for summary in summaries]
+    peaks = [summary['peak_traced_bytes'] / (1024 * 1024) for summary in summaries]
+    report = {
+        'invocations': len(invocations),
+        'stages': dict(Counter(summary['stage'] for summary in summaries)),
+        'duration_p50_s': float(np.percentile(durations, 50)) if durations else None,
+        'duration_p95_s': float(np.percentile(durations, 95)) if durations else None,
+        'peak_traced_mb_max': max(peaks) if peaks else None,
+        'sampled': sampled,
+        'cprofile': cprofile,
+        'peak_allocations_kb': allocations,
+    }
+
+    if args.folded and stacks:
+        with open(args.folded, 'w') as f:
+            f.writelines(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks.items()))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['invocations']} profiled invocations: {', '.join(f'{stage} {n}' for stage, n in report['stages'].items())}")
+    if durations:
+        print(f"duration p50 {report['duration_p50_s']:.3f}s, p95 {report['duration_p95_s']:.3f}s, peak traced memory {report['peak_traced_mb_max']:.1f} MB")
+    if sampled:
+        print_table("Sampled time by category", sampled['categories'].items(), sampled['samples'], 'samples')
+        print_table("Top functions (self)", sampled['top_self'], sampled['samples'], 'samples')
+        print_table("Top functions (total)", sampled['top_total'], sampled['samples'], 'samples')
+    if cprofile:
+        print_table("cProfile self time by category", cprofile['categories'].items(), cprofile['seconds'], 's')
+        print_table("Top functions (self)", cprofile['top_self'], cprofile['seconds'], 's')
+        print_table("Top functions (cumulative)", cprofile['top_total'], cprofile['seconds'], 's')
+    if allocations:
+        print_table("Allocation sites of the invocation with the highest memory peak", allocations, sum(kb for _, kb in allocations), 'KB')
+    if args.folded and stacks:
+        print(f"\nWrote the merged stacks to {args.folded}")
+
+if __name__ == '__main__':
+    main()
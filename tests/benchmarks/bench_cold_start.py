@@ -0,0 +1,110 @@
+"""Benchmark the init duration of each Lambda handler, before and after a change.
+
+Every sample imports a handler in a fresh interpreter, like a Lambda cold start. Two durations are measured:
+- init: the import of the handler module (the Lambda INIT phase)
+- first use: init plus creating the clients of the first invocation, so lazily imported
+  modules are counted instead of being moved out of the measurement
+
+The baseline is the src/ tree of another git revision, exported to a temporary directory.
+
+Usage:
+    python -m tests.benchmarks.bench_cold_start --baseline-ref HEAD~1 --repeats 10
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import numpy as np
+
+from src.tools.import_profile import HANDLERS, SRC_DIR, handler_module, handler_environment
+
+# Client factories called by the first invocation of each handler
+FIRST_USE = {
+    'get_embeddings': ['get_openai_client'],
+    'push_to_pinecone': ['get_pinecone_client'],
+}
+
+# Runs in the fresh interpreter: import the handler, then call its client factories
+SAMPLE_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+init = time.perf_counter() - start
+for name in sys.argv[2:]:
+    factory = getattr(module, name, None)
+    if factory is not None:
+        factory()
+print(json.dumps({'init': init, 'first_use': time.perf_counter() - start}))
+"""
+
+def sample(handler, src_dir):
+    """Cold start a handler once and return its init and first use durations in seconds."""
+    env = handler_environment()
+    env.setdefault('OPENAI_API_KEY', 'benchmark')
+    env.setdefault('PINECONE_API_KEY', 'benchmark')
+    result = subprocess.run(
+        [sys.executable, '-c', SAMPLE_SCRIPT, handler_module(handler), *FIRST_USE.get(handler, [])],
+        cwd=src_dir, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure(src_dir, handlers, repeats):
+    """Median init and first use durations in milliseconds of each handler, None if it cannot be imported."""
+    results = {}
+    for handler in handlers:
+        samples = [sample(handler, src_dir) for _ in range(repeats)]
+        if any(s is None for s in samples):
+            results[handler] = None
+            continue
+        results[handler] = {
+            'init_ms': float(np.median([s['init'] for s in samples]) * 1000),
+            'first_use_ms': float(np.median([s['first_use'] for s in samples]) * 1000),
+        }
+    return results
+
+def export_src(ref, directory):
+    """Extract the src/ tree of a git revision into a directory and return its path."""
+    archive = subprocess.run(
+        ['git', 'archive', ref, 'src'], cwd=os.path.dirname(SRC_DIR), capture_output=True, check=True
+    ).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    return os.path.join(directory, 'src')
+
+def format_ms(result, key):
+    return f"{result[key]:>10.1f}" if result else f"{'n/a':>10}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold start init duration of the Lambda handlers.")
+    parser.add_argument('handlers', nargs='*', default=HANDLERS, help="Handlers to benchmark (default: all)")
+    parser.add_argument('--baseline-ref', help="Git revision to compare against, e.g. HEAD~1")
+    parser.add_argument('--repeats', type=int, default=5, help="Cold starts per handler")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {'current': measure(SRC_DIR, args.handlers, args.repeats)}
+    if args.baseline_ref:
+        with tempfile.TemporaryDirectory() as directory:
+            results['baseline'] = measure(export_src(args.baseline_ref, directory), args.handlers, args.repeats)
+
+    print(f"{'handler':<20}{'init ms':>10}{'first ms':>10}" + (f"{'base init':>10}{'base first':>11}" if args.baseline_ref else ""))
+    for handler in args.handlers:
+        current = results['current'][handler]
+        line = f"{handler:<20}{format_ms(current, 'init_ms')}{format_ms(current, 'first_use_ms')}"
+        if args.baseline_ref:
+            baseline = results['baseline'][handler]
+            line += f"{format_ms(baseline, 'init_ms')} {format_ms(baseline, 'first_use_ms')}"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Benchmark CompanyMetadata lookups: table scans against the secondary indexes, on a moto table.
+
+Moto latencies are not DynamoDB latencies: moto evaluates a GSI query by iterating over the whole table, so an
+index query costs about as much as a scan there (and a sharded query once per shard). The read capacity units of
+each lookup are estimated from the item sizes like DynamoDB bills them (eventually consistent, 4 KB per half unit):
+a filtered scan reads every item of the table, an index query only reads the matching items.
+
+Usage:
+    python -m tests.benchmarks.bench_company_index --companies 100000
+"""
+import argparse
+import json
+import math
+import os
+import time
+import numpy as np
+
+# The stage modules create boto3 clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+from moto import mock_aws
+from src.lambda_functions.common import company_index
+from src.lambda_functions.push_to_dynamo.push_to_dynamo import build_item
+from src.lambda_functions.push_to_pinecone.push_to_pinecone import generate_unique_id
+from tests.test_company_index import create_company_table
+
+EMPLOYEE_SIZES = ['1-10', '11-50', '51-200', '201-500', '500+', 'NA']
+LOCATIONS = ['NA', 'USA', 'United Kingdom', 'India', 'Germany', 'France', 'Canada', 'Brazil', 'Australia', 'Spain']
+
+def make_companies(n_companies, seed=0):
+    """Companies with a skewed size and location distribution ('1-10' and 'NA' dominate, like real data)."""
+    rng = np.random.default_rng(seed)
+    size_weights = np.array([40, 25, 15, 8, 4, 8]) / 100
+    location_weights = 1 / np.arange(1, len(LOCATIONS) + 1)
+    location_weights /= location_weights.sum()
+    sizes = rng.choice(EMPLOYEE_SIZES, size=n_companies, p=size_weights)
+    locations = rng.choice(LOCATIONS, size=n_companies, p=location_weights)
+    for i in range(n_companies):
+        website = f'https://www.company{i}.com'
+        yield {
+            'id': generate_unique_id(website),
+            'company_name': f'Company {i}',
+            'company_website': website,
+            'employee_size': str(sizes[i]),
+            'location': str(locations[i])
+        }
+
+def scan_filter(attribute, value):
+    return {
+        'FilterExpression': '#attribute = :value',
+        'ExpressionAttributeNames': {'#attribute': attribute},
+        'ExpressionAttributeValues': {':value': value}
+    }
+
+def scan_lookup(table, segments, *conditions):
+    """The lookup without indexes: a filtered scan of the whole table."""
+    kwargs = scan_filter(*conditions[0])
+    if len(conditions) > 1:
+        kwargs['FilterExpression'] += ' AND #attribute2 = :value2'
+        kwargs['ExpressionAttributeNames']['#attribute2'] = conditions[1][0]
+        kwargs['ExpressionAttributeValues'][':value2'] = conditions[1][1]
+    return company_index.scan_companies(table, segments, **kwargs)
+
+def item_size(item):
+    # DynamoDB item size: attribute names plus values
+    return sum(len(name) + len(str(value)) for name, value in item.items())
+
+def read_units(request_bytes):
+    """Eventually consistent read units of a list of requests, each rounded up to 4 KB."""
+    return sum(max(1, math.ceil(n_bytes / 4096)) * 0.5 for n_bytes in request_bytes)
+
+def index_read_units(items, partition_attribute):
+    """Read units of an index lookup: one query per shard, or a single query when not sharded."""
+    shard_bytes = {}
+    for item in items:
+        shard = item[partition_attribute] if partition_attribute else None
+        shard_bytes[shard] = shard_bytes.get(shard, 0) + item_size(item)
+    shards = company_index.COMPANY_INDEX_SHARDS if partition_attribute else 1
+    return read_units(list(shard_bytes.values()) + [0] * (shards - len(shard_bytes)))
+
+def timed(function, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        items = function()
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies) * 1000), len(items)
+
+@mock_aws
+def run(args):
+    table = create_company_table()
+    start = time.perf_counter()
+    table_bytes = 0
+    with table.batch_writer() as writer:
+        for company in make_companies(args.companies):
+            item = build_item(company)
+            table_bytes += item_size(item)
+            writer.put_item(Item=item)
+    print(f"Loaded {args.companies} companies in {time.perf_counter() - start:.1f}s")
+    # A scan reads the table in 1 MB pages
+    scan_read_units = read_units([2**20] * (table_bytes // 2**20) + [table_bytes % 2**20])
+
+    lookups = {
+        'domain': (
+            lambda segments: scan_lookup(table, segments, ('domain', 'company123.com')),
+            lambda: company_index.find_by_domain(table, 'https://www.company123.com'),
+            None
+        ),
+        'size (1-10)': (
+            lambda segments: scan_lookup(table, segments, ('employee_size', '1-10')),
+            lambda: company_index.find_companies(table, employee_size='1-10'),
+            'size_shard'
+        ),
+        'size + location': (
+            lambda segments: scan_lookup(table, segments, ('employee_size', '51-200'), ('location', 'India')),
+            lambda: company_index.find_companies(table, employee_size='51-200', location='India'),
+            'location_shard'
+        ),
+        'location (NA)': (
+            lambda segments: scan_lookup(table, segments, ('location', 'NA')),
+            lambda: company_index.find_companies(table, location='NA'),
+            'location_shard'
+        ),
+    }
+
+    results = []
+    print(f"{'lookup':<18}{'items':>8}{'scan ms':>10}{'par. scan ms':>14}{'index ms':>10}{'scan RCU':>10}{'index RCU':>11}")
+    for name, (scan, query, partition_attribute) in lookups.items():
+        scan_ms, n_items = timed(lambda: scan(1), args.repeats)
+        parallel_scan_ms, _ = timed(lambda: scan(args.segments), args.repeats)
+        index_ms, _ = timed(query, args.repeats)
+        items = query()
+        assert n_items == len(items), f"{name}: scan found {n_items} items, index {len(items)}"
+        result = {
+            'lookup': name,
+            'items': n_items,
+            'scan_ms': scan_ms,
+            'parallel_scan_ms': parallel_scan_ms,
+            'index_ms': index_ms,
+            'scan_read_units': scan_read_units,
+            'index_read_units': index_read_units(items, partition_attribute),
+        }
+        results.append(result)
+        print(
+            f"{name:<18}{n_items:>8}{scan_ms:>10.1f}{parallel_scan_ms:>14.1f}{index_ms:>10.1f}"
+            f"{result['scan_read_units']:>10.1f}{result['index_read_units']:>11.1f}"
+        )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CompanyMetadata scans against index queries on moto.")
+    parser.add_argument('--companies', type=int, default=100_000)
+    parser.add_argument('--segments', type=int, default=company_index.SCAN_SEGMENTS, help="Parallel scan segments")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Simulate small uploads competing with a large backfill, with and without priority lanes.
+
+A discrete-event simulation of the staged pipeline (scrape, embed, upsert, store), each stage a pool
+of Lambda workers fed by its queues. A bulk job of --bulk-rows rows is uploaded first, then a small
+job of --small-rows rows every --small-interval seconds. Scheduling policies:
+
+- shared: a single queue per stage, all uploads in arrival order (the pipeline before lanes)
+- lanes: a priority and a bulk queue per stage, each lane with its own concurrency
+  (reserved concurrency of the first stage and event source maximum concurrency downstream, as deployed by cdk_stack.py)
+- weighted-fair: a priority and a bulk queue per stage sharing one pool of workers, each free worker
+  polls the non-empty lanes by smooth weighted round robin (the lane concurrencies as weights)
+
+Reports the latency of the small jobs (upload to last row stored) and the completion time of the bulk job.
+
+Usage:
+    python -m tests.benchmarks.bench_lanes --bulk-rows 20000 --small-jobs 20
+"""
+import argparse
+import heapq
+import json
+from collections import deque
+import numpy as np
+
+from src.lambda_functions.common import lanes
+
+# Mean seconds per row of each stage
+STAGES = [('scrape', 2.0), ('embed', 0.4), ('upsert', 0.15), ('store', 0.05)]
+
+POLICIES = ('shared', 'lanes', 'weighted-fair')
+
+class Stage:
+    """Queues and busy workers of one pipeline stage."""
+
+    def __init__(self, policy, concurrency):
+        self.policy = policy
+        self.concurrency = concurrency
+        self.total = sum(concurrency.values())
+        self.queues = {lane: deque() for lane in concurrency}
+        self.busy = {lane: 0 for lane in concurrency}
+        # Smooth weighted round robin state of the weighted-fair policy
+        self.credits = {lane: 0 for lane in concurrency}
+
+    def queue_lane(self, lane):
+        return 'shared' if self.policy == 'shared' else lane
+
+    def next_lane(self):
+        """Pick the lane whose queue the next free worker polls, or None when no worker or message is available."""
+        ready = [lane for lane, queue in self.queues.items() if queue]
+        if self.policy == 'shared':
+            return 'shared' if ready and self.busy['shared'] < self.total else None
+        if self.policy == 'lanes':
+            ready = [lane for lane in ready if self.busy[lane] < self.concurrency[lane]]
+            return ready[0] if ready else None
+
+        if not ready or sum(self.busy.values()) >= self.total:
+            return None
+        # Each ready lane earns its weight, the richest is served and pays the total of the ready weights
+        for lane in ready:
+            self.credits[lane] += self.concurrency[lane]
+        lane = max(ready, key=self.credits.get)
+        self.credits[lane] -= sum(self.concurrency[lane] for lane in ready)
+        return lane
+
+def simulate(policy, args, seed=0):
+    rng = np.random.default_rng(seed)
+    lane_concurrency = {lanes.PRIORITY_LANE: args.priority_concurrency, lanes.BULK_LANE: args.bulk_concurrency}
+    concurrency = {'shared': sum(lane_concurrency.values())} if policy == 'shared' else lane_concurrency
+    stages = [Stage(policy, concurrency) for _ in STAGES]
+    events = []
+    sequence = 0
+
+    def push(time, *event):
+        nonlocal sequence
+        heapq.heappush(events, (time, sequence, *event))
+        sequence += 1
+
+    # Jobs: (upload time, rows, lane)
+    jobs = [(0.0, args.bulk_rows, lanes.classify_upload('bulk.csv', args.bulk_rows))]
+    jobs += [
+        (args.small_start + i * args.small_interval, args.small_rows, lanes.classify_upload('customer.csv', args.small_rows))
+        for i in range(args.small_jobs)
+    ]
+    remaining = [rows for _, rows, _ in jobs]
+    done_at = [None] * len(jobs)
+    for job_id, (upload_time, _, _) in enumerate(jobs):
+        push(upload_time, 'upload', job_id)
+
+    def dispatch(stage_index, now):
+        stage = stages[stage_index]
+        while True:
+            queue_lane = stage.next_lane()
+            if queue_lane is None:
+                return
+            job_id = stage.queues[queue_lane].popleft()
+            stage.busy[queue_lane] += 1
+            mean = STAGES[stage_index][1]
+            push(now + rng.gamma(4, mean / 4), 'done', job_id, stage_index, queue_lane)
+
+    while events:
+        now, _, kind, job_id, *rest = heapq.heappop(events)
+        if kind == 'upload':
+            _, rows, lane = jobs[job_id]
+            stages[0].queues[stages[0].queue_lane(lane)].extend([job_id] * rows)
+            dispatch(0, now)
+            continue
+
+        stage_index, queue_lane = rest
+        stages[stage_index].busy[queue_lane] -= 1
+        if stage_index + 1 < len(stages):
+            next_stage = stages[stage_index + 1]
+            next_stage.queues[next_stage.queue_lane(jobs[job_id][2])].append(job_id)
+            dispatch(stage_index + 1, now)
+        else:
+            remaining[job_id] -= 1
+            if remaining[job_id] == 0:
+                done_at[job_id] = now
+        dispatch(stage_index, now)
+
+    small_latencies = np.array([done_at[i] - jobs[i][0] for i in range(1, len(jobs))])
+    return {
+        'policy': policy,
+        'small_p50_s': float(np.percentile(small_latencies, 50)),
+        'small_p95_s': float(np.percentile(small_latencies, 95)),
+        'small_max_s': float(small_latencies.max()),
+        'bulk_done_s': done_at[0],
+        'bulk_rows_per_s': args.bulk_rows / done_at[0],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate small uploads competing with a backfill, with and without lanes.")
+    parser.add_argument('--bulk-rows', type=int, default=20_000)
+    parser.add_argument('--small-jobs', type=int, default=20)
+    parser.add_argument('--small-rows', type=int, default=50)
+    parser.add_argument('--small-start', type=float, default=60.0, help="Upload time of the first small job (s)")
+    parser.add_argument('--small-interval', type=float, default=60.0, help="Seconds between small job uploads")
+    # Defaults of cdk_stack.py
+    parser.add_argument('--priority-concurrency', type=int, default=10, help="Concurrency of the priority lane per stage")
+    parser.add_argument('--bulk-concurrency', type=int, default=20, help="Concurrency of the bulk lane per stage")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = [simulate(policy, args) for policy in POLICIES]
+    print(f"{'policy':<15}{'small p50 s':>12}{'small p95 s':>12}{'small max s':>12}{'bulk done s':>12}{'bulk rows/s':>12}")
+    for result in results:
+        print(
+            f"{result['policy']:<15}{result['small_p50_s']:>12.1f}{result['small_p95_s']:>12.1f}{result['small_max_s']:>12.1f}"
+            f"{result['bulk_done_s']:>12.1f}{result['bulk_rows_per_s']:>12.1f}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark query latency of the local vector index at up to 1M companies.
+
+The index is filled with random 256 dimension vectors and employee_size / location metadata (locations follow
+a skewed distribution, like real company data), memory-mapped from a temporary directory. Each query type is
+timed with the inverted metadata indexes and, with --compare-scan, against a filter that scans the metadata.
+
+Usage:
+    python -m tests.benchmarks.bench_local_index --companies 1000000 --queries 50
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+
+from src.tools.local_index import LocalVectorIndex
+
+EMPLOYEE_SIZES = ['1-10', '11-50', '51-200', '201-500', '500+']
+LOCATIONS = [f'Country {i}' for i in range(50)]
+
+# Query types with their metadata filter
+QUERIES = {
+    'unfiltered': None,
+    'employee_size': {'employee_size': '11-50'},
+    'common_location': {'location': 'Country 0'},
+    'rare_location': {'location': 'Country 49'},
+    'location_in': {'location': {'$in': ['Country 1', 'Country 2', 'Country 3']}},
+    'size_and_location': {'$and': [{'employee_size': {'$in': ['51-200', '201-500']}}, {'location': 'Country 0'}]},
+}
+
+def build_index(path, n_companies, dimension, batch_size, dtype='float32', seed=0):
+    """Fill a memory-mapped index with random companies and return it with the build time in seconds."""
+    rng = np.random.default_rng(seed)
+    location_weights = 1 / np.arange(1, len(LOCATIONS) + 1)
+    location_weights /= location_weights.sum()
+
+    index = LocalVectorIndex(dimension, path=path, capacity=n_companies, dtype=dtype)
+    start = time.perf_counter()
+    for batch_start in range(0, n_companies, batch_size):
+        n = min(batch_size, n_companies - batch_start)
+        values = rng.standard_normal((n, dimension), dtype=np.float32)
+        sizes = rng.choice(len(EMPLOYEE_SIZES), size=n)
+        locations = rng.choice(len(LOCATIONS), size=n, p=location_weights)
+        index.upsert(vectors=[
+            (f'company-{batch_start + i}', values[i], {'employee_size': EMPLOYEE_SIZES[sizes[i]], 'location': LOCATIONS[locations[i]]})
+            for i in range(n)
+        ])
+    return index, time.perf_counter() - start
+
+def scan_filter(index, metadata_filter):
+    """Resolve a filter by scanning every metadata row, the cost the inverted indexes avoid."""
+    def matches(metadata, condition):
+        if '$and' in condition:
+            return all(matches(metadata, sub_filter) for sub_filter in condition['$and'])
+        for field, value in condition.items():
+            if isinstance(value, dict):
+                if metadata.get(field) not in value['$in']:
+                    return False
+            elif metadata.get(field) != value:
+                return False
+        return True
+
+    return np.asarray([row for row, metadata in enumerate(index.metadata) if metadata and matches(metadata, metadata_filter)])
+
+def time_queries(index, metadata_filter, queries, top_k, scan):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        if scan:
+            candidates = scan_filter(index, metadata_filter)
+            scores = index._score(query, candidates)
+            np.argpartition(-scores, min(top_k, len(scores) - 1))
+        else:
+            index.query(vector=query, top_k=top_k, filter=metadata_filter)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query latency of the local vector index.")
+    parser.add_argument('--companies', type=int, default=1_000_000)
+    parser.add_argument('--dimension', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=50, help="Queries timed per query type")
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=10_000, help="Vectors per upsert while building the index")
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float16', 'int8'], help="Storage dtype of the matrix")
+    parser.add_argument('--compare-scan', action='store_true', help="Also time filters resolved by scanning the metadata")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        index, build_seconds = build_index(path, args.companies, args.dimension, args.batch_size, args.dtype)
+        matrix_mb = os.path.getsize(index.matrix.filename) / 2**20
+        print(f"Built {len(index)} vectors in {build_seconds:.1f}s ({len(index) / build_seconds:.0f} upserts/s), matrix {matrix_mb:.0f} MB")
+
+        queries = np.random.default_rng(1).standard_normal((args.queries, args.dimension), dtype=np.float32)
+        # Warm the page cache and the posting arrays so every query type is measured in steady state
+        for metadata_filter in QUERIES.values():
+            index.query(vector=queries[0], top_k=args.top_k, filter=metadata_filter)
+
+        results = {'companies': len(index), 'build_seconds': build_seconds, 'queries': []}
+        print(f"{'query':<20}{'candidates':>12}{'p50 ms':>10}{'p95 ms':>10}" + (f"{'scan p50':>10}" if args.compare_scan else ""))
+        for name, metadata_filter in QUERIES.items():
+            candidates = len(index._filter_rows(metadata_filter)) if metadata_filter else len(index)
+            latencies = time_queries(index, metadata_filter, queries, args.top_k, scan=False)
+            result = {
+                'query': name,
+                'candidates': candidates,
+                'p50_ms': float(np.percentile(latencies, 50) * 1000),
+                'p95_ms': float(np.percentile(latencies, 95) * 1000),
+            }
+            line = f"{name:<20}{candidates:>12}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            if args.compare_scan and metadata_filter:
+                # Scanning is slow, a few queries are enough
+                scan_latencies = time_queries(index, metadata_filter, queries[:3], args.top_k, scan=True)
+                result['scan_p50_ms'] = float(np.percentile(scan_latencies, 50) * 1000)
+                line += f"{result['scan_p50_ms']:>10.1f}"
+            results['queries'].append(result)
+            print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
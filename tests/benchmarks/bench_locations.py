@@ -0,0 +1,116 @@
+"""Benchmark location normalization at parse time: throughput and hit rates.
+
+Free-text locations repeat heavily (a few spellings of a few hundred places make up most rows), so
+the memoized lookup answers most rows from its cache and only resolves each distinct spelling once
+against the gazetteer. Reports rows per minute of the uncached resolution, of the memoized lookup
+and of the whole format_company row formatting, with the cache hit rate and the share of locations
+found in the gazetteer.
+
+The locations are either the location column of a real CSV or synthetic spellings drawn from the
+gazetteer with a Zipf distribution, mixed with unresolvable values.
+
+Usage:
+    python -m tests.benchmarks.bench_locations --rows 1000000
+    python -m tests.benchmarks.bench_locations --csv companies.csv
+"""
+import argparse
+import csv
+import json
+import time
+import numpy as np
+
+from src.lambda_functions.common import locations
+from src.lambda_functions.parse_csv_to_sqs.parse_csv_to_sqs import format_company
+
+def spellings(seed=0):
+    """Spellings of the gazetteer places the way people type them."""
+    rng = np.random.default_rng(seed)
+    gazetteer = locations.load_gazetteer()
+    # Short codes of the regions that appear after a city name ("Austin, TX")
+    region_codes = {}
+    for alias, entries in gazetteer.items():
+        for kind, _, region, _ in entries:
+            if kind == 'region' and len(alias) <= 3:
+                region_codes.setdefault(region, alias.upper())
+
+    cities = sorted({entry for entries in gazetteer.values() for entry in entries if entry[0] == 'city'})
+    countries = sorted({entry[3] for entries in gazetteer.values() for entry in entries if entry[0] == 'country'})
+    variants = []
+    for _, city, region, country in cities:
+        variants += [city, city.lower(), f"{city}, {country}", f"Greater {city} Area"]
+        if region in region_codes:
+            variants.append(f"{city}, {region_codes[region]}")
+    variants += countries + [country.upper() for country in countries]
+    rng.shuffle(variants)
+    return variants
+
+def make_locations(n_rows, unresolved_fraction=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    variants = spellings(seed)
+    # Zipf ranks: the first spellings dominate, like real CSV exports
+    ranks = np.minimum(rng.zipf(1.3, size=n_rows), len(variants)) - 1
+    values = [variants[rank] for rank in ranks]
+    # Values no gazetteer resolves, each one distinct
+    for i in np.flatnonzero(rng.random(n_rows) < unresolved_fraction):
+        values[i] = f"Office {i}"
+    return values
+
+def read_locations(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return [row['location'] for row in csv.DictReader(f)]
+
+def rows_per_minute(n_rows, seconds):
+    return n_rows / seconds * 60
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark location normalization throughput and hit rates.")
+    parser.add_argument('--csv', help="CSV with a location column to normalize instead of synthetic locations")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Synthetic rows when no CSV is given")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    values = read_locations(args.csv) if args.csv else make_locations(args.rows)
+    distinct = list(dict.fromkeys(values))
+    locations.load_gazetteer()
+
+    # Uncached: every distinct spelling resolved against the gazetteer
+    start = time.perf_counter()
+    for value in distinct:
+        locations.resolve_location.__wrapped__(value)
+    uncached_seconds = time.perf_counter() - start
+
+    # Memoized lookup over every row
+    locations.reset_stats()
+    start = time.perf_counter()
+    for value in values:
+        locations.normalize_location(value)
+    cached_seconds = time.perf_counter() - start
+    stats = locations.location_stats()
+
+    # Whole row formatting as parse_csv_to_sqs does it, with a warm cache
+    rows = [{'company_name': 'Company', 'company_website': 'company.com', 'employee_size': '42', 'location': value} for value in values]
+    start = time.perf_counter()
+    for row in rows:
+        format_company(row)
+    format_seconds = time.perf_counter() - start
+
+    result = {
+        'rows': len(values),
+        'distinct_locations': len(distinct),
+        'uncached_rows_per_minute': rows_per_minute(len(distinct), uncached_seconds),
+        'cached_rows_per_minute': rows_per_minute(len(values), cached_seconds),
+        'format_company_rows_per_minute': rows_per_minute(len(values), format_seconds),
+        **stats
+    }
+    print(f"{result['rows']} rows, {result['distinct_locations']} distinct locations")
+    print(f"uncached resolution:  {result['uncached_rows_per_minute']:>14,.0f} rows/min")
+    print(f"memoized lookup:      {result['cached_rows_per_minute']:>14,.0f} rows/min")
+    print(f"format_company:       {result['format_company_rows_per_minute']:>14,.0f} rows/min")
+    print(f"cache hit rate {stats['cache_hit_rate']:.1%}, resolved {stats['resolved_rate']:.1%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Benchmark end-to-end latency and cost per 1k companies for the staged and fused pipeline modes.
+
+The stage handlers run for real against offline fake providers with configurable latency.
+SQS hops between stages are modeled with a fixed polling latency instead of being slept.
+
+Usage:
+    python -m tests.benchmarks.bench_pipeline_modes --companies 200
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import time
+from unittest.mock import patch
+import numpy as np
+
+# The stage modules create boto3 clients at import time, which needs a region even when every call is faked
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.get_texts import get_texts
+from src.lambda_functions.get_embeddings import get_embeddings
+from src.lambda_functions.push_to_pinecone import push_to_pinecone
+from src.lambda_functions.push_to_dynamo import push_to_dynamo
+from src.lambda_functions.fused_pipeline import fused_pipeline
+from src.tools.fake_providers import (
+    FakeScraper, FakeOpenAIClient, FakeEncoding, FakePineconeIndex, FakeDynamoTable, FakeSQS
+)
+
+# AWS list prices (us-west-2, x86)
+LAMBDA_GB_SECOND_PRICE = 0.0000166667
+LAMBDA_REQUEST_PRICE = 0.20 / 1_000_000
+SQS_REQUEST_PRICE = 0.40 / 1_000_000
+LAMBDA_MEMORY_MB = 1024
+
+QUEUE_URLS = {
+    'EMBEDDING_QUEUE_URL': 'embedding-queue',
+    'PINECONE_QUEUE_URL': 'pinecone-queue',
+    'DYNAMO_SQS_QUEUE_URL': 'dynamo-queue',
+}
+
+def make_companies(n_companies):
+    return [
+        {
+            'company_name': f'Company {i}',
+            'company_website': f'https://www.company{i}.com',
+            'employee_size': '11-50',
+            'location': 'USA'
+        }
+        for i in range(n_companies)
+    ]
+
+def make_event(records):
+    return {'Records': [{'messageId': record['messageId'], 'body': record['body']} for record in records]}
+
+@contextlib.contextmanager
+def fake_providers(args):
+    """Patch every stage module to use the offline fake providers."""
+    providers = {
+        'scraper': FakeScraper(latency=args.scrape_latency),
+        'openai': FakeOpenAIClient(latency=args.embed_latency, per_input_latency=args.embed_per_input_latency),
+        'index': FakePineconeIndex(latency=args.upsert_latency),
+        'table': FakeDynamoTable(latency=args.dynamo_latency),
+        'sqs': FakeSQS(latency=args.sqs_latency),
+    }
+    pinecone_client = type('FakePinecone', (), {'Index': lambda self, name: providers['index']})()
+    dynamodb = type('FakeDynamoDB', (), {'Table': lambda self, name: providers['table']})()
+
+    with patch.dict(os.environ, dict(QUEUE_URLS, SCRAPINGBEE_API_KEY='fake', PINECONE_INDEX_NAME='fake', DYNAMODB_TABLE_NAME='fake')), \
+        patch.object(get_texts.requests, 'get', providers['scraper']), \
+        patch.object(get_texts, 'sqs', providers['sqs']), \
+        patch.object(get_embeddings, 'sqs', providers['sqs']), \
+        patch.object(push_to_pinecone, 'sqs', providers['sqs']), \
+        patch.object(get_embeddings, 'get_openai_client', lambda: providers['openai']), \
+        patch.object(get_embeddings, 'get_encoding', FakeEncoding), \
+        patch.object(push_to_pinecone, 'get_pinecone_client', lambda: pinecone_client), \
+        patch.object(push_to_dynamo, 'dynamodb', dynamodb), \
+        patch.object(fused_pipeline, 'dynamodb', dynamodb), \
+        contextlib.redirect_stdout(io.StringIO()):
+        yield providers
+
+def invoke(handler, records):
+    """Invoke a handler and return its duration in seconds."""
+    start = time.perf_counter()
+    handler(make_event(records), None)
+    return time.perf_counter() - start
+
+def run_staged(companies, args):
+    """Run every company through the four staged Lambdas with batch_size=1."""
+    latencies = []
+    durations = []
+    with fake_providers(args) as providers:
+        sqs = providers['sqs']
+        # Each stage handler with the queue its output is sent to
+        stages = [
+            (get_texts.lambda_handler, QUEUE_URLS['EMBEDDING_QUEUE_URL']),
+            (get_embeddings.lambda_handler, QUEUE_URLS['PINECONE_QUEUE_URL']),
+            (push_to_pinecone.lambda_handler, QUEUE_URLS['DYNAMO_SQS_QUEUE_URL']),
+            (push_to_dynamo.lambda_handler, None),
+        ]
+        for i, company in enumerate(companies):
+            records = [{'messageId': f'company-{i}', 'body': json.dumps(company)}]
+            latency = 0.0
+            for handler, output_queue in stages:
+                if not records:
+                    break
+                duration = invoke(handler, records)
+                durations.append(duration)
+                latency += duration
+                if output_queue:
+                    records = sqs.drain(output_queue)
+                    latency += args.hop_latency if records else 0.0
+            latencies.append(latency)
+
+        # Every downstream message is sent, received and deleted, the company data queue is only received and deleted
+        sqs_requests = 2 * len(companies) + 3 * sqs.calls
+
+    return latencies, durations, sqs_requests
+
+def run_fused(companies, args):
+    """Run the companies through the fused Lambda in batches."""
+    latencies = []
+    durations = []
+    with fake_providers(args):
+        for start in range(0, len(companies), args.batch_size):
+            batch = companies[start:start + args.batch_size]
+            records = [{'messageId': f'company-{start + i}', 'body': json.dumps(company)} for i, company in enumerate(batch)]
+            duration = invoke(fused_pipeline.lambda_handler, records)
+            durations.append(duration)
+            latencies.extend([duration] * len(batch))
+
+    sqs_requests = 2 * len(durations)
+    return latencies, durations, sqs_requests
+
+def summarize(mode, n_companies, latencies, durations, sqs_requests):
+    """Compute latency percentiles and extrapolate the cost to 1k companies."""
+    billed_seconds = sum(math.ceil(duration * 1000) for duration in durations) / 1000
+    lambda_cost = billed_seconds * LAMBDA_MEMORY_MB / 1024 * LAMBDA_GB_SECOND_PRICE + len(durations) * LAMBDA_REQUEST_PRICE
+    sqs_cost = sqs_requests * SQS_REQUEST_PRICE
+    scale = 1000 / n_companies
+
+    return {
+        'mode': mode,
+        'invocations_per_1k': len(durations) * scale,
+        'latency_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'billed_seconds_per_1k': billed_seconds * scale,
+        'lambda_cost_per_1k': lambda_cost * scale,
+        'sqs_cost_per_1k': sqs_cost * scale,
+        'total_cost_per_1k': (lambda_cost + sqs_cost) * scale,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the staged and fused pipeline modes.")
+    parser.add_argument('--companies', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=10, help="Fused Lambda SQS batch size")
+    parser.add_argument('--scrape-latency', type=float, default=0.05)
+    parser.add_argument('--embed-latency', type=float, default=0.03)
+    parser.add_argument('--embed-per-input-latency', type=float, default=0.0005)
+    parser.add_argument('--upsert-latency', type=float, default=0.02)
+    parser.add_argument('--dynamo-latency', type=float, default=0.01)
+    parser.add_argument('--sqs-latency', type=float, default=0.005)
+    parser.add_argument('--hop-latency', type=float, default=0.05, help="Modeled SQS to Lambda polling latency per hop")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    companies = make_companies(args.companies)
+    results = [
+        summarize('staged', len(companies), *run_staged(companies, args)),
+        summarize('fused', len(companies), *run_fused(companies, args)),
+    ]
+
+    print(f"{'mode':<8}{'invocations/1k':>16}{'p50 ms':>10}{'p95 ms':>10}{'GB-s/1k':>10}{'$/1k':>12}")
+    for result in results:
+        print(
+            f"{result['mode']:<8}{result['invocations_per_1k']:>16.0f}{result['latency_p50_ms']:>10.1f}"
+            f"{result['latency_p95_ms']:>10.1f}{result['billed_seconds_per_1k']:>10.1f}{result['total_cost_per_1k']:>12.5f}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
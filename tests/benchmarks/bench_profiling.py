@@ -0,0 +1,74 @@
+"""Benchmark the overhead of the handlers' profiling hooks (lambda_functions/common/profiling.py).
+
+Measures the time per invocation of a handler extracting the text of scraped pages:
+- undecorated
+- decorated with profiling off (PROFILE_SAMPLE_RATE=0, the deployed default)
+- decorated and profiled on every invocation, with the sampling profiler and with cProfile
+
+The profiled runs include tracemalloc and writing the profile files to a temporary directory.
+
+Usage:
+    python -m tests.benchmarks.bench_profiling --invocations 200
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.common import profiling
+from src.lambda_functions.get_texts.get_texts import extract_text
+from tests.benchmarks import synthetic
+
+def time_per_call(function, invocations):
+    start = time.perf_counter()
+    for _ in range(invocations):
+        function({'Records': []}, None)
+    return (time.perf_counter() - start) / invocations
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of the profiling hooks.")
+    parser.add_argument('--invocations', type=int, default=200)
+    parser.add_argument('--pages', type=int, default=5, help="Pages extracted per invocation")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    pages = synthetic.html_pages(args.pages)
+
+    def handler(event, context):
+        return [extract_text(page) for page in pages]
+
+    def noop(event, context):
+        return None
+
+    decorated = profiling.profiled('bench')(handler)
+    decorated_noop = profiling.profiled('bench')(noop)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, patch.dict(os.environ, {'PROFILE_DIR': directory}):
+        os.environ.pop('PROFILE_BUCKET', None)
+        with patch.dict(os.environ, {'PROFILE_SAMPLE_RATE': '0'}):
+            results['noop_undecorated_us'] = time_per_call(noop, args.invocations * 100) * 1e6
+            results['noop_off_us'] = time_per_call(decorated_noop, args.invocations * 100) * 1e6
+            results['handler_undecorated_ms'] = time_per_call(handler, args.invocations) * 1000
+            results['handler_off_ms'] = time_per_call(decorated, args.invocations) * 1000
+        for mode in profiling.PROFILE_MODES:
+            with patch.dict(os.environ, {'PROFILE_SAMPLE_RATE': '1', 'PROFILE_MODE': mode}), \
+                    patch('builtins.print'):
+                results[f'handler_{mode}_ms'] = time_per_call(decorated, max(args.invocations // 10, 1)) * 1000
+
+    print(f"wrapper overhead when off: {results['noop_off_us'] - results['noop_undecorated_us']:.2f} us per invocation")
+    print(f"handler undecorated:       {results['handler_undecorated_ms']:.2f} ms")
+    print(f"handler, profiling off:    {results['handler_off_ms']:.2f} ms")
+    for mode in profiling.PROFILE_MODES:
+        overhead = results[f'handler_{mode}_ms'] / results['handler_undecorated_ms'] - 1
+        print(f"handler, {mode:<10}        {results[f'handler_{mode}_ms']:.2f} ms ({overhead:+.0%})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Evaluate embedding quantization: size savings against search quality.
+
+For each quantization mode, reports:
+- queue transport: JSON message size of one embedding and the per-vector encode/decode time
+- storage: bytes per vector in the local index, vectorized batch quantize/dequantize throughput
+- quality: recall@k of the top-k neighbors found in the quantized index against exact float32 search
+- speed: brute-force query latency over the quantized index
+
+The sample set is either real embeddings (a .npy matrix, one vector per row) or synthetic clustered
+vectors, L2-normalized like get_embeddings does.
+
+Usage:
+    python -m tests.benchmarks.bench_quantization --vectors 100000 --queries 200
+    python -m tests.benchmarks.bench_quantization --sample embeddings.npy
+"""
+import argparse
+import json
+import time
+import numpy as np
+
+from src.lambda_functions.common import quantization
+from src.tools.local_index import LocalVectorIndex
+
+STORAGE_DTYPES = {'none': 'float32', 'float16': 'float16', 'int8': 'int8'}
+
+def make_sample(n_vectors, dimension, n_clusters=1000, noise=0.5, seed=0):
+    """Clustered vectors, so nearest neighbors are meaningful like companies of the same industry."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dimension), dtype=np.float32)
+    labels = rng.integers(n_clusters, size=n_vectors)
+    return centers[labels] + noise * rng.standard_normal((n_vectors, dimension), dtype=np.float32)
+
+def normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def top_k_ids(index, queries, k):
+    return [[match['id'] for match in index.query(vector=query, top_k=k)['matches']] for query in queries]
+
+def recall_at_k(approximate, exact, k):
+    """Average fraction of the exact top-k neighbors found in the approximate top-k."""
+    return float(np.mean([len(set(a[:k]) & set(e[:k])) / k for a, e in zip(approximate, exact)]))
+
+def build(matrix, dtype):
+    index = LocalVectorIndex(matrix.shape[1], capacity=len(matrix), dtype=dtype)
+    for start in range(0, len(matrix), 10_000):
+        index.upsert(vectors=[(str(start + i), row) for i, row in enumerate(matrix[start:start + 10_000])])
+    return index
+
+def evaluate(matrix, queries, ks, exact, mode):
+    """Measure the size, speed and recall of a quantization mode."""
+    result = {'mode': mode}
+
+    # Queue transport: one JSON encoded embedding
+    embedding = matrix[0].tolist()
+    start = time.perf_counter()
+    for _ in range(100):
+        encoded = quantization.encode_embedding(embedding, mode)
+        quantization.decode_embedding(encoded)
+    result['message_bytes'] = len(json.dumps(encoded))
+    result['encode_decode_us'] = (time.perf_counter() - start) / 100 * 1e6
+
+    # Vectorized batch quantization
+    start = time.perf_counter()
+    codes, scales = quantization.quantize(matrix, mode)
+    quantization.dequantize(codes, scales)
+    result['batch_vectors_per_s'] = len(matrix) / (time.perf_counter() - start)
+
+    # Local store and search quality
+    index = build(matrix, STORAGE_DTYPES[mode])
+    result['store_bytes_per_vector'] = matrix.shape[1] * index.matrix.itemsize + (4 if mode == 'int8' else 0)
+    start = time.perf_counter()
+    approximate = top_k_ids(index, queries, max(ks))
+    result['query_ms'] = (time.perf_counter() - start) / len(queries) * 1000
+    for k in ks:
+        result[f'recall@{k}'] = recall_at_k(approximate, exact, k)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate embedding quantization size savings and recall.")
+    parser.add_argument('--sample', help="Real embeddings to evaluate, a .npy matrix with one vector per row")
+    parser.add_argument('--vectors', type=int, default=50_000, help="Synthetic sample size when no sample is given")
+    parser.add_argument('--dimension', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200, help="Sample vectors held out as queries")
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    matrix = np.load(args.sample) if args.sample else make_sample(args.vectors + args.queries, args.dimension)
+    matrix = normalize(matrix.astype(np.float32))
+    queries, matrix = matrix[:args.queries], matrix[args.queries:]
+
+    # Ground truth: exact float32 search
+    exact = top_k_ids(build(matrix, 'float32'), queries, max(args.k))
+
+    results = [evaluate(matrix, queries, args.k, exact, mode) for mode in quantization.QUANTIZATION_MODES]
+
+    recall_columns = "".join(f"{f'recall@{k}':>11}" for k in args.k)
+    print(f"{'mode':<9}{'msg bytes':>10}{'enc+dec us':>11}{'store B/vec':>12}{'batch vec/s':>13}{'query ms':>10}{recall_columns}")
+    for result in results:
+        recalls = "".join(f"{result[f'recall@{k}']:>11.4f}" for k in args.k)
+        print(
+            f"{result['mode']:<9}{result['message_bytes']:>10}{result['encode_decode_us']:>11.1f}"
+            f"{result['store_bytes_per_vector']:>12}{result['batch_vectors_per_s']:>13.0f}{result['query_ms']:>10.2f}{recalls}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Micro-benchmarks of the CPU work of every stage, for catching performance regressions before a deploy.
+
+Each benchmark runs the stage code on synthetic data (tests/benchmarks/synthetic.py) without any
+network call and reports a throughput (higher is better):
+
+- csv_parse_<rows>: parse_csv_to_sqs row formatting and message encoding of a CSV file, rows/s
+- html_extract: get_texts text extraction of scraped pages, pages/s
+- tokenize: get_embeddings truncation of long texts to the token limit, texts/s
+- json_<message>: encode and decode round trips of the queue messages of each stage, messages/s
+- upsert_packing_<quantization>: fused pipeline decoding and packing of Pinecone upsert requests, vectors/s
+- dynamo_items: push_to_dynamo item building, items/s
+
+Results are written to a JSON file. Passing a previous results file as --baseline compares every
+benchmark and exits with status 1 when one is slower than the baseline by more than --tolerance.
+Compare runs from the same machine only: on shared or burstable machines back-to-back runs of the same
+commit differ by up to 20%, which the default tolerance absorbs.
+
+Usage:
+    python -m tests.benchmarks.bench_stages --output results.json
+    python -m tests.benchmarks.bench_stages --sizes 1000 10000 100000 1000000 --output results.json
+    python -m tests.benchmarks.bench_stages --baseline main.json --output branch.json
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+import numpy as np
+
+# The stage modules create boto3 clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.common import quantization
+from src.lambda_functions.common import locations
+from src.lambda_functions.common import lanes
+from src.lambda_functions.parse_csv_to_sqs import parse_csv_to_sqs
+from src.lambda_functions.get_texts import get_texts
+from src.lambda_functions.get_embeddings import get_embeddings
+from src.lambda_functions.push_to_pinecone import push_to_pinecone
+from src.lambda_functions.push_to_dynamo import push_to_dynamo
+from src.lambda_functions.fused_pipeline import fused_pipeline
+from tests.benchmarks import synthetic
+
+class PackingIndex:
+    """Index stand-in that accepts upserts without storing them, so only the request packing is measured."""
+
+    def upsert(self, vectors, **kwargs):
+        return {'upserted_count': len(vectors)}
+
+def measure(function, n_items, repeats, min_seconds=0.5):
+    """Best throughput of function, which processes n_items per call, over repeats timed runs."""
+    best = float('inf')
+    # The stages log every record, which would dominate the timings on a terminal
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeats):
+            calls = 0
+            start = time.perf_counter()
+            # Short benchmarks are repeated until they run long enough to be timed reliably
+            while True:
+                function()
+                calls += 1
+                elapsed = time.perf_counter() - start
+                if elapsed >= min_seconds or calls * n_items >= 10_000_000:
+                    break
+            best = min(best, elapsed / calls)
+    return n_items / best
+
+def bench_csv_parse(path, n_rows, repeats):
+    with open(path, 'rb') as f:
+        body = f.read()
+
+    def parse():
+        # The handler's work per file, without the SQS calls
+        locations.reset_stats()
+        content = body.decode('utf-8').splitlines()
+        lane = lanes.classify_upload(path, len(content) - 1)
+        for row in csv.DictReader(content):
+            message = parse_csv_to_sqs.format_company(row)
+            message['lane'] = lane
+            json.dumps(message)
+
+    return measure(parse, n_rows, repeats)
+
+def bench_html_extract(pages, repeats):
+    return measure(lambda: [get_texts.extract_text(page) for page in pages], len(pages), repeats)
+
+def bench_tokenize(texts, repeats):
+    encoding = get_embeddings.get_encoding()
+    return measure(lambda: [get_embeddings.truncate_text(text, encoding) for text in texts], len(texts), repeats)
+
+def stage_messages(text, embedding):
+    company = {
+        'company_name': 'Company 1',
+        'company_website': 'https://www.company1.com',
+        'employee_size': '11-50',
+        'location': 'San Francisco, CA',
+        'city': 'San Francisco',
+        'region': 'California',
+        'country': 'United States',
+        'job_id': 'b7d9c1f0-0000-4000-8000-000000000000',
+        'lane': 'bulk'
+    }
+    messages = {
+        'json_company': company,
+        'json_scraped': dict(company, scraped_text=text),
+    }
+    for mode in quantization.QUANTIZATION_MODES:
+        with patch.dict(os.environ, {'EMBEDDING_QUANTIZATION': mode}):
+            messages[f'json_embedding_{mode}'] = get_embeddings.build_pinecone_message(company, embedding)
+    return messages
+
+def bench_json(message, repeats, n_messages=1000):
+    return measure(lambda: [json.loads(json.dumps(message)) for _ in range(n_messages)], n_messages, repeats)
+
+def bench_upsert_packing(messages, repeats):
+    embedded = [(f'message-{i}', message) for i, message in enumerate(messages)]
+    index = PackingIndex()
+    return measure(lambda: fused_pipeline.upsert_batch(embedded, index, []), len(embedded), repeats)
+
+def bench_dynamo_items(messages, repeats):
+    return measure(lambda: [push_to_dynamo.build_item(message) for message in messages], len(messages), repeats)
+
+def run(args):
+    results = {}
+
+    def record(name, value, unit):
+        results[name] = {'value': value, 'unit': unit}
+        print(f"{name:<32}{value:>16,.1f} {unit}")
+
+    for n_rows in args.sizes:
+        path = synthetic.cached_csv(args.data_dir, n_rows)
+        record(f'csv_parse_{n_rows}', bench_csv_parse(path, n_rows, 1 if n_rows >= 100_000 else args.repeats), 'rows/s')
+
+    pages = synthetic.html_pages(args.pages)
+    record('html_extract', bench_html_extract(pages, args.repeats), 'pages/s')
+
+    # Texts longer than the token limit, so every call truncates
+    long_texts = [" ".join([get_texts.extract_text(page)] * 12) for page in pages[:20]]
+    record('tokenize', bench_tokenize(long_texts, args.repeats), 'texts/s')
+
+    rng = np.random.default_rng(0)
+    embedding = rng.standard_normal(1536).tolist()
+    for name, message in stage_messages(get_texts.extract_text(pages[0]), embedding).items():
+        record(name, bench_json(message, args.repeats), 'messages/s')
+
+    messages = stage_messages('', embedding)
+    for mode in ('none', 'int8'):
+        message = messages[f'json_embedding_{mode}']
+        record(f'upsert_packing_{mode}', bench_upsert_packing([message] * fused_pipeline.PINECONE_UPSERT_BATCH_SIZE, args.repeats), 'vectors/s')
+
+    metadata_messages = [
+        push_to_pinecone.build_metadata_message(
+            push_to_pinecone.generate_unique_id(f'https://www.company{i}.com'), f'Company {i}',
+            f'https://www.company{i}.com', '11-50', 'USA', 'job', {'country': 'United States'}
+        )
+        for i in range(1000)
+    ]
+    record('dynamo_items', bench_dynamo_items(metadata_messages, args.repeats), 'items/s')
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance):
+    """Print the change of every benchmark against the baseline and return the names of the regressions."""
+    regressions = []
+    print(f"\n{'benchmark':<32}{'baseline':>16}{'current':>16}{'change':>9}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['value'], result['value']
+        change = new / old - 1
+        regressed = change < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<32}{old:>16,.1f}{new:>16,.1f}{change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the CPU work of every pipeline stage.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(synthetic.CSV_SIZES[:3]), help="CSV sizes (rows) to parse")
+    parser.add_argument('--pages', type=int, default=200, help="Scraped pages for the HTML extraction benchmark")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed runs per benchmark, the best is kept")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'pipeline-benchmarks'), help="Cache of the synthetic CSV files")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Results JSON of a previous run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Slowdown tolerated before reporting a regression")
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Evaluate the scrape quality gate: classification accuracy on labeled pages and scoring throughput.
+
+Reports:
+- accuracy, precision and recall of the low-value pages skipped at the threshold, over the labeled
+  fixture set (scrape_quality_fixtures.jsonl: company pages, parked domains, cookie banners, error pages,
+  login walls, bot challenges, code and repetitive pages), with the misclassified pages
+- the pages skipped per kind, and the same metrics over a sweep of thresholds
+- throughput of score_text, as get_texts scores every page, on synthetic scraped pages and on the
+  fixtures, in pages and MB per second
+- the embedding tokens and Pinecone writes saved per 1,000 companies, assuming the share of low-value
+  pages of the fixture set (or --low-value-share)
+
+The deployed threshold defaults to 0 (gate off) until it is calibrated, so the benchmark evaluates a candidate
+threshold. Add labeled pages scraped in production (--fixtures) before deploying it.
+
+Usage:
+    python -m tests.benchmarks.bench_text_quality
+    python -m tests.benchmarks.bench_text_quality --fixtures labeled.jsonl --threshold 0.4 --output quality.json
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+# The stage modules create boto3 clients at import time, which needs a region even when every call is faked
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from src.lambda_functions.common import text_quality
+from src.lambda_functions.get_texts.get_texts import extract_text
+from tests.benchmarks.synthetic import html_pages
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'scrape_quality_fixtures.jsonl')
+
+# Candidate threshold evaluated by default
+EVALUATED_THRESHOLD = 0.5
+
+SWEEP = (0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8)
+
+def load_fixtures(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def classify(fixtures, scores, threshold):
+    """Accuracy, precision and recall of skipping the low-value pages (the positive class) at the threshold."""
+    skipped = [score < threshold for score in scores]
+    low_value = [fixture['label'] == 'low_value' for fixture in fixtures]
+    true_positives = sum(s and l for s, l in zip(skipped, low_value))
+    return {
+        'threshold': threshold,
+        'accuracy': sum(s == l for s, l in zip(skipped, low_value)) / len(fixtures),
+        'precision': true_positives / sum(skipped) if any(skipped) else 1.0,
+        'recall': true_positives / sum(low_value) if any(low_value) else 1.0,
+        'content_skipped': sum(s and not l for s, l in zip(skipped, low_value)),
+    }
+
+def throughput(texts, repeats):
+    """Pages and MB per second of the scorer, best of the repeats."""
+    size = sum(len(text.encode('utf-8')) for text in texts)
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            text_quality.score_text(text)
+        best = min(best, time.perf_counter() - start)
+    return {
+        'pages': len(texts),
+        'mb': size / 1e6,
+        'pages_per_s': len(texts) / best,
+        'mb_per_s': size / 1e6 / best,
+        'us_per_page': best / len(texts) * 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the accuracy and throughput of the scrape quality scorer.")
+    parser.add_argument('--fixtures', default=FIXTURES, help="Labeled pages, JSON lines with label, kind and text")
+    parser.add_argument('--threshold', type=float, default=EVALUATED_THRESHOLD, help="Candidate threshold evaluated")
+    parser.add_argument('--pages', type=int, default=1000, help="Synthetic pages scored for the throughput")
+    parser.add_argument('--paragraphs', type=int, default=20, help="Paragraphs per synthetic page")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--low-value-share', type=float, help="Share of low-value pages for the savings (default: the fixtures')")
+    parser.add_argument('--models', type=int, default=1, help="Embedding models written per company")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    texts = [fixture['text'] for fixture in fixtures]
+    scores = [text_quality.score_text(text) for text in texts]
+
+    # Classification at the threshold, per kind and over the sweep
+    result = classify(fixtures, scores, args.threshold)
+    kinds = Counter(fixture['kind'] for fixture in fixtures)
+    skipped_kinds = Counter(fixture['kind'] for fixture, score in zip(fixtures, scores) if score < args.threshold)
+    misclassified = [
+        {'kind': fixture['kind'], 'score': score, 'text': fixture['text'][:80]}
+        for fixture, score in zip(fixtures, scores)
+        if (score < args.threshold) != (fixture['label'] == 'low_value')
+    ]
+    sweep = [classify(fixtures, scores, threshold) for threshold in sorted(set(SWEEP) | {args.threshold})]
+
+    print(f"{len(fixtures)} labeled pages, threshold {args.threshold}: accuracy {result['accuracy']:.3f}, "
+          f"precision {result['precision']:.3f}, recall {result['recall']:.3f}")
+    print(f"{'kind':<15}{'pages':>7}{'skipped':>9}{'min':>7}{'max':>7}")
+    for kind in sorted(kinds):
+        kind_scores = [score for fixture, score in zip(fixtures, scores) if fixture['kind'] == kind]
+        print(f"{kind:<15}{kinds[kind]:>7}{skipped_kinds[kind]:>9}{min(kind_scores):>7.2f}{max(kind_scores):>7.2f}")
+    for page in misclassified:
+        print(f"  misclassified {page['kind']} ({page['score']:.2f}): {page['text']}")
+    print(f"\n{'threshold':>9}{'accuracy':>10}{'precision':>11}{'recall':>8}{'content skipped':>17}")
+    for row in sweep:
+        print(f"{row['threshold']:>9.2f}{row['accuracy']:>10.3f}{row['precision']:>11.3f}{row['recall']:>8.3f}{row['content_skipped']:>17}")
+
+    # Throughput on pages the size of real scrapes, and on the short fixture pages
+    synthetic = [extract_text(page) for page in html_pages(args.pages, args.paragraphs)]
+    speeds = {'synthetic': throughput(synthetic, args.repeats), 'fixtures': throughput(texts * 20, args.repeats)}
+    print(f"\n{'pages':<10}{'count':>7}{'MB':>7}{'pages/s':>10}{'MB/s':>7}{'us/page':>9}")
+    for name, speed in speeds.items():
+        print(
+            f"{name:<10}{speed['pages']:>7}{speed['mb']:>7.1f}"
+            f"{speed['pages_per_s']:>10.0f}{speed['mb_per_s']:>7.1f}{speed['us_per_page']:>9.1f}"
+        )
+
+    # Savings per 1,000 companies: the low-value pages caught by the gate are not embedded nor written
+    low_value = [text for fixture, text in zip(fixtures, texts) if fixture['label'] == 'low_value']
+    share = args.low_value_share if args.low_value_share is not None else len(low_value) / len(fixtures)
+    tokens_per_page = sum(text_quality.estimated_tokens(text) for text in low_value) / max(len(low_value), 1)
+    skipped_per_1000 = 1000 * share * result['recall']
+    savings = {
+        'low_value_share': share,
+        'skipped_per_1000': skipped_per_1000,
+        'tokens_saved_per_1000': skipped_per_1000 * tokens_per_page * args.models,
+        'writes_saved_per_1000': skipped_per_1000 * args.models,
+    }
+    print(f"\nPer 1,000 companies with {share:.0%} low-value pages: {savings['skipped_per_1000']:.0f} skipped, "
+          f"{savings['tokens_saved_per_1000']:.0f} embedding tokens and {savings['writes_saved_per_1000']:.0f} Pinecone writes saved")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'classification': result, 'kinds': {kind: {'pages': kinds[kind], 'skipped': skipped_kinds[kind]} for kind in kinds},
+                'misclassified': misclassified, 'sweep': sweep, 'throughput': speeds, 'savings': savings
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Synthetic inputs for the benchmarks: company CSV files and scraped HTML pages.
+
+The CSV rows are as messy as real exports: websites with and without protocol, www. or path, employee
+sizes as numbers, buckets or empty values, and free-text locations in several spellings. Files are
+deterministic for a given number of rows and seed, so runs on different commits parse the same data.
+
+Usage:
+    python -m tests.benchmarks.synthetic --rows 1000000 --output companies_1m.csv
+"""
+import argparse
+import csv
+import os
+import numpy as np
+
+from src.tools.fake_providers import fake_html
+
+# Standard sizes of the benchmark CSV files
+CSV_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+CSV_COLUMNS = ['company_name', 'company_website', 'employee_size', 'location']
+
+WEBSITE_FORMATS = ['{domain}', 'www.{domain}', 'https://www.{domain}', 'http://{domain}/', 'https://{domain}/about']
+EMPLOYEE_SIZES = ['1-10', '11-50', '51-200', '201-500', '500+', '', '3', '45', '180', '2500', 'unknown']
+LOCATIONS = [
+    'USA', 'United States', 'San Francisco, CA', 'New York, NY', 'NYC', 'Austin TX', 'London, UK',
+    'United Kingdom', 'Bengaluru, Karnataka, India', 'India', 'Berlin, Germany', 'Toronto ON Canada',
+    'Paris, France', 'Greater Boston Area', 'Remote', '', 'Sydney, NSW, Australia', 'Singapore'
+]
+
+def iter_rows(n_rows, seed=0):
+    """Yield n_rows synthetic CSV rows as dicts."""
+    rng = np.random.default_rng(seed)
+    formats = rng.integers(len(WEBSITE_FORMATS), size=n_rows)
+    sizes = rng.integers(len(EMPLOYEE_SIZES), size=n_rows)
+    # A few locations dominate like in real exports
+    location_weights = 1 / np.arange(1, len(LOCATIONS) + 1)
+    locations = rng.choice(len(LOCATIONS), size=n_rows, p=location_weights / location_weights.sum())
+    for i in range(n_rows):
+        yield {
+            'company_name': f'Company {i}',
+            'company_website': WEBSITE_FORMATS[formats[i]].format(domain=f'company{i}.com'),
+            'employee_size': EMPLOYEE_SIZES[sizes[i]],
+            'location': LOCATIONS[locations[i]]
+        }
+
+def write_csv(path, n_rows, seed=0):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(iter_rows(n_rows, seed))
+    return path
+
+def cached_csv(directory, n_rows, seed=0):
+    """Path of the synthetic CSV with n_rows rows in directory, written on first use."""
+    path = os.path.join(directory, f'companies_{n_rows}_{seed}.csv')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_csv(path, n_rows, seed)
+    return path
+
+def html_pages(n_pages, paragraphs=20, seed=0):
+    """Scraped pages like the fake scraper returns, with navigation boilerplate around the paragraphs."""
+    rng = np.random.default_rng(seed)
+    return [fake_html(f'https://www.company{i}.com', rng, paragraphs) for i in range(n_pages)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic company CSV file.")
+    parser.add_argument('--rows', type=int, default=CSV_SIZES[0])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    write_csv(args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+if __name__ == '__main__':
+    main()
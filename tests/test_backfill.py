@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch
+from moto import mock_aws
+import os
+import sqlite3
+import tempfile
+from src.tools import backfill
+from src.tools.fake_providers import FakeOpenAIClient, FakeEncoding, FakePineconeIndex, FakeDynamoTable
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self):
+        # Write a small CSV file and a checkpoint path in a temporary directory
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp_dir.name, 'companies.csv')
+        self.checkpoint_path = os.path.join(self.tmp_dir.name, 'checkpoint.sqlite')
+        with open(self.csv_path, 'w') as f:
+            f.write("company_name,company_website,employee_size,location\n")
+            for i in range(12):
+                f.write(f"test{i},test{i}.com/about,{i * 50},{'' if i % 3 == 0 else 'USA'}\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_backfill(self):
+        providers = {
+            'openai': FakeOpenAIClient(),
+            'encoding': FakeEncoding(),
+            'index': FakePineconeIndex(),
+            'table': FakeDynamoTable(),
+        }
+        with patch('src.tools.backfill.get_providers', return_value=providers):
+            counts = backfill.main([
+                self.csv_path, '--offline', '--processes', '2', '--chunk-size', '5',
+                '--checkpoint', self.checkpoint_path
+            ])
+        return counts, providers
+
+    @mock_aws
+    def test_backfill_stores_every_row(self):
+        counts, providers = self.run_backfill()
+
+        self.assertEqual(counts, {'stored': 12})
+        self.assertEqual(len(providers['index']), 12)
+
+        # Rows are formatted like parse_csv_to_sqs does
+        item = next(item for item in providers['table'].items.values() if item['company_name'] == 'test3')
+        self.assertEqual(item['company_website'], 'https://www.test3.com')
+        self.assertEqual(item['employee_size'], '51-200')
+        self.assertEqual(item['location'], 'NA')
+
+    @mock_aws
+    def test_backfill_resumes_from_checkpoint(self):
+        # Simulate an interrupted run that already stored the first chunk
+        checkpoint = backfill.Checkpoint(self.checkpoint_path)
+        checkpoint.record([(i, f'https://www.test{i}.com', 'stored') for i in range(5)])
+        checkpoint.close()
+
+        counts, providers = self.run_backfill()
+
+        # Only the remaining rows are processed
+        self.assertEqual(counts, {'stored': 12})
+        self.assertEqual(len(providers['index']), 7)
+        self.assertEqual(providers['openai'].calls, 2)
+
+        connection = sqlite3.connect(self.checkpoint_path)
+        self.assertEqual(connection.execute("SELECT COUNT(*) FROM progress").fetchone()[0], 12)
+        connection.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import boto3
+from moto import mock_aws
+from src.lambda_functions.common import company_index
+from src.lambda_functions.push_to_dynamo.push_to_dynamo import build_item
+from src.lambda_functions.push_to_pinecone.push_to_pinecone import generate_unique_id
+from src.tools.reindex_companies import reindex
+
+def create_company_table():
+    """Create the CompanyMetadata table with its secondary indexes."""
+    attributes = {'id'}
+    indexes = []
+    for index_name, (partition_key, sort_key) in company_index.INDEX_KEYS.items():
+        key_schema = [{'AttributeName': partition_key, 'KeyType': 'HASH'}]
+        attributes.add(partition_key)
+        if sort_key:
+            key_schema.append({'AttributeName': sort_key, 'KeyType': 'RANGE'})
+            attributes.add(sort_key)
+        indexes.append({'IndexName': index_name, 'KeySchema': key_schema, 'Projection': {'ProjectionType': 'ALL'}})
+
+    dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+    return dynamodb.create_table(
+        TableName='mock-companies',
+        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in sorted(attributes)],
+        GlobalSecondaryIndexes=indexes,
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+def make_company(i):
+    website = f'https://www.company{i}.com'
+    return {
+        'id': generate_unique_id(website),
+        'company_name': f'Company {i}',
+        'company_website': website,
+        'employee_size': ['1-10', '11-50'][i % 2],
+        'location': ['USA', 'NA', 'France'][i % 3]
+    }
+
+class TestCompanyIndex(unittest.TestCase):
+
+    @mock_aws
+    def test_index_lookups(self):
+        table = create_company_table()
+        with table.batch_writer() as writer:
+            for i in range(60):
+                writer.put_item(Item=build_item(make_company(i)))
+
+        # Assert the domain lookup accepts any form of the website
+        companies = company_index.find_by_domain(table, 'HTTPS://company7.com/about')
+        self.assertEqual([company['company_name'] for company in companies], ['Company 7'])
+
+        # Assert each lookup merges every shard and returns exactly the matching companies
+        lookups = [
+            ({'employee_size': '1-10'}, [i for i in range(60) if i % 2 == 0]),
+            ({'employee_size': '11-50', 'location': 'NA'}, [i for i in range(60) if i % 2 == 1 and i % 3 == 1]),
+            ({'location': 'France'}, [i for i in range(60) if i % 3 == 2]),
+            ({}, list(range(60))),
+        ]
+        for criteria, expected in lookups:
+            with self.subTest(**criteria):
+                companies = company_index.find_companies(table, **criteria)
+                self.assertEqual(sorted(company['company_name'] for company in companies), sorted(f'Company {i}' for i in expected))
+
+        # Assert a size bucket is spread over several partitions
+        shards = {build_item(make_company(i))['size_shard'] for i in range(0, 60, 2)}
+        self.assertGreater(len(shards), company_index.COMPANY_INDEX_SHARDS // 2)
+
+    @mock_aws
+    def test_reindex_existing_items(self):
+        table = create_company_table()
+
+        # Items written before the indexes existed have no index attributes
+        table.put_item(Item=make_company(1))
+        table.put_item(Item=build_item(make_company(2)))
+        self.assertEqual(company_index.find_by_domain(table, 'company1.com'), [])
+
+        self.assertEqual(reindex(table), 1)
+        self.assertEqual(company_index.find_by_domain(table, 'company1.com')[0]['company_name'], 'Company 1')
+
+    @mock_aws
+    def test_location_lookups_use_the_canonical_location(self):
+        table = create_company_table()
+        spellings = ['NYC', 'New York, NY', 'Manhattan, New York', 'New York, NY, USA']
+        with table.batch_writer() as writer:
+            for i, location in enumerate(spellings + ['Austin, TX']):
+                writer.put_item(Item=build_item(dict(make_company(i), location=location)))
+
+        self.assertEqual(build_item(make_company(0))['location_shard'][:-3], 'United States/NA/NA')
+        companies = company_index.find_companies(table, location='New York City')
+        self.assertEqual(sorted(company['location'] for company in companies), sorted(spellings))
+        companies = company_index.find_companies(table, employee_size='1-10', location='nyc')
+        self.assertEqual(sorted(company['location'] for company in companies), ['Manhattan, New York', 'NYC'])
+
+    @mock_aws
+    def test_reindex_free_text_location_keys(self):
+        table = create_company_table()
+
+        # Indexed by the free-text location before the location index used the canonical location
+        item = build_item(dict(make_company(1), location='NYC'))
+        item['location_shard'] = company_index.sharded_key('NYC', company_index.shard_for(item['id']))
+        table.put_item(Item=item)
+        self.assertEqual(company_index.find_companies(table, location='New York, NY'), [])
+
+        self.assertEqual(reindex(table), 1)
+        self.assertEqual(company_index.find_companies(table, location='New York, NY')[0]['company_name'], 'Company 1')
+        self.assertEqual(reindex(table), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+import json
+import os
+from src.lambda_functions.common import embedding_models
+from src.lambda_functions.common import text_cache
+from src.lambda_functions.get_embeddings.get_embeddings import build_pinecone_message
+from src.lambda_functions.get_texts import get_texts
+from src.lambda_functions.push_to_pinecone import push_to_pinecone
+from src.tools.fake_providers import FakePineconeIndex
+
+COMPANY = {
+    'company_name': 'Test Company',
+    'company_website': 'https://test.com',
+    'employee_size': '50',
+    'location': 'USA'
+}
+
+class TestEmbeddingModels(unittest.TestCase):
+
+    def test_write_models(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(embedding_models.write_models(), ['text-embedding-3-small'])
+        with patch.dict(os.environ, {'EMBEDDING_MODELS': ' text-embedding-3-large, text-embedding-3-small,text-embedding-3-large'}):
+            self.assertEqual(embedding_models.write_models(), ['text-embedding-3-large', 'text-embedding-3-small'])
+        with patch.dict(os.environ, {'EMBEDDING_MODELS': 'text-embedding-ada-002'}):
+            with self.assertRaises(ValueError):
+                embedding_models.write_models()
+
+        # The legacy model keeps the default namespace of the vectors written before versioning
+        self.assertEqual(embedding_models.namespace('text-embedding-3-small'), '')
+        self.assertEqual(embedding_models.namespace('text-embedding-3-large'), 'text-embedding-3-large')
+
+    def test_dual_written_message_is_upserted_into_both_namespaces(self):
+        with patch.dict(os.environ, {'EMBEDDING_QUANTIZATION': 'float16'}):
+            message = build_pinecone_message(
+                COMPANY, [0.1] * 1536, 'text-embedding-3-small', {'text-embedding-3-large': [-0.1] * 3072}
+            )
+        self.assertEqual(message['extra_embeddings']['text-embedding-3-large']['dtype'], 'float16')
+
+        index = FakePineconeIndex()
+        event = {'Records': [{'messageId': 'message-0', 'body': json.dumps(message)}]}
+        with patch.dict(os.environ, {'DYNAMO_SQS_QUEUE_URL': 'mock-queue', 'PINECONE_INDEX_NAME': 'mock-index'}), \
+                patch.object(push_to_pinecone, 'get_pinecone_client') as mock_pinecone_client, \
+                patch.object(push_to_pinecone, 'sqs') as mock_sqs:
+            mock_pinecone_client.return_value.Index.return_value = index
+            response = push_to_pinecone.lambda_handler(event, None)
+        self.assertEqual(response['batchItemFailures'], [])
+
+        # Same id in both namespaces, a single metadata message
+        unique_id = push_to_pinecone.generate_unique_id(COMPANY['company_website'])
+        small = index.fetch([unique_id])['vectors'][unique_id]
+        large = index.fetch([unique_id], namespace='text-embedding-3-large')['vectors'][unique_id]
+        self.assertGreater(small['values'][0], 0)
+        self.assertLess(large['values'][0], 0)
+        self.assertEqual(large['metadata']['company_name'], 'Test Company')
+        mock_sqs.send_message.assert_called_once()
+
+    def test_messages_before_versioning_use_the_legacy_model(self):
+        message = dict(COMPANY, embeddings=[0.1] * 256)
+        self.assertEqual(embedding_models.message_embeddings(message), [('text-embedding-3-small', [0.1] * 256)])
+
+    @mock_aws
+    def test_scraped_text_is_cached(self):
+        s3 = boto3.client('s3', region_name='us-west-2')
+        s3.create_bucket(Bucket='mock-texts', CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+        html = f"<html><body><p>{'Leadbird builds lead generation tools. ' * 10}</p></body></html>"
+
+        with patch.dict(os.environ, {'TEXT_CACHE_BUCKET': 'mock-texts'}), patch.object(text_cache, 's3', None), \
+                patch.object(get_texts, 'scrape_website_with_retry', return_value=get_texts.extract_text(html)):
+            message = get_texts.scrape_company(COMPANY)
+            self.assertEqual(text_cache.get_text(COMPANY['company_website']), message['scraped_text'])
+            self.assertIsNone(text_cache.get_text('https://unknown.com'))
+
+        # Without a cache bucket nothing is written
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(text_cache.put_text(COMPANY['company_website'], 'text'))
+
+if __name__ == '__main__':
+    unittest.main()
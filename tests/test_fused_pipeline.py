@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import patch, Mock
+import boto3
+from moto import mock_aws
+import json
+import os
+from src.lambda_functions.fused_pipeline.fused_pipeline import lambda_handler, embed_batch
+from src.tools.fake_providers import FakeEncoding
+
+class TestFusedPipelineLambda(unittest.TestCase):
+
+    @mock_aws
+    def test_lambda_handler(self):
+        # Mock DynamoDB table setup
+        dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+        table = dynamodb.create_table(
+            TableName='mock-table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        def fake_get(url, params, timeout):
+            # The broken website fails to scrape, the short one is skipped
+            response = Mock()
+            response.status_code = 200
+            if params['url'] == 'https://broken.io':
+                response.status_code = 500
+            elif params['url'] == 'https://short.io':
+                response.text = "<html><body>Short content</body></html>"
+            else:
+                response.text = "<html><body>" + "Company content " * 10 + "</body></html>"
+            return response
+
+        # Mock OpenAI embeddings response for a batch of two texts
+        mock_openai_client = Mock()
+        mock_openai_client.embeddings.create.return_value = Mock(data=[
+            Mock(index=0, embedding=[0.1] * 1536),
+            Mock(index=1, embedding=[0.2] * 1536)
+        ])
+
+        websites = ['https://test1.com', 'https://broken.io', 'https://short.io', 'https://test2.com']
+        event = {
+            'Records': [
+                {
+                    'messageId': f'message-{i}',
+                    'body': json.dumps({
+                        'company_name': f'Test Company {i}',
+                        'company_website': website,
+                        'employee_size': '11-50',
+                        'location': 'USA'
+                    })
+                }
+                for i, website in enumerate(websites)
+            ]
+        }
+
+        with patch.dict(os.environ, {
+            'PINECONE_INDEX_NAME': 'mock-index',
+            'DYNAMODB_TABLE_NAME': 'mock-table',
+            'SCRAPINGBEE_API_KEY': 'mock-api-key'
+        }), \
+            patch('requests.get', side_effect=fake_get), patch('time.sleep'), \
+            patch('src.lambda_functions.get_embeddings.get_embeddings.get_openai_client', return_value=mock_openai_client), \
+            patch('src.lambda_functions.get_embeddings.get_embeddings.get_encoding', return_value=FakeEncoding()), \
+            patch('src.lambda_functions.push_to_pinecone.push_to_pinecone.get_pinecone_client') as mock_pinecone_client:
+            mock_pinecone_index = mock_pinecone_client.return_value.Index.return_value
+            mock_pinecone_index.upsert.return_value = {'upserted': 2}
+
+            response = lambda_handler(event, None)
+
+        # Assert only the broken website is retried
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'message-1'}])
+
+        # Both scraped texts are embedded with a single OpenAI API call
+        mock_openai_client.embeddings.create.assert_called_once()
+        self.assertEqual(len(mock_openai_client.embeddings.create.call_args[1]['input']), 2)
+
+        # Both vectors are upserted with a single Pinecone call
+        mock_pinecone_index.upsert.assert_called_once()
+        vectors = mock_pinecone_index.upsert.call_args[1]['vectors']
+        self.assertEqual([vector['metadata']['company_website'] for vector in vectors], ['https://test1.com', 'https://test2.com'])
+        self.assertEqual(len(vectors[0]['values']), 256)
+
+        # The metadata of both companies is stored in DynamoDB
+        self.assertEqual(table.scan()['Count'], 2)
+        item = table.get_item(Key={'id': vectors[1]['id']})['Item']
+        self.assertEqual(item['company_name'], 'Test Company 3')
+
+    def test_embed_batch_fails_only_the_rejected_text(self):
+        # The API rejects every request containing the bad text
+        def create(input, model):
+            if any('bad' in text for text in input):
+                raise ValueError('Invalid input')
+            return Mock(data=[Mock(index=i, embedding=[0.1] * 1536) for i in range(len(input))])
+        client = Mock()
+        client.embeddings.create.side_effect = create
+
+        scraped = [
+            (f'message-{i}', {
+                'company_name': f'Test Company {i}', 'company_website': f'https://test{i}.com', 'employee_size': '50',
+                'location': 'USA', 'scraped_text': 'A bad text.' if i == 1 else 'The company builds software.'
+            })
+            for i in range(3)
+        ]
+        failed_ids = []
+        embedded = embed_batch(scraped, client, FakeEncoding(), failed_ids)
+
+        self.assertEqual(failed_ids, ['message-1'])
+        self.assertEqual([message_id for message_id, _ in embedded], ['message-0', 'message-2'])
+
+if __name__ == '__main__':
+    unittest.main()
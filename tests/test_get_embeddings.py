@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, Mock
 import boto3
 from moto import mock_aws
 import json
@@ -9,11 +9,11 @@ from src.lambda_functions.get_embeddings.get_embeddings import lambda_handler, g
 class TestEmbeddingLambda(unittest.TestCase):
 
     @mock_aws
-    @patch('src.lambda_functions.get_embeddings.get_embeddings.get_openai_embedding')  # Correct path
+    @patch('src.lambda_functions.get_embeddings.get_embeddings.get_openai_embeddings')  # Correct path
     @patch.dict(os.environ, {
         'OPENAI_API_KEY': 'mock-api-key',
     })
-    def test_lambda_handler(self, mock_get_openai_embedding):
+    def test_lambda_handler(self, mock_get_openai_embeddings):
         # Mock SQS setup using boto3.client (following the same structure as the working test)
         sqs = boto3.client('sqs', region_name='us-west-2')
         queue_url = sqs.create_queue(QueueName='mock-embedding-queue')['QueueUrl']
@@ -22,7 +22,7 @@ class TestEmbeddingLambda(unittest.TestCase):
         os.environ['PINECONE_QUEUE_URL'] = queue_url
 
         # Mock OpenAI embeddings response
-        mock_get_openai_embedding.return_value = [0.1] * 1536  # A valid embedding of length 1536
+        mock_get_openai_embeddings.return_value = [[0.1] * 1536]  # A valid embedding of length 1536
 
         # Simulate an SQS event
         event = {
@@ -58,5 +58,92 @@ class TestEmbeddingLambda(unittest.TestCase):
         self.assertEqual(sent_message['location'], 'USA')
         self.assertEqual(len(sent_message['embeddings']), 256)  # The embedding should be reduced to 256 dimensions
 
+    @mock_aws
+    @patch('src.lambda_functions.get_embeddings.get_embeddings.get_openai_embeddings')
+    @patch.dict(os.environ, {
+        'OPENAI_API_KEY': 'mock-api-key',
+        'EMBEDDING_MODELS': 'text-embedding-3-small,text-embedding-3-large'
+    })
+    def test_lambda_handler_dual_writes_the_batch(self, mock_get_openai_embeddings):
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        queue_url = sqs.create_queue(QueueName='mock-embedding-queue')['QueueUrl']
+        os.environ['PINECONE_QUEUE_URL'] = queue_url
+
+        # One embedding per text of the batch, different for every model
+        def fake_embeddings(texts, client, model):
+            value = 0.1 if model == 'text-embedding-3-small' else -0.1
+            return [[value] * 3072 for _ in texts]
+        mock_get_openai_embeddings.side_effect = fake_embeddings
+
+        event = {
+            'Records': [
+                {
+                    'messageId': f'message-{i}',
+                    'body': json.dumps({
+                        'company_name': f'Test Company {i}',
+                        'company_website': f'https://test{i}.com',
+                        'employee_size': '50',
+                        'location': 'USA',
+                        'scraped_text': 'Sample text for embedding generation.'
+                    })
+                }
+                for i in range(3)
+            ]
+        }
+        response = lambda_handler(event, None)
+        self.assertEqual(response['batchItemFailures'], [])
+
+        # The whole batch is embedded with a single call per model
+        self.assertEqual([call.args[2] for call in mock_get_openai_embeddings.call_args_list], ['text-embedding-3-small', 'text-embedding-3-large'])
+        self.assertTrue(all(len(call.args[0]) == 3 for call in mock_get_openai_embeddings.call_args_list))
+
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertEqual(len(messages), 3)
+        sent_message = json.loads(messages[0]['Body'])
+        self.assertEqual(sent_message['embedding_model'], 'text-embedding-3-small')
+        self.assertEqual(list(sent_message['extra_embeddings']), ['text-embedding-3-large'])
+        self.assertEqual(len(sent_message['extra_embeddings']['text-embedding-3-large']), 256)
+        self.assertLess(sent_message['extra_embeddings']['text-embedding-3-large'][0], 0)
+
+    @mock_aws
+    @patch('src.lambda_functions.get_embeddings.get_embeddings.get_openai_client')
+    @patch.dict(os.environ, {
+        'OPENAI_API_KEY': 'mock-api-key',
+        'EMBEDDING_MODELS': 'text-embedding-3-small,text-embedding-3-large'
+    })
+    def test_lambda_handler_fails_only_the_rejected_record(self, mock_get_openai_client):
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        queue_url = sqs.create_queue(QueueName='mock-embedding-queue')['QueueUrl']
+        os.environ['PINECONE_QUEUE_URL'] = queue_url
+
+        # The dual-written model rejects every request containing the bad text
+        def create(input, model):
+            if model == 'text-embedding-3-large' and any('bad' in text for text in input):
+                raise ValueError('Invalid input')
+            return Mock(data=[Mock(index=i, embedding=[0.1] * 1536) for i in range(len(input))])
+        mock_get_openai_client.return_value.embeddings.create.side_effect = create
+
+        event = {
+            'Records': [
+                {
+                    'messageId': f'message-{i}',
+                    'body': json.dumps({
+                        'company_name': f'Test Company {i}',
+                        'company_website': f'https://test{i}.com',
+                        'employee_size': '50',
+                        'location': 'USA',
+                        'scraped_text': 'A bad text.' if i == 1 else 'Sample text for embedding generation.'
+                    })
+                }
+                for i in range(3)
+            ]
+        }
+        response = lambda_handler(event, None)
+
+        # The batch call of the failing model falls back to one call per text, only the bad record is retried
+        self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'message-1'}])
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertEqual(sorted(json.loads(m['Body'])['company_name'] for m in messages), ['Test Company 0', 'Test Company 2'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -105,5 +105,56 @@ class TestGetTextsLambda(unittest.TestCase):
                 # Assert that no message was sent since scraped text is less than 100 characters
                 self.assertNotIn('Messages', messages)
 
+    @mock_aws
+    def test_lambda_handler_reports_failed_scrapes(self):
+        # Mock SQS setup
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        queue_url = sqs.create_queue(QueueName='mock-embedding-queue')['QueueUrl']
+
+        def fake_get(url, params, timeout):
+            # Only the broken website fails to scrape
+            response = mock.Mock()
+            if params['url'] == 'https://broken.io':
+                response.status_code = 500
+            else:
+                response.status_code = 200
+                response.text = "<html><body>" + "Leadbird content" * 10 + "</body></html>"
+            return response
+
+        with mock.patch.dict(os.environ, {'EMBEDDING_QUEUE_URL': queue_url, 'SCRAPINGBEE_API_KEY': 'mock-api-key'}):
+            with mock.patch('requests.get', side_effect=fake_get), mock.patch('time.sleep'):
+                # Sample event with one working and one broken website
+                event = {
+                    "Records": [
+                        {
+                            "messageId": "message-ok",
+                            "body": json.dumps({
+                                "company_name": "Leadbird",
+                                "company_website": "https://leadbird.io",
+                                "employee_size": "10",
+                                "location": "San Francisco, USA"
+                            })
+                        },
+                        {
+                            "messageId": "message-broken",
+                            "body": json.dumps({
+                                "company_name": "Broken",
+                                "company_website": "https://broken.io",
+                                "employee_size": "10",
+                                "location": "San Francisco, USA"
+                            })
+                        }
+                    ]
+                }
+
+                response = lambda_handler(event, None)
+
+                # Assert only the broken website is retried
+                self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'message-broken'}])
+
+                # The working website should still be sent to the embedding queue
+                messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)
+                self.assertEqual(len(messages.get('Messages', [])), 1)
+
 if __name__ == '__main__':
     unittest.main()
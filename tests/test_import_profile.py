@@ -0,0 +1,42 @@
+import unittest
+import subprocess
+import sys
+from src.tools.import_profile import SRC_DIR, parse_importtime, profile_handler, handler_environment
+
+class TestImportProfile(unittest.TestCase):
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   botocore.compat\n"
+            "import time:       300 |        420 | boto3\n"
+        )
+        self.assertEqual(parse_importtime(output), [
+            ('botocore.compat', 120, 120, 1),
+            ('boto3', 300, 420, 0)
+        ])
+
+    def test_profile_handler(self):
+        profile = profile_handler('push_to_dynamo')
+
+        # Assert the import time is broken down by package
+        self.assertGreater(profile['total_ms'], 0)
+        self.assertIn('boto3', profile['packages_ms'])
+        self.assertIn('lambda_functions.push_to_dynamo', profile['packages_ms'])
+
+    def test_heavy_modules_are_not_imported_at_init(self):
+        script = (
+            "import sys\n"
+            "import lambda_functions.fused_pipeline.fused_pipeline\n"
+            "print(','.join(m for m in ('openai', 'tiktoken', 'pinecone', 'numpy') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=SRC_DIR, env=dict(handler_environment(), PYTHONPATH=''),
+            capture_output=True, text=True, check=True
+        )
+
+        # Assert importing every stage loads none of the heavy client libraries
+        self.assertEqual(result.stdout.strip(), '')
+
+if __name__ == '__main__':
+    unittest.main()
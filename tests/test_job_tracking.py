@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+import json
+import os
+from src.lambda_functions.common import job_tracking
+from src.lambda_functions.parse_csv_to_sqs.parse_csv_to_sqs import lambda_handler as parse_csv_handler
+from src.lambda_functions.push_to_dynamo.push_to_dynamo import lambda_handler as push_to_dynamo_handler
+
+class TestJobTracking(unittest.TestCase):
+
+    def create_jobs_table(self):
+        dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+        return dynamodb.create_table(
+            TableName='mock-jobs',
+            KeySchema=[
+                {'AttributeName': 'job_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'item', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'job_id', 'AttributeType': 'S'},
+                {'AttributeName': 'item', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+    @mock_aws
+    def test_parse_csv_creates_job(self):
+        table = self.create_jobs_table()
+
+        # Upload a CSV file with three companies
+        s3 = boto3.client('s3', region_name='us-west-2')
+        s3.create_bucket(Bucket='mock-bucket', CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+        rows = "\n".join(f"Company {i},company{i}.com,10,USA" for i in range(3))
+        s3.put_object(Bucket='mock-bucket', Key='companies.csv',
+                      Body=f"company_name,company_website,employee_size,location\n{rows}")
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        queue_url = sqs.create_queue(QueueName='mock-queue')['QueueUrl']
+
+        event = {'Records': [{'s3': {'bucket': {'name': 'mock-bucket'}, 'object': {'key': 'companies.csv'}}}]}
+        with patch.dict(os.environ, {'QUEUE_URL': queue_url, 'JOBS_TABLE_NAME': 'mock-jobs'}):
+            parse_csv_handler(event, None)
+
+        # Assert the job was created and every message carries its id
+        jobs = job_tracking.list_jobs(table)
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0]['key'], 'companies.csv')
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertTrue(all(json.loads(m['Body'])['job_id'] == jobs[0]['job_id'] for m in messages))
+
+        progress = job_tracking.get_job_progress(jobs[0]['job_id'], table)
+        self.assertEqual(progress['counters']['enqueued'], 3)
+        self.assertEqual(progress['completion'], 0.0)
+
+    @mock_aws
+    def test_parse_csv_without_jobs_table(self):
+        # The jobs table is configured but missing: the upload is still parsed
+        s3 = boto3.client('s3', region_name='us-west-2')
+        s3.create_bucket(Bucket='mock-bucket', CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+        s3.put_object(Bucket='mock-bucket', Key='companies.csv',
+                      Body="company_name,company_website,employee_size,location\nCompany 0,company0.com,10,USA")
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        queue_url = sqs.create_queue(QueueName='mock-queue')['QueueUrl']
+
+        event = {'Records': [{'s3': {'bucket': {'name': 'mock-bucket'}, 'object': {'key': 'companies.csv'}}}]}
+        with patch.dict(os.environ, {'QUEUE_URL': queue_url, 'JOBS_TABLE_NAME': 'missing-jobs'}):
+            parse_csv_handler(event, None)
+
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertEqual(len(messages), 1)
+
+    @mock_aws
+    def test_stage_increments_counters(self):
+        jobs_table = self.create_jobs_table()
+        dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+        dynamodb.create_table(
+            TableName='mock-table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        job_tracking.create_job('job-1', 'mock-bucket', 'companies.csv', jobs_table)
+        counters = job_tracking.JobCounters()
+        counters.add('job-1', 'enqueued', 4)
+        counters.flush(jobs_table)
+
+        event = {
+            'Records': [
+                {
+                    'messageId': f'message-{i}',
+                    'body': json.dumps({
+                        'id': f'id-{i}',
+                        'company_name': f'Test Company {i}',
+                        'company_website': f'https://test{i}.com',
+                        'employee_size': '11-50',
+                        'location': 'USA',
+                        'job_id': 'job-1'
+                    })
+                }
+                for i in range(2)
+            ]
+        }
+        with patch.dict(os.environ, {'DYNAMODB_TABLE_NAME': 'mock-table', 'JOBS_TABLE_NAME': 'mock-jobs'}):
+            push_to_dynamo_handler(event, None)
+
+        # Assert half of the companies are stored
+        progress = job_tracking.get_job_progress('job-1', jobs_table)
+        self.assertEqual(progress['counters']['stored'], 2)
+        self.assertEqual(progress['completion'], 0.5)
+
+    @mock_aws
+    def test_job_progress_eta(self):
+        table = self.create_jobs_table()
+        table.put_item(Item={'job_id': 'job-1', 'item': job_tracking.META_ITEM, 'bucket': 'b', 'key': 'k', 'created_at': 0})
+        # Counters spread over two shards are summed
+        table.put_item(Item={'job_id': 'job-1', 'item': 'COUNTER#00', 'enqueued': 100, 'stored': 20, 'stored_at': 10000})
+        table.put_item(Item={'job_id': 'job-1', 'item': 'COUNTER#01', 'stored': 10, 'skipped': 10, 'stored_at': 20000})
+
+        # 40 of 100 companies done in 20 seconds, so the remaining 60 take 30 seconds
+        progress = job_tracking.get_job_progress('job-1', table, now=20000)
+        self.assertEqual(progress['counters']['stored'], 30)
+        self.assertAlmostEqual(progress['completion'], 0.4)
+        self.assertAlmostEqual(progress['throughput']['stored'], 1.5)
+        self.assertAlmostEqual(progress['eta_seconds'], 30.0)
+        self.assertIsNone(job_tracking.get_job_progress('missing-job', table))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+import json
+import os
+from src.lambda_functions.common import lanes
+from src.lambda_functions.parse_csv_to_sqs.parse_csv_to_sqs import lambda_handler as parse_csv_handler
+from src.lambda_functions.get_texts.get_texts import scrape_company
+
+class TestLanes(unittest.TestCase):
+
+    def test_classify_upload(self):
+        # Assert the S3 prefix forces the lane, otherwise the number of rows decides
+        self.assertEqual(lanes.classify_upload('customer.csv', 50), lanes.PRIORITY_LANE)
+        self.assertEqual(lanes.classify_upload('export.csv', 2_000_000), lanes.BULK_LANE)
+        self.assertEqual(lanes.classify_upload('priority/export.csv', 2_000_000), lanes.PRIORITY_LANE)
+        self.assertEqual(lanes.classify_upload('bulk/customer.csv', 50), lanes.BULK_LANE)
+        with patch.dict(os.environ, {'PRIORITY_MAX_ROWS': '10'}):
+            self.assertEqual(lanes.classify_upload('customer.csv', 50), lanes.BULK_LANE)
+
+    def test_queue_url_falls_back_to_the_bulk_queue(self):
+        with patch.dict(os.environ, {'EMBEDDING_QUEUE_URL': 'bulk-queue'}):
+            self.assertEqual(lanes.queue_url('EMBEDDING_QUEUE_URL', {'lane': 'priority'}), 'bulk-queue')
+            with patch.dict(os.environ, {'PRIORITY_EMBEDDING_QUEUE_URL': 'priority-queue'}):
+                self.assertEqual(lanes.queue_url('EMBEDDING_QUEUE_URL', {'lane': 'priority'}), 'priority-queue')
+                self.assertEqual(lanes.queue_url('EMBEDDING_QUEUE_URL', {}), 'bulk-queue')
+
+    @mock_aws
+    def test_uploads_are_routed_to_their_lane(self):
+        s3 = boto3.client('s3', region_name='us-west-2')
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        s3.create_bucket(Bucket='mock-bucket', CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+        rows = "".join(f"test{i},test{i}.com,45,USA\n" for i in range(5))
+        s3.put_object(Bucket='mock-bucket', Key='small.csv', Body="company_name,company_website,employee_size,location\n" + rows)
+        s3.put_object(Bucket='mock-bucket', Key='bulk/small.csv', Body="company_name,company_website,employee_size,location\n" + rows)
+        queue_urls = {lane: sqs.create_queue(QueueName=f'{lane}-queue')['QueueUrl'] for lane in lanes.LANES}
+
+        environment = {'QUEUE_URL': queue_urls['bulk'], 'PRIORITY_QUEUE_URL': queue_urls['priority']}
+        with patch.dict(os.environ, environment):
+            for key in ['small.csv', 'bulk/small.csv']:
+                parse_csv_handler({'Records': [{'s3': {'bucket': {'name': 'mock-bucket'}, 'object': {'key': key}}}]}, None)
+
+        # Assert each file went to one lane and its messages carry the lane
+        for lane, queue_url in queue_urls.items():
+            messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)['Messages']
+            self.assertEqual(len(messages), 5)
+            self.assertEqual({json.loads(message['Body'])['lane'] for message in messages}, {lane})
+
+        # The lane is carried to the next stage
+        company = {'company_name': 'Test', 'company_website': 'https://test.com', 'employee_size': '11-50', 'location': 'USA', 'lane': 'priority'}
+        with patch('src.lambda_functions.get_texts.get_texts.scrape_website_with_retry', return_value='text ' * 50):
+            self.assertEqual(scrape_company(company)['lane'], 'priority')
+
+if __name__ == '__main__':
+    unittest.main()
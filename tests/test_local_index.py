@@ -0,0 +1,144 @@
+import unittest
+import tempfile
+import numpy as np
+from src.tools.local_index import LocalVectorIndex
+
+class TestLocalVectorIndex(unittest.TestCase):
+
+    def make_index(self, n=200, dimension=16, **kwargs):
+        # Random vectors with employee size and location metadata
+        rng = np.random.default_rng(0)
+        values = rng.standard_normal((n, dimension)).astype(np.float32)
+        sizes = ['1-10', '11-50', '51-200']
+        locations = ['USA', 'France', 'India', 'Brazil']
+        index = LocalVectorIndex(dimension, capacity=8, **kwargs)
+        index.upsert(vectors=[
+            {
+                'id': f'id-{i}',
+                'values': values[i].tolist(),
+                'metadata': {'employee_size': sizes[i % 3], 'location': locations[i % 4]}
+            }
+            for i in range(n)
+        ])
+        return index, values
+
+    def brute_force(self, values, query, rows, top_k):
+        # Reference cosine ranking over the given rows
+        scores = values[rows] @ query / (np.linalg.norm(values[rows], axis=1) * np.linalg.norm(query))
+        return [f'id-{rows[i]}' for i in np.argsort(-scores)[:top_k]]
+
+    def test_query_matches_brute_force(self):
+        index, values = self.make_index()
+        query = values[7] + 0.1
+
+        response = index.query(vector=query.tolist(), top_k=5, include_metadata=True)
+
+        # Assert the ranking matches an exact search and the closest vector scores highest
+        self.assertEqual([m['id'] for m in response['matches']], self.brute_force(values, query, np.arange(200), 5))
+        self.assertEqual(response['matches'][0]['id'], 'id-7')
+        self.assertEqual(response['matches'][0]['metadata']['location'], 'Brazil')
+
+    def test_filtered_queries(self):
+        index, values = self.make_index()
+        query = values[0]
+
+        filters = {
+            'eq': ({'location': 'USA'}, [i for i in range(200) if i % 4 == 0]),
+            'in_and': (
+                {'employee_size': {'$in': ['1-10', '11-50']}, 'location': {'$eq': 'India'}},
+                [i for i in range(200) if i % 3 != 2 and i % 4 == 2]
+            ),
+            'ne_or': (
+                {'$or': [{'location': {'$ne': 'USA'}}, {'employee_size': '1-10'}]},
+                [i for i in range(200) if i % 4 != 0 or i % 3 == 0]
+            ),
+            'nin_and': (
+                {'$and': [{'location': {'$nin': ['USA', 'France']}}, {'employee_size': '51-200'}]},
+                [i for i in range(200) if i % 4 in (2, 3) and i % 3 == 2]
+            ),
+        }
+        for name, (metadata_filter, rows) in filters.items():
+            with self.subTest(name):
+                response = index.query(vector=query.tolist(), top_k=10, filter=metadata_filter)
+                self.assertEqual([m['id'] for m in response['matches']], self.brute_force(values, query, np.array(rows), 10))
+
+        with self.assertRaises(ValueError):
+            index.query(vector=query.tolist(), filter={'location': {'$regex': 'U.*'}})
+
+    def test_fetch_delete_and_overwrite(self):
+        index, values = self.make_index(n=10)
+
+        # Overwriting a vector replaces its values and its metadata postings
+        index.upsert(vectors=[('id-1', values[2].tolist(), {'location': 'Japan'})])
+        fetched = index.fetch(ids=['id-1', 'missing'])['vectors']
+        self.assertEqual(list(fetched), ['id-1'])
+        np.testing.assert_allclose(fetched['id-1']['values'], values[2])
+        self.assertEqual([m['id'] for m in index.query(vector=values[0].tolist(), filter={'location': 'Japan'})['matches']], ['id-1'])
+        self.assertEqual(len(index.query(vector=values[0].tolist(), top_k=10, filter={'location': 'France'})['matches']), 2)
+
+        # Deleted vectors are not returned and their rows are reused
+        index.delete(ids=['id-1', 'id-3'])
+        self.assertEqual(len(index), 8)
+        self.assertEqual(index.query(vector=values[0].tolist(), filter={'location': 'Japan'})['matches'], [])
+        self.assertNotIn('id-3', [m['id'] for m in index.query(vector=values[3].tolist(), top_k=10)['matches']])
+        index.upsert(vectors=[{'id': 'id-10', 'values': values[3].tolist()}])
+        self.assertEqual(index.size, 10)
+
+    def test_empty_filters(self):
+        index, values = self.make_index(n=10)
+
+        # An empty filter matches every vector, like no filter
+        matches = index.query(vector=values[0].tolist(), top_k=10, filter={})['matches']
+        self.assertEqual(len(matches), 10)
+        self.assertEqual(len(index.query(vector=values[0].tolist(), top_k=10, filter={'$and': []})['matches']), 10)
+        with self.assertRaises(ValueError):
+            index.query(vector=values[0].tolist(), filter={'location': {}})
+
+        # Deleting with an empty filter is rejected instead of emptying the namespace
+        with self.assertRaises(ValueError):
+            index.delete(filter={})
+        self.assertEqual(len(index), 10)
+        index.delete(filter={'$and': [{'location': 'France'}]})
+        self.assertEqual(len(index), 7)
+
+    def test_namespaces(self):
+        index = LocalVectorIndex(2)
+        index.upsert(vectors=[('a', [1.0, 0.0]), ('b', [0.0, 1.0])], namespace='v1')
+        index.upsert(vectors=[('a', [0.0, 1.0])], namespace='v2')
+
+        # The same id is stored separately in each namespace and queries stay within their namespace
+        self.assertEqual([m['id'] for m in index.query(vector=[1.0, 0.0], top_k=5, namespace='v2')['matches']], ['a'])
+        self.assertEqual(index.fetch(ids=['a'], namespace='v1')['vectors']['a']['values'], [1.0, 0.0])
+        self.assertEqual(index.describe_index_stats()['namespaces'], {'v1': {'vector_count': 2}, 'v2': {'vector_count': 1}})
+
+        index.delete(delete_all=True, namespace='v1')
+        self.assertEqual(len(index), 1)
+
+    def test_euclidean_metric(self):
+        index = LocalVectorIndex(2, metric='euclidean')
+        index.upsert(vectors=[('near', [1.0, 1.0]), ('far', [5.0, 5.0])])
+
+        # Scores are squared distances in ascending order
+        matches = index.query(vector=[0.0, 0.0], top_k=2)['matches']
+        self.assertEqual([m['id'] for m in matches], ['near', 'far'])
+        self.assertAlmostEqual(matches[0]['score'], 2.0, places=5)
+        self.assertAlmostEqual(matches[1]['score'], 50.0, places=4)
+
+    def test_memory_mapped_index_is_saved_and_loaded(self):
+        with tempfile.TemporaryDirectory() as path:
+            index, values = self.make_index(path=path)
+            index.delete(ids=['id-5'])
+            index.save()
+
+            # The matrix stays on disk and the inverted indexes are rebuilt on load
+            loaded = LocalVectorIndex.load(path)
+            self.assertIsInstance(loaded.matrix, np.memmap)
+            self.assertEqual(len(loaded), 199)
+            query = values[8].tolist()
+            self.assertEqual(
+                loaded.query(vector=query, top_k=5, filter={'location': 'USA'}),
+                index.query(vector=query, top_k=5, filter={'location': 'USA'})
+            )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import time
+from moto import mock_aws
+from src.lambda_functions.common import locations
+from src.lambda_functions.parse_csv_to_sqs.parse_csv_to_sqs import format_company
+from src.lambda_functions.push_to_pinecone.push_to_pinecone import lambda_handler as push_to_pinecone_handler
+from src.lambda_functions.push_to_dynamo.push_to_dynamo import build_item
+
+class TestLocations(unittest.TestCase):
+
+    def setUp(self):
+        locations.reset_stats()
+
+    def test_normalize_location(self):
+        cases = {
+            'San Francisco Bay Area': ('San Francisco', 'California', 'United States'),
+            'sf, ca': ('San Francisco', 'California', 'United States'),
+            'Austin TX': ('Austin', 'Texas', 'United States'),
+            'Seattle, Washington': ('Seattle', 'Washington', 'United States'),
+            'Washington, D.C.': ('Washington', 'District of Columbia', 'United States'),
+            'Bengaluru, Karnataka, India': ('Bangalore', 'Karnataka', 'India'),
+            'Toronto ON Canada': ('Toronto', 'Ontario', 'Canada'),
+            'München': ('Munich', 'Bavaria', 'Germany'),
+            'Cambridge, UK': ('NA', 'NA', 'United Kingdom'),
+            'London, Ontario': ('London', 'Ontario', 'Canada'),
+            'Springfield, Illinois': ('Springfield', 'Illinois', 'United States'),
+            'Bay Area, CA': ('NA', 'California', 'United States'),
+            'U.S.A.': ('NA', 'NA', 'United States'),
+            'Remote': ('NA', 'NA', 'NA'),
+            'Atlantis': ('NA', 'NA', 'NA'),
+        }
+        for location, expected in cases.items():
+            with self.subTest(location):
+                self.assertEqual(locations.normalize_location(location), dict(zip(locations.LOCATION_FIELDS, expected)))
+
+    def test_long_locations_resolve_in_bounded_time(self):
+        # Every part is a known place, which made the combinations of all the parts exponential
+        location = ', '.join(['New York', 'NY', 'London', 'Paris', 'CA', 'USA'] * 5)
+        start = time.perf_counter()
+        self.assertEqual(locations.resolve_location(location), ('New York', 'New York', 'United States'))
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+        # The same for the words of a single part
+        start = time.perf_counter()
+        locations.resolve_location(' '.join(['NY', 'CA', 'TX'] * 20))
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_lookups_are_memoized(self):
+        for location in ['USA', 'NYC', 'USA', 'Atlantis', 'USA', 'NYC']:
+            locations.normalize_location(location)
+
+        # Assert repeated spellings are answered from the cache and the unresolved one is reported
+        stats = locations.location_stats()
+        self.assertEqual(stats['lookups'], 6)
+        self.assertEqual(stats['cached_locations'], 3)
+        self.assertEqual(stats['cache_hit_rate'], 0.5)
+        self.assertEqual(stats['resolved_rate'], round(5 / 6, 4))
+
+    @mock_aws
+    def test_canonical_fields_reach_pinecone_and_dynamo(self):
+        company = format_company({'company_name': 'Test', 'company_website': 'test.com', 'employee_size': '12', 'location': 'nyc'})
+        self.assertEqual(company['location'], 'nyc')
+        self.assertEqual((company['city'], company['region'], company['country']), ('New York', 'New York', 'United States'))
+
+        message = dict(company, embeddings=[0.1] * 256)
+        event = {'Records': [{'messageId': 'message-0', 'body': json.dumps(message)}]}
+        with patch.dict(os.environ, {'DYNAMO_SQS_QUEUE_URL': 'mock-queue', 'PINECONE_INDEX_NAME': 'mock-index'}), \
+            patch('src.lambda_functions.push_to_pinecone.push_to_pinecone.get_pinecone_client') as mock_pinecone_client, \
+            patch('src.lambda_functions.push_to_pinecone.push_to_pinecone.sqs') as mock_sqs:
+            mock_sqs.send_message.return_value = {'MessageId': 'mock-message-id'}
+            push_to_pinecone_handler(event, None)
+
+        # Assert the fields are Pinecone metadata and are forwarded to the DynamoDB item
+        metadata = mock_pinecone_client.return_value.Index.return_value.upsert.call_args[1]['vectors'][0]['metadata']
+        self.assertEqual(metadata['country'], 'United States')
+        dynamo_message = json.loads(mock_sqs.send_message.call_args[1]['MessageBody'])
+        self.assertEqual(build_item(dynamo_message)['city'], 'New York')
+
+if __name__ == '__main__':
+    unittest.main()
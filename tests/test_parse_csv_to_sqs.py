@@ -62,6 +62,7 @@ class TestLambdaFunction(unittest.TestCase):
             self.assertEqual(first_message['company_website'], 'https://www.test1.com')
             self.assertEqual(first_message['employee_size'], '11-50')
             self.assertEqual(first_message['location'], 'USA')
+            self.assertEqual(first_message['country'], 'United States')
 
 if __name__ == '__main__':
     unittest.main()
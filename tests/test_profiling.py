@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from src.lambda_functions.common import profiling
+from src.tools import view_profile
+
+def handler(event, context):
+    # Some CPU work, JSON encoding and a wait standing for a network call
+    json.dumps([{'record': i, 'text': 'word ' * 50} for i in range(200)])
+    time.sleep(0.03)
+    return {'statusCode': 200}
+
+class TestProfiling(unittest.TestCase):
+
+    def test_profiling_is_off_by_default(self):
+        profiled_handler = profiling.profiled('test')(handler)
+        with patch.dict(os.environ, {'PROFILE_SAMPLE_RATE': '0'}), \
+                patch.object(profiling, 'run_profiled') as run_profiled:
+            self.assertEqual(profiled_handler({'Records': []}, None), {'statusCode': 200})
+        run_profiled.assert_not_called()
+        self.assertEqual(profiled_handler.__name__, 'handler')
+
+    def test_sampled_profile_written_to_directory(self):
+        profiled_handler = profiling.profiled('get_texts')(handler)
+        context = SimpleNamespace(aws_request_id='request-1')
+        with tempfile.TemporaryDirectory() as directory:
+            environment = {'PROFILE_SAMPLE_RATE': '1', 'PROFILE_MODE': 'sample', 'PROFILE_DIR': directory}
+            with patch.dict(os.environ, environment):
+                os.environ.pop('PROFILE_BUCKET', None)
+                self.assertEqual(profiled_handler({'Records': [{}, {}]}, context), {'statusCode': 200})
+
+            invocations = view_profile.load_profiles(directory, stage='get_texts')
+            self.assertEqual(len(invocations), 1)
+            files = next(iter(invocations.values()))
+            self.assertEqual(set(files), {'.json', '.folded', '.tracemalloc'})
+
+            summary = json.loads(files['.json'])
+            self.assertEqual((summary['stage'], summary['request_id'], summary['records']), ('get_texts', 'request-1', 2))
+            self.assertGreater(summary['peak_traced_bytes'], 0)
+
+            # The sampled stacks go through the handler, most of them waiting in time.sleep
+            stacks = view_profile.parse_folded(files['.folded'].decode('utf-8'))
+            self.assertTrue(stacks)
+            self.assertTrue(all(any(frame.endswith(':handler') for frame in stack) for stack in stacks))
+            report = view_profile.summarize_folded(stacks, top=5)
+            self.assertEqual(report['top_self'][0][0], f'{__name__}:handler')
+
+    @mock_aws
+    def test_cprofile_written_to_s3(self):
+        s3 = boto3.client('s3', region_name='us-west-2')
+        s3.create_bucket(Bucket='mock-profiles', CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+        profiled_handler = profiling.profiled('get_embeddings')(handler)
+
+        environment = {'PROFILE_SAMPLE_RATE': '1', 'PROFILE_MODE': 'cprofile', 'PROFILE_BUCKET': 'mock-profiles'}
+        with patch.dict(os.environ, environment), patch.object(profiling, 's3', None):
+            profiled_handler({'Records': []}, None)
+
+        keys = [item['Key'] for item in s3.list_objects_v2(Bucket='mock-profiles')['Contents']]
+        self.assertEqual(sorted(os.path.splitext(key)[1] for key in keys), ['.json', '.pstats', '.tracemalloc'])
+        self.assertTrue(all(key.startswith('profiles/get_embeddings/') for key in keys))
+
+        # The viewer attributes the sleep and the JSON encoding
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'profile.pstats')
+            with open(path, 'wb') as f:
+                f.write(s3.get_object(Bucket='mock-profiles', Key=next(key for key in keys if key.endswith('.pstats')))['Body'].read())
+            report = view_profile.summarize_pstats(view_profile.pstats.Stats(path), top=5)
+        self.assertIn('json', report['categories'])
+        self.assertIn('time:<built-in method time.sleep>', dict(report['top_self']))
+
+    def test_failing_handler_is_still_profiled(self):
+        def failing(event, context):
+            raise RuntimeError("scrape failed")
+
+        profiled_handler = profiling.profiled('get_texts')(failing)
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.dict(os.environ, {'PROFILE_SAMPLE_RATE': '1', 'PROFILE_DIR': directory, 'PROFILE_TRACEMALLOC_FRAMES': '0'}):
+                os.environ.pop('PROFILE_BUCKET', None)
+                with self.assertRaises(RuntimeError):
+                    profiled_handler({'Records': []}, None)
+            files = next(iter(view_profile.load_profiles(directory).values()))
+            # Memory tracing is off with 0 frames
+            self.assertEqual(set(files), {'.json', '.folded'})
+
+    def test_category(self):
+        self.assertEqual(view_profile.category(['ssl', 'urllib3.connectionpool', 'requests.api']), 'network')
+        self.assertEqual(view_profile.category(['re', 'bs4.element', 'lambda_functions.get_texts.get_texts']), 'beautifulsoup')
+        self.assertEqual(view_profile.category(['lambda_functions.get_texts.get_texts']), 'other')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+import json
+import os
+from src.lambda_functions.push_to_dynamo.push_to_dynamo import lambda_handler
+
+class TestPushToDynamoLambda(unittest.TestCase):
+
+    def make_event(self):
+        # Simulate an SQS event with two metadata messages
+        return {
+            'Records': [
+                {
+                    'messageId': f'message-{i}',
+                    'body': json.dumps({
+                        'id': f'id-{i}',
+                        'company_name': f'Test Company {i}',
+                        'company_website': f'https://test{i}.com',
+                        'employee_size': '11-50',
+                        'location': 'USA'
+                    })
+                }
+                for i in range(2)
+            ]
+        }
+
+    @mock_aws
+    def test_lambda_handler(self):
+        # Mock DynamoDB table setup
+        dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+        table = dynamodb.create_table(
+            TableName='mock-table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        with patch.dict(os.environ, {'DYNAMODB_TABLE_NAME': 'mock-table'}):
+            response = lambda_handler(self.make_event(), None)
+
+        # Assert both items were inserted and no message is reported as failed
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(response['batchItemFailures'], [])
+        item = table.get_item(Key={'id': 'id-1'})['Item']
+        self.assertEqual(item['company_name'], 'Test Company 1')
+
+    @mock_aws
+    def test_lambda_handler_reports_failed_messages(self):
+        # The table does not exist, so every put_item fails
+        with patch.dict(os.environ, {'DYNAMODB_TABLE_NAME': 'missing-table'}):
+            response = lambda_handler(self.make_event(), None)
+
+        # Assert only the failed message ids are returned for retry
+        self.assertEqual(response['batchItemFailures'], [
+            {'itemIdentifier': 'message-0'},
+            {'itemIdentifier': 'message-1'}
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -73,5 +73,48 @@ class TestPushToPineconeLambda(unittest.TestCase):
                         })
                     )
 
+    @mock_aws
+    def test_lambda_handler_reports_failed_upserts(self):
+        # Mock SQS setup for the DynamoDB metadata queue
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        dynamo_sqs_url = sqs.create_queue(QueueName='mock-dynamo-sqs')['QueueUrl']
+
+        with patch.dict(os.environ, {
+            'DYNAMO_SQS_QUEUE_URL': dynamo_sqs_url,
+            'PINECONE_INDEX_NAME': 'mock-index'
+        }):
+            with patch('src.lambda_functions.push_to_pinecone.push_to_pinecone.get_pinecone_client') as mock_pinecone_client:
+                mock_pinecone_index = mock_pinecone_client.return_value.Index.return_value
+
+                # The first upsert fails, the second succeeds
+                mock_pinecone_index.upsert.side_effect = [Exception('Pinecone unavailable'), {'upserted': 1}]
+
+                # Simulate SQS event with two messages
+                event = {
+                    'Records': [
+                        {
+                            'messageId': f'message-{i}',
+                            'body': json.dumps({
+                                'company_name': f'Test Company {i}',
+                                'company_website': f'https://test{i}.com',
+                                'employee_size': '50',
+                                'location': 'USA',
+                                'embeddings': [0.1] * 256
+                            })
+                        }
+                        for i in range(2)
+                    ]
+                }
+
+                response = lambda_handler(event, None)
+
+                # Assert only the failed message is retried
+                self.assertEqual(response['batchItemFailures'], [{'itemIdentifier': 'message-0'}])
+
+                # Only the successful upsert should be forwarded to the DynamoDB queue
+                messages = sqs.receive_message(QueueUrl=dynamo_sqs_url, MaxNumberOfMessages=10)
+                self.assertEqual(len(messages.get('Messages', [])), 1)
+                self.assertEqual(json.loads(messages['Messages'][0]['Body'])['company_name'], 'Test Company 1')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import tempfile
+import numpy as np
+from moto import mock_aws
+from src.lambda_functions.common import quantization
+from src.lambda_functions.get_embeddings.get_embeddings import build_pinecone_message
+from src.lambda_functions.push_to_pinecone.push_to_pinecone import lambda_handler as push_to_pinecone_handler
+from src.tools.local_index import LocalVectorIndex
+
+class TestQuantization(unittest.TestCase):
+
+    def make_embeddings(self, n=20, dimension=256):
+        # L2-normalized embeddings, like get_embeddings produces
+        matrix = np.random.default_rng(0).standard_normal((n, dimension))
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    def test_encode_decode_roundtrip(self):
+        embedding = self.make_embeddings()[0].tolist()
+        full_size = len(json.dumps(quantization.encode_embedding(embedding, 'none')))
+
+        for mode, tolerance in [('float16', 1e-3), ('int8', 0.5 * max(map(abs, embedding)) / 127)]:
+            with self.subTest(mode):
+                encoded = quantization.encode_embedding(embedding, mode)
+                decoded = quantization.decode_embedding(json.loads(json.dumps(encoded)))
+
+                # Assert the values are recovered within the quantization step and the message shrinks
+                np.testing.assert_allclose(decoded, embedding, atol=tolerance)
+                self.assertLess(len(json.dumps(encoded)), full_size / 5)
+
+        # Plain lists from messages sent without quantization are passed through
+        self.assertEqual(quantization.decode_embedding([0.5, 0.25]), [0.5, 0.25])
+        with self.assertRaises(ValueError):
+            quantization.encode_embedding(embedding, 'int4')
+
+    def test_batch_quantization_matches_single_vectors(self):
+        embeddings = self.make_embeddings()
+        codes, scales = quantization.quantize(embeddings, 'int8')
+
+        # Assert the vectorized batch produces the same codes as the per-vector transport encoding
+        self.assertEqual(codes.dtype, np.int8)
+        for i, embedding in enumerate(embeddings):
+            encoded = quantization.encode_embedding(embedding.tolist(), 'int8')
+            np.testing.assert_allclose(quantization.decode_embedding(encoded), quantization.dequantize(codes, scales)[i], atol=1e-6)
+
+        np.testing.assert_allclose(quantization.dequantize(*quantization.quantize(embeddings, 'float16')), embeddings, atol=1e-3)
+
+    @mock_aws
+    def test_pipeline_transports_quantized_embeddings(self):
+        embedding = self.make_embeddings(1, 1536)[0].tolist()
+        company = {'company_name': 'Test Company', 'company_website': 'https://test.com', 'employee_size': '11-50', 'location': 'USA'}
+
+        # get_embeddings quantizes the reduced embedding of the Pinecone queue message
+        with patch.dict(os.environ, {'EMBEDDING_QUANTIZATION': 'int8'}):
+            message = build_pinecone_message(company, embedding)
+        self.assertEqual(message['embeddings']['dtype'], 'int8')
+
+        # push_to_pinecone decodes it back to floats before the upsert
+        event = {'Records': [{'messageId': 'message-0', 'body': json.dumps(message)}]}
+        with patch.dict(os.environ, {'DYNAMO_SQS_QUEUE_URL': 'mock-queue', 'PINECONE_INDEX_NAME': 'mock-index'}), \
+            patch('src.lambda_functions.push_to_pinecone.push_to_pinecone.get_pinecone_client') as mock_pinecone_client, \
+            patch('src.lambda_functions.push_to_pinecone.push_to_pinecone.sqs') as mock_sqs:
+            mock_sqs.send_message.return_value = {'MessageId': 'mock-message-id'}
+            response = push_to_pinecone_handler(event, None)
+
+        self.assertEqual(response['batchItemFailures'], [])
+        upserted = mock_pinecone_client.return_value.Index.return_value.upsert.call_args[1]['vectors'][0]['values']
+        reduced = np.asarray(embedding[:256]) / np.linalg.norm(embedding[:256])
+        np.testing.assert_allclose(upserted, reduced, atol=np.abs(reduced).max() / 127)
+
+    def test_quantized_local_index(self):
+        embeddings = self.make_embeddings(200)
+        with tempfile.TemporaryDirectory() as path:
+            index = LocalVectorIndex(256, path=path, capacity=16, dtype='int8')
+            index.upsert(vectors=[(f'id-{i}', embedding) for i, embedding in enumerate(embeddings)])
+            index.save()
+            loaded = LocalVectorIndex.load(path)
+
+            # Assert the int8 matrix takes a quarter of the float32 size and still finds the nearest vector
+            self.assertEqual(loaded.matrix.dtype, np.int8)
+            self.assertEqual(loaded.query(vector=embeddings[42], top_k=1)['matches'][0]['id'], 'id-42')
+            self.assertAlmostEqual(loaded.query(vector=embeddings[42], top_k=1)['matches'][0]['score'], 1.0, places=3)
+            np.testing.assert_allclose(loaded.fetch(ids=['id-7'])['vectors']['id-7']['values'], embeddings[7], atol=0.01)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import boto3
+from moto import mock_aws
+import json
+from src.tools.redrive_dlq import redrive
+
+class TestRedriveDlq(unittest.TestCase):
+
+    @mock_aws
+    def test_redrive_moves_all_messages(self):
+        # Mock SQS setup with a source queue and its DLQ
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        dlq_url = sqs.create_queue(QueueName='mock-dlq')['QueueUrl']
+        queue_url = sqs.create_queue(QueueName='mock-queue')['QueueUrl']
+
+        # Fill the DLQ with failed messages
+        for i in range(25):
+            sqs.send_message(QueueUrl=dlq_url, MessageBody=json.dumps({'company_name': f'test{i}'}))
+
+        # Redrive the DLQ back to the source queue (one worker: moto's SQS receive is not thread-safe,
+        # concurrent workers can receive the same message and redrive it twice)
+        result = redrive(dlq_url, queue_url, workers=1, max_rate=0, sqs=sqs)
+
+        self.assertEqual(result, {'moved': 25, 'failed': 0})
+
+        # All messages should now be in the source queue and none in the DLQ
+        attributes = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['ApproximateNumberOfMessages'])
+        self.assertEqual(attributes['Attributes']['ApproximateNumberOfMessages'], '25')
+        attributes = sqs.get_queue_attributes(QueueUrl=dlq_url, AttributeNames=['ApproximateNumberOfMessages'])
+        self.assertEqual(attributes['Attributes']['ApproximateNumberOfMessages'], '0')
+
+    @mock_aws
+    def test_concurrent_workers_drain_the_dlq(self):
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        dlq_url = sqs.create_queue(QueueName='mock-dlq')['QueueUrl']
+        queue_url = sqs.create_queue(QueueName='mock-queue')['QueueUrl']
+        for i in range(25):
+            sqs.send_message(QueueUrl=dlq_url, MessageBody=json.dumps({'company_name': f'test{i}'}))
+
+        # Only the drained DLQ is asserted, moto may hand the same message to two workers
+        result = redrive(dlq_url, queue_url, workers=3, max_rate=0, sqs=sqs)
+
+        self.assertGreaterEqual(result['moved'], 25)
+        attributes = sqs.get_queue_attributes(QueueUrl=dlq_url, AttributeNames=['ApproximateNumberOfMessages'])
+        self.assertEqual(attributes['Attributes']['ApproximateNumberOfMessages'], '0')
+
+    @mock_aws
+    def test_redrive_respects_max_messages(self):
+        # Mock SQS setup with a source queue and its DLQ
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        dlq_url = sqs.create_queue(QueueName='mock-dlq')['QueueUrl']
+        queue_url = sqs.create_queue(QueueName='mock-queue')['QueueUrl']
+
+        for i in range(15):
+            sqs.send_message(QueueUrl=dlq_url, MessageBody=json.dumps({'company_name': f'test{i}'}))
+
+        # Only redrive part of the DLQ
+        result = redrive(dlq_url, queue_url, workers=2, max_rate=0, max_messages=12, sqs=sqs)
+
+        self.assertEqual(result['moved'], 12)
+        attributes = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['ApproximateNumberOfMessages'])
+        self.assertEqual(attributes['Attributes']['ApproximateNumberOfMessages'], '12')
+
+        # Check the message body is preserved
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=1)
+        self.assertIn('company_name', json.loads(messages['Messages'][0]['Body']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+import csv
+import io
+import json
+import os
+import tempfile
+from src.lambda_functions.common import text_cache
+from src.lambda_functions.push_to_dynamo import push_to_dynamo
+from src.lambda_functions.push_to_pinecone import push_to_pinecone
+from src.tools import reembed
+from src.tools.fake_providers import FakeOpenAIClient, FakeEncoding, FakePineconeIndex
+
+class TestReembed(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        s3 = boto3.client('s3', region_name='us-west-2')
+        s3.create_bucket(Bucket='mock-texts', CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+        patcher = patch.object(text_cache, 's3', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+        self.table = dynamodb.create_table(
+            TableName='mock-table',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        # 10 ingested companies, the text of the last 2 was never cached
+        for i in range(10):
+            website = f'https://www.test{i}.com'
+            self.table.put_item(Item=push_to_dynamo.build_item({
+                'id': push_to_pinecone.generate_unique_id(website), 'company_name': f'test{i}',
+                'company_website': website, 'employee_size': '11-50', 'location': 'USA', 'country': 'US'
+            }))
+            if i < 8:
+                text_cache.put_text(website, f'test{i} makes things ' * 20, 'mock-texts')
+
+        self.providers = {'openai': FakeOpenAIClient(), 'encoding': FakeEncoding(), 'index': FakePineconeIndex()}
+
+    def test_reembed_from_cached_texts(self):
+        missing = io.StringIO()
+        writer = csv.DictWriter(missing, fieldnames=reembed.MISSING_COLUMNS)
+        writer.writeheader()
+        counts = reembed.reembed(
+            self.table, self.providers, 'text-embedding-3-large', 'mock-texts',
+            page_size=4, batch_size=3, missing_writer=writer
+        )
+        self.assertEqual(counts, {'scanned': 10, 'embedded': 8, 'missing_text': 2})
+
+        # Embedded with the new model into its namespace, the default namespace is untouched
+        index = self.providers['index']
+        self.assertEqual(index.describe_index_stats()['namespaces'], {'text-embedding-3-large': {'vector_count': 8}})
+        unique_id = push_to_pinecone.generate_unique_id('https://www.test0.com')
+        vector = index.fetch([unique_id], namespace='text-embedding-3-large')['vectors'][unique_id]
+        self.assertEqual((vector['metadata']['company_name'], vector['metadata']['country']), ('test0', 'US'))
+        self.assertEqual(len(vector['values']), 256)
+        self.assertEqual({row['company_name'] for row in csv.DictReader(io.StringIO(missing.getvalue()))}, {'test8', 'test9'})
+
+        # A second run with --skip-existing only retries the companies without cached text
+        calls = self.providers['openai'].calls
+        counts = reembed.reembed(self.table, self.providers, 'text-embedding-3-large', 'mock-texts', skip_existing=True)
+        self.assertEqual(counts, {'scanned': 10, 'skipped': 8, 'missing_text': 2})
+        self.assertEqual(self.providers['openai'].calls, calls)
+
+    def test_reembed_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'checkpoint.json')
+
+            # Interrupted after the first page
+            with patch.object(reembed, 'reembed_page', side_effect=[{'scanned': 4, 'embedded': 4}, KeyboardInterrupt()]):
+                with self.assertRaises(KeyboardInterrupt):
+                    reembed.reembed(self.table, self.providers, 'text-embedding-3-large', 'mock-texts', checkpoint=checkpoint, page_size=4)
+            with open(checkpoint) as f:
+                self.assertFalse(json.load(f)['finished'])
+
+            # The resumed run scans the remaining 6 items and adds up the counts
+            counts = reembed.reembed(self.table, self.providers, 'text-embedding-3-large', 'mock-texts', checkpoint=checkpoint, page_size=4)
+            self.assertEqual(counts['scanned'], 10)
+            self.assertEqual(counts['embedded'] + counts['missing_text'], 10)
+            self.assertEqual(len(self.providers['index']), counts['embedded'] - 4)
+
+            # A finished segment is not scanned again
+            with patch.object(reembed, 'scan_pages') as scan_pages:
+                reembed.reembed(self.table, self.providers, 'text-embedding-3-large', 'mock-texts', checkpoint=checkpoint, page_size=4)
+            scan_pages.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
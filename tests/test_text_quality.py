@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+import json
+import os
+from src.lambda_functions.common import job_tracking
+from src.lambda_functions.common import text_quality
+from src.lambda_functions.get_texts import get_texts
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'benchmarks', 'scrape_quality_fixtures.jsonl')
+
+# The gate is off by default, the fixtures are checked at the candidate threshold of the benchmark
+EVALUATED_THRESHOLD = 0.5
+
+# Low-value kinds caught by the known phrases or the signals. Cookie banners and login walls are only scored as
+# boilerplate words, so short company pages showing them are not skipped: they are reported by the benchmark.
+SKIPPED_KINDS = {'parked', 'error', 'challenge', 'code', 'repetitive'}
+
+PARKED_PAGE = (
+    "northwind-tools.com This domain may be for sale! Buy this domain. Related searches: Power Tools, Hand Tools, "
+    "Garden Equipment, Workshop Supplies. Make an offer. Privacy Policy"
+)
+
+COMPANY = {
+    'company_name': 'Northwind Tools',
+    'company_website': 'https://northwind-tools.com',
+    'employee_size': '11-50',
+    'location': 'USA',
+    'job_id': 'job-0'
+}
+
+def load_fixtures():
+    with open(FIXTURES) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class TestTextQuality(unittest.TestCase):
+
+    def test_fixtures_are_classified(self):
+        for fixture in load_fixtures():
+            if fixture['label'] == 'content' or fixture['kind'] in SKIPPED_KINDS:
+                with self.subTest(kind=fixture['kind'], text=fixture['text'][:40]):
+                    passed = text_quality.score_text(fixture['text']) >= EVALUATED_THRESHOLD
+                    self.assertEqual(passed, fixture['label'] == 'content')
+
+    def test_cookie_banners_do_not_skip_company_pages(self):
+        pages = [
+            "Peachtree Plumbing is a family-owned plumber in Atlanta. We repair leaks, install water heaters and clear "
+            "drains for homes and businesses across Fulton County. Call us for a free estimate. We use cookies to improve "
+            "your experience on our website. By clicking Accept all, you consent to our use of cookies. "
+            "Accept all Reject all Cookie settings",
+            "Home Product Pricing Customers Blog Log in Sign up Acme Analytics helps product teams understand how "
+            "customers use their apps. Track events, build funnels and share dashboards with your whole company in "
+            "minutes. Privacy Policy Terms of Service Cookie Policy",
+        ]
+        for page in pages:
+            with self.subTest(text=page[:40]):
+                self.assertEqual(text_quality.text_features(page)['phrase_hits'], 0)
+                self.assertGreaterEqual(text_quality.score_text(page), EVALUATED_THRESHOLD)
+
+    def test_phone_numbers_are_not_error_codes(self):
+        # 404 is also an Atlanta area code, only the wording of error pages counts
+        page = (
+            "Peachtree Plumbing is a family-owned plumber in Atlanta. We repair leaks, install water heaters and "
+            "clear drains for homes and businesses across Fulton County. Call us at (404) 555-0199."
+        )
+        self.assertEqual(text_quality.text_features(page)['phrase_hits'], 0)
+        self.assertEqual(text_quality.score_text(page), text_quality.score_text(page.replace('(404)', '(212)')))
+        self.assertGreaterEqual(text_quality.score_text(page), EVALUATED_THRESHOLD)
+        self.assertEqual(text_quality.text_features("Error 404: the page was not found")['phrase_hits'], 1)
+
+    def test_empty_texts_score_zero(self):
+        for text in ('', '12345', '--- | ---'):
+            self.assertEqual(text_quality.score_text(text), 0.0)
+
+    def test_savings(self):
+        self.assertEqual(text_quality.savings('a' * 400), {'tokens_saved': 100, 'writes_saved': 1})
+        # Dual-written pages save the tokens and writes of every model, truncated like get_embeddings
+        self.assertEqual(text_quality.savings('a' * 100000, 2), {'tokens_saved': 16000, 'writes_saved': 2})
+
+    @mock_aws
+    def test_low_quality_page_is_skipped_with_savings(self):
+        dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+        table = dynamodb.create_table(
+            TableName='mock-jobs',
+            KeySchema=[
+                {'AttributeName': 'job_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'item', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'job_id', 'AttributeType': 'S'},
+                {'AttributeName': 'item', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        job_tracking.create_job('job-0', 'mock-bucket', 'companies.csv', table)
+        sqs = boto3.client('sqs', region_name='us-west-2')
+        queue_url = sqs.create_queue(QueueName='mock-embedding-queue')['QueueUrl']
+
+        event = {'Records': [{'messageId': 'message-0', 'body': json.dumps(COMPANY)}]}
+        environment = {'EMBEDDING_QUEUE_URL': queue_url, 'JOBS_TABLE_NAME': 'mock-jobs', 'SCRAPE_QUALITY_THRESHOLD': '0.5'}
+        with patch.dict(os.environ, environment), \
+                patch.object(get_texts, 'scrape_website_with_retry', return_value=PARKED_PAGE):
+            response = get_texts.lambda_handler(event, None)
+
+        # Nothing is sent to the embedding stage, the company leaves the pipeline as skipped
+        self.assertEqual(response['batchItemFailures'], [])
+        self.assertNotIn('Messages', sqs.receive_message(QueueUrl=queue_url))
+        progress = job_tracking.get_job_progress('job-0', table)
+        self.assertEqual(progress['counters']['skipped'], 1)
+        self.assertEqual(progress['savings'], {
+            'low_quality': 1,
+            'tokens_saved': text_quality.estimated_tokens(PARKED_PAGE),
+            'writes_saved': 1
+        })
+
+    def test_threshold_is_configurable(self):
+        with patch.object(get_texts, 'scrape_website_with_retry', return_value=PARKED_PAGE):
+            with patch.dict(os.environ, {'SCRAPE_QUALITY_THRESHOLD': '0.5'}):
+                self.assertIsNone(get_texts.scrape_company(COMPANY))
+            # The gate is off by default and with a threshold of 0
+            with patch.dict(os.environ, {'SCRAPE_QUALITY_THRESHOLD': '0'}):
+                self.assertEqual(get_texts.scrape_company(COMPANY)['scraped_text'], PARKED_PAGE)
+                del os.environ['SCRAPE_QUALITY_THRESHOLD']
+                self.assertEqual(get_texts.scrape_company(COMPANY)['scraped_text'], PARKED_PAGE)
+
+if __name__ == '__main__':
+    unittest.main()
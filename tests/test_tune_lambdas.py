@@ -0,0 +1,84 @@
+import unittest
+import json
+import os
+import tempfile
+from src.tools import tune_lambdas
+
+def measurement(batch_size, wall_s, cpu_s, peak_rss_mb=80.0, n_invocations=4):
+    invocations = [{'records': batch_size, 'wall_s': wall_s, 'cpu_s': cpu_s}] * n_invocations
+    return {'stage': 'get_texts', 'batch_size': batch_size, 'invocations': invocations, 'peak_rss_mb': peak_rss_mb}
+
+class TestTuneLambdas(unittest.TestCase):
+
+    def test_cpu_time_scales_with_the_memory_size(self):
+        # 0.5 s of I/O wait and 0.5 s of CPU measured on a full vCPU
+        cpu_bound = measurement(1, 1.0, 0.5)
+        full = tune_lambdas.estimate(cpu_bound, tune_lambdas.FULL_VCPU_MEMORY_MB, target_throughput=10)
+        self.assertAlmostEqual(full['duration_mean_s'], 1.0)
+        # A tenth of the vCPU runs the CPU part ten times slower, more memory than a vCPU does not help
+        small = tune_lambdas.estimate(cpu_bound, tune_lambdas.FULL_VCPU_MEMORY_MB / 10, target_throughput=10)
+        self.assertAlmostEqual(small['duration_mean_s'], 5.5)
+        large = tune_lambdas.estimate(cpu_bound, 3008, target_throughput=10)
+        self.assertAlmostEqual(large['duration_mean_s'], 1.0)
+        # Concurrency needed for 10 records/s with one record per invocation
+        self.assertEqual(full['concurrency'], 10)
+        self.assertEqual(small['concurrency'], 55)
+
+    def test_recommend_cheapest_feasible_configuration(self):
+        # I/O bound stage: the smallest memory above the peak RSS is the cheapest
+        candidates, best = tune_lambdas.recommend(
+            [measurement(1, 1.0, 0.01), measurement(10, 10.0, 0.1)], [128, 512, 1024],
+            target_throughput=10, max_concurrency=100
+        )
+        self.assertEqual(len(candidates), 6)
+        self.assertEqual((best['memory_size'], best['batch_size']), (128, 10))
+        # 9.9 s of I/O and 0.1 s of CPU on 128/1769 of a vCPU per batch of 10: 11.3 s, so 12 instances for 10 records/s
+        self.assertEqual(tune_lambdas.stage_context(best), {'memory_size': 128, 'batch_size': 10, 'concurrency': 12})
+
+        # Memory below the peak RSS with headroom is rejected
+        _, best = tune_lambdas.recommend([measurement(1, 1.0, 0.01, peak_rss_mb=300)], [128, 256, 512], 10, 100)
+        self.assertEqual(best['memory_size'], 512)
+
+        # CPU bound stage where small memory sizes need more concurrency than allowed
+        candidates, best = tune_lambdas.recommend([measurement(1, 1.0, 1.0)], [128, 1024, 1769], 10, max_concurrency=20)
+        self.assertEqual([candidate['rejected'] for candidate in candidates], ['throughput', None, None])
+        # Below a vCPU a CPU bound stage costs the same at every memory size, the fewest instances win
+        self.assertEqual(best['memory_size'], 1769)
+
+        # Batches too slow for the function timeout
+        _, best = tune_lambdas.recommend([measurement(50, 200.0, 1.0)], [1024], 10, 100)
+        self.assertIsNone(best)
+
+    def test_write_context_merges_into_cdk_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cdk.json')
+            with open(path, 'w') as f:
+                json.dump({'app': 'python3 app.py', 'context': {'stage_tuning': {'push_to_dynamo': {'memory_size': 256}}}}, f)
+
+            tune_lambdas.write_context(path, {'get_texts': {'memory_size': 512, 'batch_size': 10, 'concurrency': 30}})
+
+            with open(path) as f:
+                config = json.load(f)
+            self.assertEqual(config['app'], 'python3 app.py')
+            self.assertEqual(set(config['context']['stage_tuning']), {'get_texts', 'push_to_dynamo'})
+            self.assertEqual(config['context']['stage_tuning']['get_texts']['batch_size'], 10)
+
+    def test_record_and_replay_workload(self):
+        companies = [
+            {'company_name': f'Company {i}', 'company_website': f'https://www.company{i}.com', 'employee_size': '11-50', 'location': 'USA'}
+            for i in range(3)
+        ]
+        workload = tune_lambdas.record_workload(companies)
+
+        # Every stage receives a message per company
+        self.assertEqual({stage: len(bodies) for stage, bodies in workload.items()}, {
+            'get_texts': 3, 'get_embeddings': 3, 'push_to_pinecone': 3, 'push_to_dynamo': 3
+        })
+        self.assertIn('embeddings', json.loads(workload['push_to_pinecone'][0]))
+
+        result = tune_lambdas.replay('push_to_dynamo', workload['push_to_dynamo'], batch_size=2, latencies={})
+        self.assertEqual([invocation['records'] for invocation in result['invocations']], [2, 1])
+        self.assertGreater(result['peak_rss_mb'], 0)
+
+if __name__ == '__main__':
+    unittest.main()